@@ -1,9 +1,13 @@
 {
     // @include 'lib/util.js'
 
-    var fileVersion = 3;
+    var fileVersion = 7;
     var settingsVersion = '0.2';
     var settingsFilePath = Folder.userData.fullName + '/cam-export-settings.json';
+    // With adaptive sampling, baked properties are first sampled this many frames apart, then more finely where needed
+    var ADAPTIVE_COARSE_FRAMES = 4;
+    // Number of layers whose transforms are baked at the same time
+    var BAKE_BATCH_SIZE = 16;
 
     function showDialog(cb, opts) {
         var c = controlFunctions;
@@ -55,6 +59,22 @@
                             enabled: opts.selectionExists
                         })
                     }),
+                    otherComps: c.Group({
+                        label: c.StaticText({
+                            text: 'Also export',
+                            helpTip: 'Export other compositions into the same file, sharing their footage. "Export selected layers only" only applies to the active composition; the others are exported whole.'
+                        }),
+                        selectedComps: c.Checkbox({
+                            text: 'Comps selected in Project panel',
+                            value: false,
+                            enabled: opts.otherCompsSelected
+                        }),
+                        precomps: c.Checkbox({
+                            text: 'Precomps',
+                            helpTip: 'Also export the compositions used by precomp layers, including those nested inside them.',
+                            value: false
+                        })
+                    }),
                     bakeTransforms: c.Group({
                         label: c.StaticText({
                             text: 'Bake transforms',
@@ -74,6 +94,39 @@
                             text: opts.frameSuperSampling,
                             minimumSize: [40, 0]
                         })
+                    }),
+                    adaptiveSampling: c.Group({
+                        label: c.StaticText({
+                            text: 'Adaptive sampling',
+                            helpTip: 'Only bake as many keyframes as are needed to follow the motion, instead of one per sample. Slow or still stretches get very few keyframes, which makes baking faster and exports smaller.'
+                        }),
+                        value: c.Checkbox({
+                            value: false
+                        }),
+                        tolerance: c.EditText({
+                            text: opts.adaptiveTolerance,
+                            helpTip: 'How far (in pixels, degrees, or percent, depending on the property) the value halfway between two keyframes can stray from the straight line between them before another keyframe is added there. Only halfway points are checked, so motion elsewhere can stray further, and detail shorter than 4 frames can be lost.',
+                            minimumSize: [60, 0]
+                        })
+                    }),
+                    significantDigits: c.Group({
+                        label: c.StaticText({
+                            text: 'Number precision',
+                            helpTip: 'Number of significant digits to write layer values with. The default of 7 is as precise as binary keyframe data. Fewer digits make exports smaller and faster to import; 17 writes every number in full.'
+                        }),
+                        value: c.EditText({
+                            text: opts.significantDigits,
+                            minimumSize: [40, 0]
+                        })
+                    }),
+                    binaryKeyframes: c.Group({
+                        label: c.StaticText({
+                            text: 'Binary keyframe data',
+                            helpTip: 'Store baked keyframes in a .bin file next to the .json file instead of as text. This makes baked exports much smaller and faster to import, but the two files must be kept together.'
+                        }),
+                        value: c.Checkbox({
+                            value: false
+                        })
                     })
                 }),
                 separator: c.Group({ preferredSize: ['', 3] }),
@@ -116,8 +169,13 @@
                 // automatic: window.settings.timeRange.value.automatic
             },
             selectedLayersOnly: window.settings.selectedLayersOnly,
+            selectedComps: window.settings.otherComps.selectedComps,
+            precomps: window.settings.otherComps.precomps,
             bakeTransforms: window.settings.bakeTransforms,
             frameSuperSampling: window.settings.frameSuperSampling,
+            adaptiveSampling: window.settings.adaptiveSampling,
+            significantDigits: window.settings.significantDigits,
+            binaryKeyframes: window.settings.binaryKeyframes,
             plugButton: window.buttons.plug.link,
             exportButton: window.buttons.doExport,
             cancelButton: window.buttons.cancel
@@ -165,12 +223,26 @@
             if (isNaN(frameSuperSampling) || frameSuperSampling < 1 || frameSuperSampling > 128) {
                 frameSuperSampling = 1;
             }
+            var significantDigits = parseInt(controls.significantDigits.value.text);
+            if (isNaN(significantDigits) || significantDigits < 1 || significantDigits > 17) {
+                significantDigits = 7;
+            }
+            var adaptiveTolerance = parseFloat(controls.adaptiveSampling.tolerance.text);
+            if (isNaN(adaptiveTolerance) || adaptiveTolerance <= 0) {
+                adaptiveTolerance = 0.01;
+            }
             return {
                 savePath: controls.savePath.text,
                 timeRange: timeRange,
                 selectedLayersOnly: controls.selectedLayersOnly.value.value,
+                exportSelectedComps: !!controls.selectedComps.value,
+                followPrecomps: !!controls.precomps.value,
                 frameSuperSampling: frameSuperSampling,
-                bakeTransforms: !!controls.bakeTransforms.value.value
+                bakeTransforms: !!controls.bakeTransforms.value.value,
+                adaptiveSampling: !!controls.adaptiveSampling.value.value,
+                adaptiveTolerance: adaptiveTolerance,
+                significantDigits: significantDigits,
+                binaryKeyframes: !!controls.binaryKeyframes.value.value
             };
         }
 
@@ -185,9 +257,24 @@
                 controls.timeRange[button].value = button === settings.timeRange;
             }
             controls.bakeTransforms.value.value = settings.bakeTransforms;
+            if (typeof settings.followPrecomps === 'boolean') {
+                controls.precomps.value = settings.followPrecomps;
+            }
             if (typeof settings.frameSuperSampling === 'number') {
                 controls.frameSuperSampling.value.text = settings.frameSuperSampling;
             }
+            if (typeof settings.adaptiveSampling === 'boolean') {
+                controls.adaptiveSampling.value.value = settings.adaptiveSampling;
+            }
+            if (typeof settings.adaptiveTolerance === 'number') {
+                controls.adaptiveSampling.tolerance.text = settings.adaptiveTolerance;
+            }
+            if (typeof settings.significantDigits === 'number') {
+                controls.significantDigits.value.text = settings.significantDigits;
+            }
+            if (typeof settings.binaryKeyframes === 'boolean') {
+                controls.binaryKeyframes.value.value = settings.binaryKeyframes;
+            }
         }
 
         controls.plugButton.onClick = function() {
@@ -340,15 +427,28 @@
             throw new Error('No composition is currently open.');
         }
 
+        // Compositions selected in the Project panel, which can be exported along with the active one
+        var selectedComps = [];
+        var projectSelection = app.project.selection;
+        for (var i = 0; i < projectSelection.length; i++) {
+            if (projectSelection[i] instanceof CompItem && projectSelection[i].id !== activeComp.id) {
+                selectedComps.push(projectSelection[i]);
+            }
+        }
+
         var d = showDialog(
             function(settings) {
                 runExport(settings, {
-                    activeComp: activeComp
+                    activeComp: activeComp,
+                    selectedComps: selectedComps
                 })
             },
             {
                 selectionExists: activeComp.selectedLayers.length > 0,
-                frameSuperSampling: 1
+                otherCompsSelected: selectedComps.length > 0,
+                frameSuperSampling: 1,
+                adaptiveTolerance: 0.01,
+                significantDigits: 7
             }
         );
         d.window.show();
@@ -356,51 +456,113 @@
 
     function runExport(settings, opts) {
         var activeComp = opts.activeComp;
-        var layersToExport = [];
-        if (settings.selectedLayersOnly) {
-            var layerIndicesMarkedForExport = {};
-            for (var i = 0; i < activeComp.selectedLayers.length; i++) {
-                var layer = activeComp.selectedLayers[i];
-                layersToExport.push(layer);
-                layerIndicesMarkedForExport[layer.index] = true;
-
-                // If not baking transforms (also baking parents' transforms into child layers),
-                // make sure to export all the selected layers' parents as well so that the children
-                // can have the parent transforms applied to them
-                if (!settings.bakeTransforms) {
-                    var parent = layer.parent;
-                    while (parent) {
-                        if (!(parent.index in layerIndicesMarkedForExport)) {
-                            layersToExport.push(parent);
-                            layerIndicesMarkedForExport[parent.index] = true;
+
+        function layersToExportFrom(comp, selectedLayersOnly) {
+            var layersToExport = [];
+            if (selectedLayersOnly) {
+                var layerIndicesMarkedForExport = {};
+                for (var i = 0; i < comp.selectedLayers.length; i++) {
+                    var layer = comp.selectedLayers[i];
+                    layersToExport.push(layer);
+                    layerIndicesMarkedForExport[layer.index] = true;
+
+                    // If not baking transforms (also baking parents' transforms into child layers),
+                    // make sure to export all the selected layers' parents as well so that the children
+                    // can have the parent transforms applied to them
+                    if (!settings.bakeTransforms) {
+                        var parent = layer.parent;
+                        while (parent) {
+                            if (!(parent.index in layerIndicesMarkedForExport)) {
+                                layersToExport.push(parent);
+                                layerIndicesMarkedForExport[parent.index] = true;
+                            }
+                            parent = parent.parent;
                         }
-                        parent = parent.parent;
                     }
                 }
+            } else {
+                for (var i = 1; i <= comp.layers.length; i++) {
+                    var layer = comp.layers[i];
+                    layersToExport.push(layer);
+                }
             }
-        } else {
-            for (var i = 1; i <= activeComp.layers.length; i++) {
-                var layer = activeComp.layers[i];
-                layersToExport.push(layer);
+            return layersToExport;
+        }
+
+        // The compositions to export, starting with the active one
+        var comps = [];
+        // Index of each composition in `comps`, by item ID
+        var compIndices = {};
+        function addComp(comp, layers) {
+            compIndices[comp.id] = comps.length;
+            comps.push({item: comp, layers: layers});
+        }
+
+        addComp(activeComp, layersToExportFrom(activeComp, settings.selectedLayersOnly));
+        if (settings.exportSelectedComps) {
+            for (var i = 0; i < opts.selectedComps.length; i++) {
+                if (!compIndices.hasOwnProperty(opts.selectedComps[i].id)) {
+                    addComp(opts.selectedComps[i], layersToExportFrom(opts.selectedComps[i], false));
+                }
+            }
+        }
+        if (settings.followPrecomps) {
+            // Precomps are added to the end of the list as they're found, so the ones nested inside them are found too
+            for (var c = 0; c < comps.length; c++) {
+                for (var i = 0; i < comps[c].layers.length; i++) {
+                    var source = comps[c].layers[i].source;
+                    if (source instanceof CompItem && !compIndices.hasOwnProperty(source.id)) {
+                        addComp(source, layersToExportFrom(source, false));
+                    }
+                }
             }
         }
 
+        function exportComp(comp) {
+            return {
+                width: comp.width,
+                height: comp.height,
+                name: comp.name,
+                pixelAspect: comp.pixelAspect,
+                frameRate: comp.frameRate,
+                workArea: [comp.workAreaStart, comp.workAreaDuration + comp.workAreaStart]
+            };
+        }
+
+        // Everything other than the layers and sources, which are written separately (see below)
         var json = {
-            layers: [],
-            sources: [],
-            comp: {
-                width: activeComp.width,
-                height: activeComp.height,
-                name: activeComp.name,
-                pixelAspect: activeComp.pixelAspect,
-                frameRate: activeComp.frameRate,
-                workArea: [activeComp.workAreaStart, activeComp.workAreaDuration + activeComp.workAreaStart]
-            },
+            comps: comps.map(function(comp) { return exportComp(comp.item); }),
             transformsBaked: settings.bakeTransforms,
             version: fileVersion
         };
 
-        var exportedSources = [];
+        // Layers from every composition can share the same sources, which are only exported once. Index of each one
+        // in `sources`, by item ID.
+        var sourceIndices = {};
+        var sources = [];
+
+        var savePath = settings.savePath.replace(/\.\w+$/, '.json');
+        var keyframeWriter = null;
+        if (settings.binaryKeyframes) {
+            var keyframeDataPath = savePath.replace(/(\.\w+)?$/, '.bin');
+            keyframeWriter = new BinaryArrayWriter(keyframeDataPath);
+            json.keyframeData = {
+                // Relative to the .json file, so the two can be moved together. `File.name` is URI-encoded.
+                file: File.decode(new File(keyframeDataPath).name),
+                type: 'float32',
+                byteOrder: 'little'
+            };
+        }
+
+        var jsonWriter = new TextFileWriter(savePath);
+        // Numbers are written with as many digits as they need, up to the chosen precision
+        var significantDigits = settings.significantDigits < 17 ? settings.significantDigits : null;
+
+        // Baked keyframe arrays are either stored inline, or written to the binary keyframe data file and replaced with
+        // a reference to where they were written.
+        function storeKeyframes(values) {
+            return keyframeWriter ? keyframeWriter.write(values) : values;
+        }
 
         function unenum(val) {
             switch (val) {
@@ -413,11 +575,12 @@
         }
 
         function startAndEndFrame(layer) {
+            var comp = layer.containingComp;
             var startTime, duration;
             switch (settings.timeRange) {
                 case 'workArea':
-                    startTime = activeComp.workAreaStart;
-                    duration = activeComp.workAreaDuration;
+                    startTime = comp.workAreaStart;
+                    duration = comp.workAreaDuration;
                     break;
                 case 'layerDuration':
                     startTime = layer.inPoint;
@@ -426,12 +589,12 @@
                 case 'wholeComp':
                 default:
                     startTime = 0;
-                    duration = activeComp.duration;
+                    duration = comp.duration;
                     break;
             }
             // avoid floating point weirdness by rounding, just in case
-            var startFrame = Math.floor(startTime * activeComp.frameRate);
-            var endFrame = startFrame + Math.ceil(duration * activeComp.frameRate);
+            var startFrame = Math.floor(startTime * comp.frameRate);
+            var endFrame = startFrame + Math.ceil(duration * comp.frameRate);
             return [startFrame, endFrame];
         }
 
@@ -439,27 +602,42 @@
             return str.replace(/(\\|")/g, '\\$1');
         }
 
-        if (settings.bakeTransforms) {
+        // `toWorld` only works inside expressions, so add a null object to the composition being baked whose expressions
+        // we will set and then evaluate using `valueAtTime`.
+        function addEvaluator(comp, numLayers) {
             // Adding a layer deselects all others, so save the original selection here.
             var selectedLayers = [];
-            for (var i = 0; i < activeComp.selectedLayers.length; i++) {
-                selectedLayers.push(activeComp.selectedLayers[i]);
+            for (var i = 0; i < comp.selectedLayers.length; i++) {
+                selectedLayers.push(comp.selectedLayers[i]);
             }
 
-            // `toWorld` only works inside expressions, so add a null object whose expression we will set and then evaluate
-            // using `valueAtTime`.
-            var evaluator = activeComp.layers.addNull();
+            var evaluator = comp.layers.addNull();
             // Move the evaluator layer to the bottom to avoid messing up expressions which rely on layer indices
             evaluator.moveToEnd();
-            // Adding a new effect invalidates references to all other effects in the stack, so create all effects first
-            // before obtaining references to them. I thought JS was a garbage-collected language, Adobe!
-            for (var i = 0; i < 4; i++) {
+            // Each layer in a batch gets its own set of 4 points (see `bakeTransforms`). Adding a new effect invalidates
+            // references to all other effects in the stack, so create all effects first before obtaining references to
+            // them. I thought JS was a garbage-collected language, Adobe!
+            var batchSize = Math.max(Math.min(BAKE_BATCH_SIZE, numLayers), 1);
+            for (var i = 0; i < batchSize * 4; i++) {
                 evaluator.property("Effects").addProperty("ADBE Point3D Control");
             }
-            var evalPoint1 = evaluator.property("Effects").property(1);
-            var evalPoint2 = evaluator.property("Effects").property(2);
-            var evalPoint3 = evaluator.property("Effects").property(3);
-            var evalPoint4 = evaluator.property("Effects").property(4);
+            var points = [];
+            for (var i = 0; i < batchSize; i++) {
+                points.push([
+                    evaluator.property("Effects").property((i * 4) + 1).property(1),
+                    evaluator.property("Effects").property((i * 4) + 2).property(1),
+                    evaluator.property("Effects").property((i * 4) + 3).property(1),
+                    evaluator.property("Effects").property((i * 4) + 4).property(1)
+                ]);
+            }
+            return {comp: comp, layer: evaluator, points: points, selectedLayers: selectedLayers};
+        }
+
+        function removeEvaluator(evaluator) {
+            evaluator.layer.remove();
+            for (var i = 0; i < evaluator.selectedLayers.length; i++) {
+                evaluator.selectedLayers[i].selected = true;
+            }
         }
 
         // Takes as input a list of 4 transformed points and returns the 3x4 affine transformation matrix that applies
@@ -482,43 +660,139 @@
             ];
         };
 
-        function exportBakedTransform(layer) {
-            // It's possible to construct a 3D affine transform matrix given a mapping from 4 source points to 4 destination points.
-            // The source points are the arguments of the toWorld functions, and the destination points are their results.
-            // We calculate this affine transform matrix once per frame then decompose it on the Blender side.
-            evalPoint1.property(1).expression = "thisComp.layer(\"" + escapeStringForLiteral(layer.name) + "\").toWorld([0, 0, 0])";
-            evalPoint2.property(1).expression = "thisComp.layer(\"" + escapeStringForLiteral(layer.name) + "\").toWorld([1, 0, 0])";
-            evalPoint3.property(1).expression = "thisComp.layer(\"" + escapeStringForLiteral(layer.name) + "\").toWorld([0, 1, 0])";
-            evalPoint4.property(1).expression = "thisComp.layer(\"" + escapeStringForLiteral(layer.name) + "\").toWorld([0, 0, 1])";
-
-            // Bake keyframe data
-            var startEnd = startAndEndFrame(layer);
-            var startFrame = startEnd[0];
-            var endFrame = startEnd[1];
-
-            var keyframes = [];
-
-            for (var i = 0, n = (endFrame - startFrame) * settings.frameSuperSampling; i < n; i++) {
-                var frame = (i / settings.frameSuperSampling) + startFrame;
-                var time =  frame / activeComp.frameRate;
-                var point1Val = evalPoint1.property(1).valueAtTime(time, false /* preExpression */);
-                var point2Val = evalPoint2.property(1).valueAtTime(time, false /* preExpression */);
-                var point3Val = evalPoint3.property(1).valueAtTime(time, false /* preExpression */);
-                var point4Val = evalPoint4.property(1).valueAtTime(time, false /* preExpression */);
-                var matrix = pointsToAffineMatrix(
-                        point1Val,
-                        point2Val,
-                        point3Val,
-                        point4Val
-                );
-                keyframes.push(matrix);
+        // Bakes the transforms of a batch of layers, returning the samples taken of each one's transform matrix.
+        //
+        // It's possible to construct a 3D affine transform matrix given a mapping from 4 source points to 4 destination points.
+        // The source points are the arguments of the toWorld functions, and the destination points are their results.
+        // We calculate this affine transform matrix once per sample then decompose it on the Blender side.
+        //
+        // Evaluating an expression at a different time than the last one makes After Effects evaluate the comp again, so
+        // rather than baking one layer after another, each layer in the batch gets its own set of points and every layer
+        // is evaluated at each time before moving on to the next.
+        function bakeTransforms(evaluator, layers) {
+            var evalPoints = evaluator.points;
+            var tolerances = settings.adaptiveSampling ? bakedTransformTolerances(evaluator.comp) : null;
+            var batch = [];
+            for (var k = 0; k < layers.length; k++) {
+                var layerExpression = "thisComp.layer(\"" + escapeStringForLiteral(layers[k].name) + "\")";
+                evalPoints[k][0].expression = layerExpression + ".toWorld([0, 0, 0])";
+                evalPoints[k][1].expression = layerExpression + ".toWorld([1, 0, 0])";
+                evalPoints[k][2].expression = layerExpression + ".toWorld([0, 1, 0])";
+                evalPoints[k][3].expression = layerExpression + ".toWorld([0, 0, 1])";
+
+                var startEnd = startAndEndFrame(layers[k]);
+                var numSamples = (startEnd[1] - startEnd[0]) * settings.frameSuperSampling;
+                batch.push({
+                    startFrame: startEnd[0],
+                    sampler: settings.adaptiveSampling ?
+                        new AdaptiveSampler(
+                            numSamples, ADAPTIVE_COARSE_FRAMES * settings.frameSuperSampling, tolerances) :
+                        new UniformSampler(numSamples)
+                });
+            }
+            // The last batch can be smaller than the others. Clear the points it doesn't use, so they don't keep
+            // evaluating the previous batch's layers.
+            for (var k = layers.length; k < evalPoints.length; k++) {
+                for (var i = 0; i < 4; i++) {
+                    evalPoints[k][i].expression = '';
+                }
             }
 
-            return {
+            var current = null;
+            try {
+                while (true) {
+                    // Which layers need a sample at each sample time, counted in samples from the start of the comp
+                    var needed = {};
+                    var sampleTimes = [];
+                    for (var k = 0; k < batch.length; k++) {
+                        var indices = batch[k].sampler.next();
+                        var offset = batch[k].startFrame * settings.frameSuperSampling;
+                        for (var i = 0; i < indices.length; i++) {
+                            var sampleTime = indices[i] + offset;
+                            if (!needed.hasOwnProperty(sampleTime)) {
+                                needed[sampleTime] = [];
+                                sampleTimes.push(sampleTime);
+                            }
+                            needed[sampleTime].push(k);
+                        }
+                    }
+                    if (sampleTimes.length === 0) break;
+
+                    sampleTimes.sort(function(a, b) { return a - b; });
+                    for (var i = 0; i < sampleTimes.length; i++) {
+                        var layersNeeded = needed[sampleTimes[i]];
+                        for (var j = 0; j < layersNeeded.length; j++) {
+                            current = layersNeeded[j];
+                            var index = sampleTimes[i] - (batch[current].startFrame * settings.frameSuperSampling);
+                            var frame = (index / settings.frameSuperSampling) + batch[current].startFrame;
+                            var time =  frame / evaluator.comp.frameRate;
+                            var points = evalPoints[current];
+                            batch[current].sampler.set(index, pointsToAffineMatrix(
+                                points[0].valueAtTime(time, false /* preExpression */),
+                                points[1].valueAtTime(time, false /* preExpression */),
+                                points[2].valueAtTime(time, false /* preExpression */),
+                                points[3].valueAtTime(time, false /* preExpression */)
+                            ));
+                        }
+                    }
+                }
+            } catch (err) {
+                // Let the caller know which layer was being baked
+                if (current !== null) err.layer = layers[current];
+                throw err;
+            }
+
+            return batch.map(function(entry) {
+                return {startFrame: entry.startFrame, samples: entry.sampler.result()};
+            });
+        }
+
+        function bakedTransformTolerances(comp) {
+            // The translation column is in pixels, but the rest of the matrix is unitless; an error of e in it moves
+            // points about e * (their distance from the layer's origin), so scale the tolerance by the comp's size
+            var linearTolerance = settings.adaptiveTolerance / Math.max(comp.width, comp.height);
+            var tolerances = [];
+            for (var i = 0; i < 12; i++) {
+                tolerances.push(i % 4 === 3 ? settings.adaptiveTolerance : linearTolerance);
+            }
+            return tolerances;
+        }
+
+        function exportBakedTransform(bakedTransform) {
+            var startFrame = bakedTransform.startFrame;
+            var matrices = bakedTransform.samples.values;
+            var runs = null;
+            var sampleFrames = null;
+
+            if (settings.adaptiveSampling) {
+                sampleFrames = bakedTransform.samples.indices.map(function(i) {
+                    return (i / settings.frameSuperSampling) + startFrame;
+                });
+            } else {
+                // Layers that don't move for a while (or move in steps) repeat the same matrix many times in a row
+                runs = encodeRuns(matrices, arraysEqual);
+                if (runs) matrices = runs.values;
+            }
+
+            var keyframes = matrices;
+            if (keyframeWriter) {
+                // Binary keyframe data stores all the matrices one after another in a single flat array
+                keyframes = [];
+                for (var i = 0; i < matrices.length; i++) {
+                    for (var j = 0; j < matrices[i].length; j++) {
+                        keyframes.push(matrices[i][j]);
+                    }
+                }
+            }
+
+            var exportedTransform = {
                 startFrame: startFrame,
-                keyframes: keyframes,
+                keyframes: storeKeyframes(keyframes),
                 supersampling: settings.frameSuperSampling
-            }
+            };
+            if (runs) exportedTransform.runLengths = storeKeyframes(runs.lengths);
+            if (sampleFrames) exportedTransform.sampleFrames = storeKeyframes(sampleFrames);
+            return exportedTransform;
         }
 
         function exportProperty(prop, layer, exportedProp, channelOffset) {
@@ -593,6 +867,7 @@
                     var startEnd = startAndEndFrame(layer);
                     var startFrame = startEnd[0];
                     var endFrame = startEnd[1];
+                    var frameRate = layer.containingComp.frameRate;
 
                     for (var i = 0; i < numDimensions; i++) {
                         exportedProp.channels[i + channelOffset].isKeyframed = true;
@@ -602,12 +877,54 @@
                         exportedProp.channels[i + channelOffset].supersampling = settings.frameSuperSampling;
                     }
 
-                    for (var i = 0, n = (endFrame - startFrame) * settings.frameSuperSampling; i < n; i++) {
+                    function valueAt(i) {
                         var frame = (i / settings.frameSuperSampling) + startFrame;
-                        var time =  frame / activeComp.frameRate;
+                        var time =  frame / frameRate;
                         var propVal = prop.valueAtTime(time, false /* preExpression */);
+                        var value = [];
                         for (var j = 0; j < numDimensions; j++) {
-                            exportedProp.channels[j + channelOffset].keyframes.push(Array.isArray(propVal) ? propVal[j] : propVal);
+                            value.push(Array.isArray(propVal) ? propVal[j] : propVal);
+                        }
+                        return value;
+                    }
+
+                    var numSamples = (endFrame - startFrame) * settings.frameSuperSampling;
+
+                    if (settings.adaptiveSampling) {
+                        var tolerances = [];
+                        for (var j = 0; j < numDimensions; j++) {
+                            tolerances.push(settings.adaptiveTolerance);
+                        }
+                        var sampled = sampleAdaptive(
+                            valueAt, numSamples, ADAPTIVE_COARSE_FRAMES * settings.frameSuperSampling, tolerances);
+                        // All of the property's dimensions are sampled at the same times, so they share one array
+                        var sampleFrames = storeKeyframes(sampled.indices.map(function(i) {
+                            return (i / settings.frameSuperSampling) + startFrame;
+                        }));
+                        for (var i = 0; i < numDimensions; i++) {
+                            var channel = exportedProp.channels[i + channelOffset];
+                            channel.keyframes = storeKeyframes(sampled.values.map(function(value) { return value[i]; }));
+                            channel.sampleFrames = sampleFrames;
+                        }
+                    } else {
+                        for (var i = 0; i < numSamples; i++) {
+                            var value = valueAt(i);
+                            for (var j = 0; j < numDimensions; j++) {
+                                exportedProp.channels[j + channelOffset].keyframes.push(value[j]);
+                            }
+                        }
+
+                        for (var i = 0; i < numDimensions; i++) {
+                            var channel = exportedProp.channels[i + channelOffset];
+                            // Stepped animation (e.g. from posterizeTime) and holds repeat the same value many times
+                            // in a row, so store each run of repeated values once along with its length
+                            var runs = encodeRuns(channel.keyframes);
+                            if (runs) {
+                                channel.keyframesFormat = 'runs';
+                                channel.keyframes = runs.values;
+                                channel.runLengths = storeKeyframes(runs.lengths);
+                            }
+                            channel.keyframes = storeKeyframes(channel.keyframes);
                         }
                     }
                 }
@@ -637,13 +954,19 @@
                 } else {
                     exportedSource.type = 'unknown';
                 }
+            } else if (source instanceof CompItem) {
+                exportedSource.type = 'comp';
+                // Precomps which are exported too can be found from their layers
+                if (compIndices.hasOwnProperty(source.id)) {
+                    exportedSource.comp = compIndices[source.id];
+                }
             } else {
                 exportedSource.type = 'unknown';
             }
             return exportedSource;
         }
 
-        function exportLayer (layer) {
+        function exportLayer (layer, compIndex, bakedTransform) {
             var layerType;
             if (layer instanceof CameraLayer) {
                 layerType = 'camera';
@@ -657,14 +980,15 @@
                 name: layer.name,
                 type: layerType,
                 index: layer.index,
+                compIndex: compIndex,
                 parentIndex: layer.parent ? layer.parent.index : null,
-                inFrame: layer.inPoint * activeComp.frameRate,
-                outFrame: layer.outPoint * activeComp.frameRate,
+                inFrame: layer.inPoint * layer.containingComp.frameRate,
+                outFrame: layer.outPoint * layer.containingComp.frameRate,
                 enabled: layer.enabled
             };
 
             if (settings.bakeTransforms) {
-                exportedObject.transform = exportBakedTransform(layer);
+                exportedObject.transform = exportBakedTransform(bakedTransform);
             } else {
                 exportedObject.position = exportProperty(layer.position, layer);
                 exportedObject.rotationX = exportProperty(layer.xRotation, layer);
@@ -689,18 +1013,12 @@
 
             if (layer instanceof AVLayer) {
                 // Export layer source
-                var alreadyExported = false;
-                for (var i = 0; i < exportedSources.length; i++) {
-                    if (exportedSources[i] === layer.source) {
-                        alreadyExported = true;
-                        break;
-                    }
-                }
-                if (!alreadyExported) {
-                    exportedSources.push(layer.source);
-                    json.sources.push(exportSource(layer.source));
+                var source = layer.source;
+                if (!sourceIndices.hasOwnProperty(source.id)) {
+                    sourceIndices[source.id] = sources.length;
+                    sources.push(exportSource(source));
                 }
-                exportedObject.source = exportedSources.indexOf(layer.source);
+                exportedObject.source = sourceIndices[source.id];
 
                 if (!settings.bakeTransforms) {
                     exportedObject.anchorPoint = exportProperty(layer.anchorPoint, layer);
@@ -713,28 +1031,72 @@
             return exportedObject;
         }
 
+        var exported = false;
+        var evaluator = null;
         try {
-            for (var j = 0; j < layersToExport.length; j++) {
-                try {
-                    var exportedLayer = exportLayer(layersToExport[j]);
-                    json.layers.push(exportedLayer);
-                } catch (err) {
-                    // Give specific information on what layer is causing the problem
-                    // This allows the user to fix it by deselecting the layer, and makes debugging easier
-                    throw new Error('Error exporting layer "' + layersToExport[j].name + '"\nOn line ' + err.line + ': ' + err.message);
+            // Each layer is written out as soon as it's exported, so only one is held in memory at a time. The sources
+            // are only known once every layer has been exported, so they're written last.
+            var header = stringifyCompact(json);
+            jsonWriter.write(header.slice(0, -1) + ',"layers":[');
+
+            // Layers are written one composition after another
+            var numLayersWritten = 0;
+            for (var c = 0; c < comps.length; c++) {
+                var layersToExport = comps[c].layers;
+                if (settings.bakeTransforms && layersToExport.length > 0) {
+                    // Transforms can only be baked by an evaluator in the same composition as the layers
+                    evaluator = addEvaluator(comps[c].item, layersToExport.length);
+                }
+
+                var bakedTransforms = null;
+                for (var j = 0; j < layersToExport.length; j++) {
+                    try {
+                        var batchSize = evaluator ? evaluator.points.length : 1;
+                        if (settings.bakeTransforms && j % batchSize === 0) {
+                            // Only one batch's baked transforms are held in memory at a time
+                            bakedTransforms = bakeTransforms(evaluator, layersToExport.slice(j, j + batchSize));
+                        }
+                        var exportedLayer = exportLayer(
+                            layersToExport[j],
+                            c,
+                            settings.bakeTransforms ? bakedTransforms[j % batchSize] : null
+                        );
+                        jsonWriter.write(
+                            (numLayersWritten > 0 ? ',' : '') + stringifyCompact(exportedLayer, significantDigits));
+                        numLayersWritten++;
+                    } catch (err) {
+                        // Give specific information on what layer is causing the problem
+                        // This allows the user to fix it by deselecting the layer, and makes debugging easier
+                        var failedLayer = err.layer || layersToExport[j];
+                        var compName = comps.length > 1 ? ' in "' + comps[c].item.name + '"' : '';
+                        throw new Error('Error exporting layer "' + failedLayer.name + '"' + compName + '\nOn line ' + err.line + ': ' + err.message);
+                    }
+                }
+
+                if (evaluator) {
+                    removeEvaluator(evaluator);
+                    evaluator = null;
                 }
             }
+
+            jsonWriter.write('],"sources":' + stringifyCompact(sources, significantDigits) + '}');
+            exported = true;
         } finally {
-            if (settings.bakeTransforms) {
-                evaluator.remove();
-                for (var i = 0; i < selectedLayers.length; i++) {
-                    selectedLayers[i].selected = true;
+            if (evaluator) {
+                removeEvaluator(evaluator);
+            }
+            if (keyframeWriter) {
+                keyframeWriter.close();
+            }
+            jsonWriter.close();
+            // Don't leave half of a file behind
+            if (!exported) {
+                new File(savePath).remove();
+                if (keyframeWriter) {
+                    new File(keyframeDataPath).remove();
                 }
             }
         }
-
-        var savePath = settings.savePath.replace(/\.\w+$/, '.json');
-        writeTextFile(savePath, JSON.stringify(json, null, 2));
     }
 
     try {
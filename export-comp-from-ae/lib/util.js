@@ -106,6 +106,309 @@ function writeTextFile(fileOrPath, text) {
     }
 }
 
+// Rounds to the nearest integer, with ties going to the even one, the same way IEEE 754 rounds
+function roundHalfToEven(value) {
+    var whole = Math.floor(value);
+    var fraction = value - whole;
+    if (fraction > 0.5 || (fraction === 0.5 && whole % 2 !== 0)) whole++;
+    return whole;
+}
+
+// Returns the 4 bytes of a number, packed as a little-endian IEEE 754 single-precision float, as a binary string.
+// ExtendScript has no typed arrays, so the bits have to be worked out by hand.
+function packFloat32LE(value) {
+    var bits;
+    var sign = (value < 0 || (value === 0 && 1 / value < 0)) ? 0x80000000 : 0;
+    var magnitude = Math.abs(value);
+    if (magnitude !== magnitude) {
+        bits = 0x7fc00000;
+    } else if (magnitude === 0) {
+        bits = sign;
+    } else if (magnitude >= 3.4028235677973366e38) {
+        bits = sign + 0x7f800000;
+    } else if (magnitude < 1.1754943508222875e-38) {
+        // Subnormal
+        bits = sign + roundHalfToEven(magnitude / 1.401298464324817e-45);
+    } else {
+        var exponent = Math.floor(Math.log(magnitude) / Math.LN2);
+        // Math.log isn't exact, so correct the exponent if it's off by one
+        if (magnitude / Math.pow(2, exponent) >= 2) exponent++;
+        if (magnitude / Math.pow(2, exponent) < 1) exponent--;
+        var mantissa = roundHalfToEven((magnitude / Math.pow(2, exponent) - 1) * 8388608);
+        // Rounding can carry over into the exponent, which is also how rounding up to infinity works
+        bits = sign + (exponent + 127) * 8388608 + mantissa;
+    }
+    return String.fromCharCode(bits & 0xff, (bits >>> 8) & 0xff, (bits >>> 16) & 0xff, (bits >>> 24) & 0xff);
+}
+
+// Writes arrays of numbers to a binary file as packed little-endian 32-bit floats, one after another.
+function BinaryArrayWriter(fileOrPath) {
+    var filePath = fileOrPath.fsName || fileOrPath;
+    this.file = new File(filePath);
+    this.filePath = filePath;
+    this.byteLength = 0;
+    this.check();
+    this.file.open('w'); this.check();
+    this.file.encoding = 'BINARY'; this.check();
+}
+
+BinaryArrayWriter.prototype.check = function() {
+    if (this.file.error) throw new Error('Error writing file "' + this.filePath + '": ' + this.file.error);
+};
+
+// Appends an array of numbers to the file, and returns a reference to where it was written.
+BinaryArrayWriter.prototype.write = function(values) {
+    var packed = [];
+    for (var i = 0; i < values.length; i++) {
+        packed.push(packFloat32LE(values[i]));
+    }
+    this.file.write(packed.join('')); this.check();
+    var ref = {offset: this.byteLength, length: values.length};
+    this.byteLength += values.length * 4;
+    return ref;
+};
+
+BinaryArrayWriter.prototype.close = function() {
+    this.file.close(); this.check();
+};
+
+// Writes text to a file a piece at a time, so that all of it never has to be held in memory at once.
+function TextFileWriter(fileOrPath) {
+    var filePath = fileOrPath.fsName || fileOrPath;
+    this.file = new File(filePath);
+    this.filePath = filePath;
+    this.check();
+    this.file.open('w'); this.check();
+    this.file.encoding = 'UTF-8'; this.check();
+}
+
+TextFileWriter.prototype.check = function() {
+    if (this.file.error) throw new Error('Error writing file "' + this.filePath + '": ' + this.file.error);
+};
+
+TextFileWriter.prototype.write = function(text) {
+    this.file.write(text); this.check();
+};
+
+TextFileWriter.prototype.close = function() {
+    this.file.close(); this.check();
+};
+
+// Formats a number for JSON, rounding it to a given number of significant digits unless it's a whole number (so that
+// e.g. byte offsets stay exact). Numbers are written in full if `significantDigits` isn't given.
+function formatNumber(value, significantDigits) {
+    if (!isFinite(value)) return 'null';
+    if (!significantDigits || value % 1 === 0) return String(value);
+    // Drop the trailing zeros `toPrecision` pads the digits out with, e.g. "1.500000e-7" -> "1.5e-7"
+    return value.toPrecision(significantDigits).replace(/(\.\d*?)0+(e|$)/, '$1$2').replace(/\.(e|$)/, '$1');
+}
+
+// Like `JSON.stringify`, but with no whitespace, and with numbers rounded to a given number of significant digits (see
+// `formatNumber`). This makes large arrays of baked keyframes much smaller.
+function stringifyCompact(value, significantDigits) {
+    var parts = [];
+    function add(value) {
+        if (value === null) {
+            parts.push('null');
+            return;
+        }
+        switch (typeof value) {
+            case 'number': parts.push(formatNumber(value, significantDigits)); return;
+            case 'boolean': parts.push(value ? 'true' : 'false'); return;
+            case 'string': parts.push(JSON.stringify(value)); return;
+        }
+        if (Array.isArray(value)) {
+            parts.push('[');
+            for (var i = 0; i < value.length; i++) {
+                if (i > 0) parts.push(',');
+                if (typeof value[i] === 'undefined' || typeof value[i] === 'function') {
+                    parts.push('null');
+                } else {
+                    add(value[i]);
+                }
+            }
+            parts.push(']');
+            return;
+        }
+        parts.push('{');
+        var first = true;
+        for (var key in value) {
+            if (!value.hasOwnProperty(key) || typeof value[key] === 'undefined' || typeof value[key] === 'function') {
+                continue;
+            }
+            if (!first) parts.push(',');
+            first = false;
+            parts.push(JSON.stringify(key) + ':');
+            add(value[key]);
+        }
+        parts.push('}');
+    }
+    add(value);
+    return parts.join('');
+}
+
+function arraysEqual(a, b) {
+    if (a.length !== b.length) return false;
+    for (var i = 0; i < a.length; i++) {
+        if (a[i] !== b[i]) return false;
+    }
+    return true;
+}
+
+// Run-length encodes an array of samples: each run of consecutive equal samples (compared with `equal`, or === if not
+// given) is stored once, along with how many samples long it is. Returns null if there are too few repeated samples for
+// that to make the data any smaller, since every run also needs its length stored.
+function encodeRuns(samples, equal) {
+    var values = [];
+    var lengths = [];
+    for (var i = 0; i < samples.length; i++) {
+        var last = values.length - 1;
+        if (last >= 0 && (equal ? equal(values[last], samples[i]) : values[last] === samples[i])) {
+            lengths[last]++;
+        } else {
+            values.push(samples[i]);
+            lengths.push(1);
+        }
+    }
+    if (values.length * 2 >= samples.length) return null;
+    return {values: values, lengths: lengths};
+}
+
+// Samples a signal at only as many of its sample indices (from 0 to numSamples - 1) as are needed to reconstruct it with
+// linear interpolation. The signal is first sampled every `coarseStep` samples, and each span is split in half for as long
+// as the value halfway along it is further than `tolerances[j]` from the straight line between its ends, for any
+// component j. Samples in the middle of a hold (equal to both of their neighbours) are dropped.
+//
+// Sampling happens in rounds, so that several signals can be sampled together: `next()` returns the indices whose values
+// are needed for the next round (or an empty array once sampling is done), and `set(index, value)` gives the value at
+// each of them, as an array of components.
+function AdaptiveSampler(numSamples, coarseStep, tolerances) {
+    this.numSamples = numSamples;
+    this.coarseStep = coarseStep;
+    this.tolerances = tolerances;
+    // Values of the kept samples, and of the midpoints being tested this round, by index
+    this.values = {};
+    this.kept = [];
+    // Spans [start, end] whose midpoints are being tested, or null before the first round
+    this.spans = null;
+    this.testing = false;
+}
+
+AdaptiveSampler.prototype.next = function() {
+    var needed = [];
+    if (this.spans === null) {
+        this.spans = [];
+        for (var i = 0; i < this.numSamples; i += this.coarseStep) {
+            needed.push(i);
+        }
+        var end = this.numSamples - 1;
+        if (end >= 0 && needed[needed.length - 1] !== end) needed.push(end);
+        for (var i = 0; i < needed.length; i++) {
+            this.kept.push(needed[i]);
+            if (i > 0 && needed[i] - needed[i - 1] > 1) this.spans.push([needed[i - 1], needed[i]]);
+        }
+        return needed;
+    }
+
+    if (this.testing) {
+        var spans = [];
+        for (var i = 0; i < this.spans.length; i++) {
+            var a = this.spans[i][0];
+            var b = this.spans[i][1];
+            var mid = Math.floor((a + b) / 2);
+            if (this.withinTolerance(a, mid, b)) {
+                delete this.values[mid];
+                continue;
+            }
+            this.kept.push(mid);
+            if (mid - a > 1) spans.push([a, mid]);
+            if (b - mid > 1) spans.push([mid, b]);
+        }
+        this.spans = spans;
+    }
+
+    for (var i = 0; i < this.spans.length; i++) {
+        needed.push(Math.floor((this.spans[i][0] + this.spans[i][1]) / 2));
+    }
+    this.testing = needed.length > 0;
+    return needed;
+};
+
+AdaptiveSampler.prototype.set = function(index, value) {
+    this.values[index] = value;
+};
+
+AdaptiveSampler.prototype.withinTolerance = function(a, mid, b) {
+    var aValue = this.values[a];
+    var midValue = this.values[mid];
+    var bValue = this.values[b];
+    var t = (mid - a) / (b - a);
+    for (var j = 0; j < midValue.length; j++) {
+        if (Math.abs(midValue[j] - (aValue[j] + ((bValue[j] - aValue[j]) * t))) > this.tolerances[j]) return false;
+    }
+    return true;
+};
+
+// Returns the indices of the samples that were kept, in order, and their values.
+AdaptiveSampler.prototype.result = function() {
+    var kept = this.kept.sort(function(a, b) { return a - b; });
+    var indices = [];
+    var values = [];
+    for (var i = 0; i < kept.length; i++) {
+        var value = this.values[kept[i]];
+        var n = values.length;
+        if (n >= 2 && arraysEqual(values[n - 1], value) && arraysEqual(values[n - 2], value)) {
+            indices[n - 1] = kept[i];
+        } else {
+            indices.push(kept[i]);
+            values.push(value);
+        }
+    }
+    return {indices: indices, values: values};
+};
+
+// Samples a signal at every one of its sample indices, in the same way as `AdaptiveSampler`.
+function UniformSampler(numSamples) {
+    this.numSamples = numSamples;
+    this.values = [];
+    this.done = false;
+}
+
+UniformSampler.prototype.next = function() {
+    var needed = [];
+    if (!this.done) {
+        for (var i = 0; i < this.numSamples; i++) {
+            needed.push(i);
+        }
+        this.done = true;
+    }
+    return needed;
+};
+
+UniformSampler.prototype.set = function(index, value) {
+    this.values[index] = value;
+};
+
+UniformSampler.prototype.result = function() {
+    var indices = [];
+    for (var i = 0; i < this.values.length; i++) {
+        indices.push(i);
+    }
+    return {indices: indices, values: this.values};
+};
+
+// Adaptively samples a single signal (see `AdaptiveSampler`), where `evaluate(i)` returns its components at sample index
+// i. Returns the indices that were kept, and their values.
+function sampleAdaptive(evaluate, numSamples, coarseStep, tolerances) {
+    var sampler = new AdaptiveSampler(numSamples, coarseStep, tolerances);
+    for (var needed = sampler.next(); needed.length > 0; needed = sampler.next()) {
+        for (var i = 0; i < needed.length; i++) {
+            sampler.set(needed[i], evaluate(needed[i]));
+        }
+    }
+    return sampler.result();
+}
+
 function readSettingsFile(version) {
     try {
         var settings = JSON.parse(readTextFile(settingsFilePath));
@@ -1,14 +1,31 @@
-import json
 import bpy
 from bpy.types import Action, FCurve, Camera, TimelineMarker, Object
-from typing import Callable, Optional, Tuple, Protocol
+from typing import Dict, Generator, Iterable, List, Optional, Tuple, Protocol
 from bpy_extras.io_utils import ImportHelper
-from mathutils import Euler, Matrix, Quaternion, Vector
-from math import radians, pi, floor, ceil, isclose
+from math import radians, floor, ceil, isclose
 from fractions import Fraction
-from itertools import chain
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from abc import abstractmethod
+import os
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, strftime
+
+from .intervals import layer_in_out_frames, topmost_changes
+from .keyframes import write_keyframes
+from .materials import SourceMaterials, source_material_key
+from .plan import FCurvePlan, LayerPlan, LayerPlanner, PlanSettings
+from .simplify import SimplifyStats
+from .reader import CompReader
+from .model import Comp, CompFile, Layer, Source, add_layer, check_layers, load_header
+from .cache import comp_cache
+from .memory import MemoryEstimate, estimate_comp_memory
+from .result_cache import CachedComp, CachedResult, ResultCache, default_directory
+from .stats import ImportStats, NullImportStats
+from .sync import (
+    COMP_PROP, HASH_PROP, ROLE_LAYER, LayerObjects, layer_key, find_imported_objects, outermost_object, remove_layers
+)
 
 @dataclass
 class CameraLayer:
@@ -17,11 +34,79 @@ class CameraLayer:
     inFrame: int
     outFrame: int
 
+# Custom property identifying which source (and at what size) a shared layer mesh was made for
+MESH_KEY_PROP = 'ae_source'
+
+def layer_mesh_key(source: Source, width: float, height: float) -> str:
+    # Sources which look different need different meshes, since a layer's material is set on its mesh
+    return json.dumps([source.name, width, height, source_material_key(source)])
+
+def build_layer_mesh(mesh: 'bpy.types.Mesh', width: float, height: float):
+    '''Fills an empty mesh with the plane for an AV layer of the given size.'''
+    verts = [
+        (0, 0, -height),
+        (width, 0, -height),
+        (width, 0, 0),
+        (0, 0, 0)
+    ]
+    mesh.from_pydata(verts, [], [[0, 1, 2, 3]])
+    mesh.uv_layers.new()
+
+# Options which don't affect the objects an import creates, since they only affect the scene, which collections the
+# objects go in, or how the import runs. They're left out of the settings hashed for updating existing imports, and of
+# the result cache's key, so changing one doesn't re-import anything.
+UNHASHED_OPTIONS = (
+    'filepath', 'filter_glob', 'handle_framerate', 'use_comp_resolution', 'create_new_collection',
+    'adjust_frame_start_end', 'cameras_to_markers', 'sync_existing', 'use_result_cache', 'result_cache_dir',
+    'result_cache_size', 'refresh_result_cache', 'show_import_stats', 'import_stats_path', 'track_memory',
+    'memory_budget'
+)
+
+# Layers are planned on this many threads while the main thread applies the plans to the scene
+PLAN_WORKERS = os.cpu_count() or 1
+# How many layers can be planned ahead of the one being applied. Each finished plan holds all of its layer's keyframes,
+# so this is bounded to keep memory use down.
+MAX_PLANNED_AHEAD = PLAN_WORKERS * 2
+
+# How long a modal import works for on each timer event, before letting Blender redraw and handle input again
+MODAL_STEP_SECONDS = 0.05
+# Data that importing creates, which is removed again if a modal import is cancelled
+IMPORTED_ID_TYPES = ('objects', 'meshes', 'cameras', 'actions', 'materials', 'node_groups', 'images', 'collections')
+# Events a modal import lets through, so the viewport can still be navigated while it runs. Anything else could change
+# the data being imported into, so it's blocked.
+NAVIGATION_EVENTS = frozenset((
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM',
+    'NDOF_MOTION'
+))
+
+def run_steps(steps: Generator) -> set:
+    '''Runs all of an import's steps in one go, and returns its result.'''
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
 class IActionSlotManager(Protocol):
     @abstractmethod
-    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: dict, data_path: str, index = -1) -> 'FCurve':
+    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: Layer, data_path: str, index = -1) -> 'FCurve':
+        raise NotImplementedError
+
+    @abstractmethod
+    def fcurves_for_data_paths(
+        self,
+        dst_obj: 'bpy.types.Object',
+        ae_obj: Layer,
+        channels: Iterable[Tuple[str, int]]) -> list['FCurve']:
         raise NotImplementedError
 
+# F-curves are looked up by the ID they animate (by type and name, since e.g. a camera object and its camera data can
+# have the same name), plus their data path and index
+FCurveKey = Tuple[str, str, str, int]
+
+def fcurve_key(dst_obj: 'bpy.types.ID', data_path: str, index: int) -> FCurveKey:
+    return (dst_obj.id_type, dst_obj.name, data_path, index)
+
 '''
 Creates and maps imported AE objects to animation action slots. Some AE objects may be imported as nested sets of
 Blender objects, in which case both of them should get different slots in the same action.
@@ -30,14 +115,46 @@ Once Blender supports layering actions, we will likely be able to avoid encoding
 nested objects and just stack multiple action layers instead.
 '''
 class ActionSlotManager:
-    actions_by_ae_object: dict[str, Action]
-    slots_by_bpy_object: dict[str, 'bpy.types.ActionSlot']
+    strips_by_ae_object: dict[str, 'bpy.types.ActionKeyframeStrip']
+    channelbags_by_bpy_object: dict[Tuple[str, str], 'bpy.types.ActionChannelbag']
+    fcurves: dict[FCurveKey, 'FCurve']
 
     def __init__(self):
-        self.actions_by_ae_object = dict()
-        self.slots_by_bpy_object = dict()
+        self.strips_by_ae_object = dict()
+        self.channelbags_by_bpy_object = dict()
+        self.fcurves = dict()
+
+    def channelbag_for_object(self, dst_obj: 'bpy.types.ID', ae_obj: Layer) -> 'bpy.types.ActionChannelbag':
+        '''Returns the channelbag holding the F-curves for a given Blender object, creating its action and slot if
+        they do not exist yet.'''
+        obj_key = (dst_obj.id_type, dst_obj.name)
+        channelbag = self.channelbags_by_bpy_object.get(obj_key)
+        if channelbag is not None:
+            return channelbag
 
-    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: dict, data_path: str, index = -1) -> 'FCurve':
+        ae_name = ae_obj.name
+
+        # Create the action for this AE layer if it does not exist
+        strip = self.strips_by_ae_object.get(ae_name)
+        if strip is None:
+            action = bpy.data.actions.new(f'AE {ae_name} Action')
+            layer = action.layers.new('Layer')
+            strip = layer.strips.new(type='KEYFRAME')
+            self.strips_by_ae_object[ae_name] = strip
+        action = strip.id_data
+
+        # Create the slot within the action for this specific Blender object
+        slot = action.slots.new(id_type=dst_obj.id_type, name=dst_obj.name)
+        if dst_obj.animation_data is None:
+            dst_obj.animation_data_create()
+        dst_obj.animation_data.action = action
+        dst_obj.animation_data.action_slot = slot
+
+        channelbag = strip.channelbag(slot, ensure=True)
+        self.channelbags_by_bpy_object[obj_key] = channelbag
+        return channelbag
+
+    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: Layer, data_path: str, index = -1) -> 'FCurve':
         '''
         Returns an F-curve for a given data path on the specified Blender object, which corresponds to a certain After
         Effects layer. Creates one if it does not exist.
@@ -54,49 +171,62 @@ class ActionSlotManager:
             index (int, optional): The index of the property, for multidimensional properties like location, rotation,
             and scale.
         '''
+        return self.fcurves_for_data_paths(dst_obj, ae_obj, ((data_path, index),))[0]
 
-        ae_name = ae_obj['name']
-
-        # Create the action for this AE layer if it does not exist
-        try:
-            action = self.actions_by_ae_object[ae_name]
-            layer = action.layers.values()[0]
-            strip = layer.strips.values()[0]
-        except KeyError:
-            action = bpy.data.actions.new(f'AE {ae_name} Action')
-            layer = action.layers.new('Layer')
-            strip = layer.strips.new(type='KEYFRAME')
-            self.actions_by_ae_object[ae_name] = action
-
-        # Get the slot within the action for this specific Blender object
-        try:
-            slot = self.slots_by_bpy_object[dst_obj.name]
-        except KeyError:
-            slot = action.slots.new(id_type=dst_obj.id_type, name=dst_obj.name)
-            if dst_obj.animation_data is None:
-                dst_obj.animation_data_create()
-            dst_obj.animation_data.action = action
-            dst_obj.animation_data.action_slot = slot
-
-            self.slots_by_bpy_object[dst_obj.name] = slot
-
-        channelbag = strip.channelbag(slot, ensure=True)
-
-        fc = channelbag.fcurves.find(data_path, index=index)
-        if fc is None:
-            fc = channelbag.fcurves.new(data_path, index=index)
-
-        return fc
+    def fcurves_for_data_paths(
+        self,
+        dst_obj: 'bpy.types.Object',
+        ae_obj: Layer,
+        channels: Iterable[Tuple[str, int]]) -> list['FCurve']:
+        '''
+        Returns F-curves for several (data path, index) pairs on the specified Blender object at once, creating any
+        that do not exist. See `fcurve_for_data_path`.
+        '''
+        fcurves = []
+        channelbag = None
+        for data_path, index in channels:
+            key = fcurve_key(dst_obj, data_path, index)
+            fc = self.fcurves.get(key)
+            if fc is None:
+                if channelbag is None:
+                    channelbag = self.channelbag_for_object(dst_obj, ae_obj)
+                fc = channelbag.fcurves.find(data_path, index=index)
+                if fc is None:
+                    fc = channelbag.fcurves.new(data_path, index=index)
+                self.fcurves[key] = fc
+            fcurves.append(fc)
+        return fcurves
 
 '''
 Class that's compatible with ActionSlotManager but made for pre-4.4 versions of Blender.
 '''
 class LegacyActionSlotManager:
-    actions_by_ae_object: dict[str, Action]
+    actions_by_bpy_object: dict[Tuple[str, str], Action]
+    fcurves: dict[FCurveKey, 'FCurve']
+
     def __init__(self):
-        self.actions_by_ae_object = dict()
+        self.actions_by_bpy_object = dict()
+        self.fcurves = dict()
+
+    def action_for_object(self, dst_obj: 'bpy.types.ID') -> Action:
+        obj_key = (dst_obj.id_type, dst_obj.name)
+        action = self.actions_by_bpy_object.get(obj_key)
+        if action is not None:
+            return action
 
-    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: dict, data_path: str, index = -1) -> 'FCurve':
+        if dst_obj.animation_data is None:
+            dst_obj.animation_data_create()
+        if dst_obj.animation_data.action is None:
+            dst_obj.animation_data.action = bpy.data.actions.new(dst_obj.name + 'Action')
+        action = dst_obj.animation_data.action
+        self.actions_by_bpy_object[obj_key] = action
+
+        # Index any F-curves the action already has, so they're never scanned for again
+        for fc in action.fcurves:
+            self.fcurves.setdefault(fcurve_key(dst_obj, fc.data_path, fc.array_index), fc)
+        return action
+
+    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: Layer, data_path: str, index = -1) -> 'FCurve':
         '''
         Returns an F-curve for a given data path on the specified Blender object, which corresponds to a certain After
         Effects layer. Creates one if it does not exist.
@@ -112,21 +242,69 @@ class LegacyActionSlotManager:
             index (int, optional): The index of the property, for multidimensional properties like location, rotation,
             and scale.
         '''
+        return self.fcurves_for_data_paths(dst_obj, ae_obj, ((data_path, index),))[0]
 
-        if dst_obj.animation_data is None:
-            dst_obj.animation_data_create()
-        if dst_obj.animation_data.action is None:
-            dst_obj.animation_data.action = bpy.data.actions.new(dst_obj.name + 'Action')
+    def fcurves_for_data_paths(
+        self,
+        dst_obj: 'bpy.types.Object',
+        ae_obj: Layer,
+        channels: Iterable[Tuple[str, int]]) -> list['FCurve']:
+        '''
+        Returns F-curves for several (data path, index) pairs on the specified Blender object at once, creating any
+        that do not exist. See `fcurve_for_data_path`.
+        '''
+        fcurves = []
+        action = None
+        for data_path, index in channels:
+            # Single-dimension properties are stored at index 0
+            key = fcurve_key(dst_obj, data_path, max(index, 0))
+            fc = self.fcurves.get(key)
+            if fc is None:
+                if action is None:
+                    action = self.action_for_object(dst_obj)
+                    fc = self.fcurves.get(key)
+            if fc is None:
+                # the action didn't have the fcurve we needed, yet
+                fc = action.fcurves.new(data_path, index=index)
+                self.fcurves[key] = fc
+            fcurves.append(fc)
+        return fcurves
 
-        action = dst_obj.animation_data.action
-        for fc in action.fcurves:
-            if (fc.data_path != data_path):
-                continue
-            if index<0 or index==fc.array_index:
-                return fc
+'''
+Wraps another slot manager to time how long it takes to find and create F-curves, for import statistics.
+'''
+class TimedSlotManager:
+    slot_mgr: IActionSlotManager
+    stats: ImportStats
+
+    def __init__(self, slot_mgr: IActionSlotManager, stats: ImportStats):
+        self.slot_mgr = slot_mgr
+        self.stats = stats
 
-        # the action didn't have the fcurve we needed, yet
-        return action.fcurves.new(data_path, index=index)
+    def fcurve_for_data_path(self, dst_obj: 'bpy.types.Object', ae_obj: Layer, data_path: str, index = -1) -> 'FCurve':
+        with self.stats.phase('F-curves'):
+            return self.slot_mgr.fcurve_for_data_path(dst_obj, ae_obj, data_path, index)
+
+    def fcurves_for_data_paths(
+        self,
+        dst_obj: 'bpy.types.Object',
+        ae_obj: Layer,
+        channels: Iterable[Tuple[str, int]]) -> list['FCurve']:
+        with self.stats.phase('F-curves'):
+            return self.slot_mgr.fcurves_for_data_paths(dst_obj, ae_obj, channels)
+
+@dataclass
+class SharedImportState:
+    """Everything shared between the compositions imported from one file"""
+    slot_mgr: IActionSlotManager
+    simplify_stats: SimplifyStats
+    source_materials: SourceMaterials
+    # Every layer with the same source shares one mesh, across compositions and including those from a previous import
+    # being updated
+    meshes_by_key: Dict[str, 'bpy.types.Mesh']
+    sync_counts: Dict[str, int]
+    # Objects created for every composition, which are only selected once they've all been imported
+    added_objects: List['bpy.types.Object']
 
 class ImportAEComp(bpy.types.Operator, ImportHelper):
     """Import layers from an After Effects composition, as exported by the corresponding AE script"""
@@ -188,7 +366,8 @@ class ImportAEComp(bpy.types.Operator, ImportHelper):
 
     create_new_collection: bpy.props.BoolProperty(
         name="Create New Collection",
-        description="Add all the imported layers to a new collection.",
+        description="Add all the imported layers to a new collection. Files with more than one composition always get "
+        "one collection per composition.",
         default=False
     )
 
@@ -204,276 +383,595 @@ class ImportAEComp(bpy.types.Operator, ImportHelper):
         default=False
     )
 
-    def import_bezier_keyframe_channel(self, fcurve: 'FCurve', keyframes, framerate: float, mul = 1.0, add = 0.0):
-        '''Imports a given keyframe channel in Bezier format onto a given F-curve.
+    simplify_baked: bpy.props.BoolProperty(
+        name="Simplify Baked Keyframes",
+        description="Fit baked channels with as few keyframes as possible instead of creating one keyframe per sample",
+        default=False
+    )
+
+    simplify_tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        description="Largest error allowed when simplifying baked locations and other non-rotation values",
+        subtype='DISTANCE',
+        min=0.0,
+        default=0.001,
+        precision=4
+    )
 
-        Args:
-            fcurve (FCurve): The F-curve to import the keyframes into.
-            keyframes: The keyframes.
-            framerate (float): The scene's framerate.
-            mul (float, optional): Multiply all keyframes by this value. Defaults to 1.
-            add (float, optional): Add this value to all keyframes. Defaults to 0.
-        '''
-        fcurve.keyframe_points.add(len(keyframes))
-        for i, keyframe in enumerate(keyframes):
-            k = fcurve.keyframe_points[i]
-            if keyframe['interpolationOut'] == 'hold':
-                k.interpolation = 'CONSTANT'
-            k.handle_left_type = 'FREE'
-            k.handle_right_type = 'FREE'
-            x = keyframe['time'] * framerate
-            y = keyframe['value']
-            k.co = [x, y * mul + add]
-            if i > 0:
-                # After Effects keyframe handles have a "speed" (in units per second) which determines the vertical
-                # position of the handle, and an "influence" (as a percentage of the distance to the previous/next
-                # keyframe) which determines the horizontal position and also scales the vertical position.
-                easeIn = keyframe['easeIn']
-                prev_to_cur_duration = (keyframe['time'] - keyframes[i - 1]['time']) * framerate
-                influence = easeIn['influence'] * 0.01
-                k.handle_left = [
-                    x - (prev_to_cur_duration * influence),
-                    (y - (easeIn['speed'] * influence * (prev_to_cur_duration / framerate))) * mul + add
-                ]
-            if i != len(keyframes) - 1:
-                easeOut = keyframe['easeOut']
-                cur_to_next_duration = (keyframes[i + 1]['time'] - keyframe['time']) * framerate
-                influence = easeOut['influence'] * 0.01
-                k.handle_right = [
-                    x + (cur_to_next_duration * influence),
-                    (y + (easeOut['speed'] * influence * (cur_to_next_duration / framerate))) * mul + add
-                ]
-
-    def import_baked_keyframe_channel(
-        self,
-        fcurve: FCurve,
-        keyframes,
-        start_frame: int,
-        comp_framerate: float,
-        desired_framerate: float,
-        supersampling_rate: int,
-        mul = 1.0,
-        add = 0.0):
-        '''Import a given keyframe channel in "calculated"/baked format onto a given F-curve.
+    simplify_angle_tolerance: bpy.props.FloatProperty(
+        name="Angle Tolerance",
+        description="Largest error allowed when simplifying baked rotations",
+        subtype='ANGLE',
+        min=0.0,
+        default=radians(0.05),
+        precision=3
+    )
 
-        Args:
-            fcurve (FCurve): The F-curve to import the keyframes into.
-            keyframes: The keyframes.
-            start_frame (int): The frame number at which the keyframe data starts.
-            comp_framerate (float): The comp's framerate.
-            desired_framerate (float): The desired framerate.
-            supersampling_rate (int): Multiplier for the framerate; this many keyframes will be created per frame.
-            mul (int, optional): Multiply all keyframes by this value. Defaults to 1.
-            add (int, optional): Add this value to all keyframes. Defaults to 0.
-        '''
-        fcurve.keyframe_points.add(len(keyframes))
-        for i, keyframe in enumerate(keyframes):
-            k = fcurve.keyframe_points[i]
-            k.co_ui = [(((i / supersampling_rate) + start_frame) * desired_framerate) / comp_framerate, keyframe * mul + add]
-            k.interpolation = 'LINEAR'
+    baked_samples: bpy.props.BoolProperty(
+        name="Baked Keyframes as Samples",
+        description="Store baked channels as sample points instead of keyframes, which use less memory and are faster "
+        "to evaluate. Sample points have no handles or interpolation and can't be edited in the Graph Editor until "
+        "they're converted back with Channel > Samples to Keys. Supersampled channels, ones whose frame times were "
+        "remapped, and ones that are simplified stay as keyframes",
+        default=False
+    )
+
+    import_materials: bpy.props.BoolProperty(
+        name="Footage Materials",
+        description="Give footage layers materials showing their image or video, or their color for solids, faded by "
+        "the layer's opacity. Footage files are only read when they're first displayed",
+        default=False
+    )
+
+    hide_outside_in_out: bpy.props.BoolProperty(
+        name="Hide Outside In/Out Points",
+        description="Keyframe each layer's Disable in Viewports and Disable in Renders settings so it's only visible "
+        "between its in and out points, and always hide disabled layers",
+        default=False
+    )
+
+    sync_existing: bpy.props.BoolProperty(
+        name="Update Existing Import",
+        description="If this composition was imported into the scene before, update that import in place: only layers "
+        "whose data changed are re-imported, new layers are added, and deleted layers are removed",
+        default=False
+    )
+
+    use_result_cache: bpy.props.BoolProperty(
+        name="Cache Import Results",
+        description="Save the imported objects to a .blend file in the cache folder, and append them from there "
+        "instead of importing again the next time the same file is imported with the same options. Not used when "
+        "updating an existing import",
+        default=False
+    )
+
+    result_cache_dir: bpy.props.StringProperty(
+        name="Cache Folder",
+        description="Folder to keep cached import results in, which can be shared between machines. If empty, a folder "
+        "in this add-on's user data is used",
+        subtype='DIR_PATH',
+        default=""
+    )
+
+    result_cache_size: bpy.props.IntProperty(
+        name="Cache Size Limit",
+        description="Largest total size of the cached import results, in megabytes. The least recently used ones are "
+        "removed to stay under it",
+        min=1,
+        default=4096
+    )
+
+    refresh_result_cache: bpy.props.BoolProperty(
+        name="Refresh Cached Result",
+        description="Import the file even if its result is cached, and replace the cached result",
+        default=False
+    )
+
+    show_import_stats: bpy.props.BoolProperty(
+        name="Show Import Statistics",
+        description="Report how long each part of the import took, how much was imported, and the slowest layers",
+        default=False
+    )
+
+    import_stats_path: bpy.props.StringProperty(
+        name="Statistics Log",
+        description="If set, append the import statistics to this file as a line of JSON",
+        subtype='FILE_PATH',
+        default=""
+    )
+
+    track_memory: bpy.props.BoolProperty(
+        name="Track Peak Memory",
+        description="Include the peak memory Python allocates during each part of the import in the statistics. This "
+        "can make reading and decoding the file several times slower",
+        default=False
+    )
+
+    memory_budget: bpy.props.IntProperty(
+        name="Memory Budget",
+        description="If the import is estimated to need more than this many megabytes of memory, stop before creating "
+        "anything and suggest options which use less. 0 for no limit",
+        min=0,
+        default=0
+    )
 
-    def import_property(
+    def apply_fcurves(
         self,
         slot_mgr: IActionSlotManager,
-        obj: 'bpy.types.Object',
-        ae_obj: dict,
-        data_path: str,
-        data_index: int,
-        prop_data,
-        comp_framerate: float,
-        desired_framerate: float,
-        mul = 1.0,
-        add = 0.0):
-        '''Imports a given property from the JSON file onto a given Blender object.
+        dst: 'bpy.types.ID',
+        ae_obj: Layer,
+        fcurve_plans: List[FCurvePlan]):
+        '''Writes planned keyframes onto the F-curves of a given Blender object or object data.
 
         Args:
             slot_mgr (IActionSlotManager): Object for managing animation action slots.
-            obj (bpy_struct): The object to import the property onto.
-            ae_obj (bpy_struct): The After Effects layer object that this property is part of.
-            data_path (str): The destination data path of the property.
-            data_index (int): The index into the destination data path, for multidimensional properties. -1 for single-dimension properties.
-            prop_data: The JSON property data.
-            comp_framerate (float): The comp's framerate.
-            desired_framerate (float): The desired framerate.
-            mul (float, optional): Multiply the property by this value. Defaults to 1.
-            add (float, optional): Add this value to the property. Defaults to 0.
+            dst (ID): The object or object data to animate.
+            ae_obj (Layer): The After Effects layer that the keyframes are part of.
+            fcurve_plans (list[FCurvePlan]): The keyframes for each F-curve.
         '''
-        if prop_data['isKeyframed']:
-            fcurve = slot_mgr.fcurve_for_data_path(obj, ae_obj, data_path, data_index)
-            if prop_data['keyframesFormat'] == 'bezier':
-                self.import_bezier_keyframe_channel(
-                    fcurve,
-                    prop_data['keyframes'],
-                    desired_framerate,
-                    mul,
-                    add
-                )
-            else:
-                self.import_baked_keyframe_channel(
+        if not fcurve_plans:
+            return
+        stats = self.import_stats
+        with stats.phase('keyframes'):
+            fcurves = slot_mgr.fcurves_for_data_paths(
+                dst,
+                ae_obj,
+                ((fcurve_plan.data_path, fcurve_plan.index) for fcurve_plan in fcurve_plans)
+            )
+            stats.count('F-curves', len(fcurve_plans))
+            for fcurve, fcurve_plan in zip(fcurves, fcurve_plans):
+                write_keyframes(
                     fcurve,
-                    prop_data['keyframes'],
-                    prop_data['startFrame'],
-                    comp_framerate,
-                    desired_framerate,
-                    prop_data.get('supersampling', 1),
-                    mul,
-                    add
+                    fcurve_plan.co,
+                    fcurve_plan.interpolation,
+                    fcurve_plan.handle_left,
+                    fcurve_plan.handle_right
                 )
-        else:
-            cur_val = getattr(obj, data_path)
-            if data_index == -1:
-                cur_val = prop_data['value'] * mul + add
-            else:
-                cur_val[data_index] = prop_data['value'] * mul + add
-            setattr(obj, data_path, cur_val)
+                if fcurve_plan.samples:
+                    # The end frame is exclusive
+                    fcurve.convert_to_samples(int(fcurve_plan.co[0, 0]), int(fcurve_plan.co[-1, 0]) + 1)
+                    stats.count('sample points', len(fcurve_plan.co))
+                else:
+                    stats.count('keyframes', len(fcurve_plan.co))
 
-    def import_baked_transform(
-        self,
-        slot_mgr: IActionSlotManager,
-        obj: 'bpy.types.Object',
-        ae_obj: dict,
-        data,
-        comp_framerate: float,
-        desired_framerate: float,
-        func: Optional[
-            Callable[
-                ['Vector', 'Quaternion', 'Vector'],
-                Tuple['Vector', 'Quaternion', 'Vector']
-            ]
-        ] = None):
-        '''Import a baked transform (one 4x4 transform matrix per frame) onto a given Blender object.
+    def apply_properties(self, dst: 'bpy.types.ID', properties: List[Tuple[str, int, object]]):
+        '''Sets planned static property values on a given Blender object or object data.
 
         Args:
-            slot_mgr (IActionSlotManager): Object for managing animation action slots.
-            obj (bpy_struct): The object to import the property onto.
-            ae_obj (bpy_struct): The After Effects layer object that this property is part of.
-            data: The JSON transform data.
-            comp_framerate (float): The comp's framerate.
-            desired_framerate (float): The desired framerate.
-            func ((Vector, Quaternion, Vector) -> (Vector, Quaternion, Vector), optional): Function to call on each keyframe.
+            dst (ID): The object or object data to set the properties on.
+            properties (list): (data path, index, value) for each property. An index of -1 sets the whole property.
         '''
-        obj.rotation_mode = 'QUATERNION'
-
-        loc_fcurves = [slot_mgr.fcurve_for_data_path(obj, ae_obj, 'location', index) for index in range(3)]
-        rot_fcurves = [slot_mgr.fcurve_for_data_path(obj, ae_obj, 'rotation_quaternion', index) for index in range(4)]
-        scale_fcurves = [slot_mgr.fcurve_for_data_path(obj, ae_obj, 'scale', index) for index in range(3)]
-
-        keyframes = data['keyframes']
-        start_frame = data['startFrame']
-        supersampling_rate = data.get('supersampling', 1)
-
-        for fcurve in chain(loc_fcurves, rot_fcurves, scale_fcurves):
-            fcurve.keyframe_points.add(len(keyframes))
-
-        prev_rot = None
-        for i, keyframe in enumerate(keyframes):
-            mat = Matrix((
-                (keyframe[0], keyframe[1], keyframe[2], keyframe[3]),
-                (keyframe[4], keyframe[5], keyframe[6], keyframe[7]),
-                (keyframe[8], keyframe[9], keyframe[10], keyframe[11]),
-                (0.0, 0.0, 0.0, 1.0)
-            ))
-            loc, rot, scale = mat.decompose()
-
-            if func is not None:
-                loc, rot, scale = func(loc, rot, scale)
-
-            if prev_rot is not None:
-                rot.make_compatible(prev_rot)
-            prev_rot = rot
-
-            kx = (((i / supersampling_rate) + start_frame) * desired_framerate) / comp_framerate
-            for j in range(3):
-                k = loc_fcurves[j].keyframe_points[i]
-                k.co_ui = [kx, loc[j]]
-                k.interpolation = 'LINEAR'
-            for j in range(4):
-                k = rot_fcurves[j].keyframe_points[i]
-                k.co_ui = [kx, rot[j]]
-                k.interpolation = 'LINEAR'
-            for j in range(3):
-                k = scale_fcurves[j].keyframe_points[i]
-                k.co_ui = [kx, scale[j]]
-                k.interpolation = 'LINEAR'
-
-    def import_property_spatial(
+        for data_path, index, value in properties:
+            if data_path.startswith('["'):
+                # Custom property
+                dst[data_path[2:-2]] = value
+            elif index == -1:
+                setattr(dst, data_path, value)
+            else:
+                cur_val = getattr(dst, data_path)
+                cur_val[index] = value
+                setattr(dst, data_path, cur_val)
+
+    def invoke(self, context, event):
+        # Imports started from the file browser run modally. Scripts call execute directly, so they run in one go.
+        self.modal_requested = True
+        self.steps = None
+        return ImportHelper.invoke(self, context, event)
+
+    def execute(self, context):
+        # Updating an existing import changes objects in place, which couldn't be undone if it was cancelled partway
+        # through, so it always runs in one go. Redos call execute again without invoking first, so they do too.
+        modal = getattr(self, 'modal_requested', False) and not bpy.app.background and not self.sync_existing
+        self.modal_requested = False
+
+        if self.show_import_stats or self.import_stats_path:
+            self.import_stats = ImportStats(track_memory=self.track_memory)
+        else:
+            self.import_stats = NullImportStats()
+        self.progress_steps = 0
+        self.total_steps = 0
+
+        steps = self.import_steps(context)
+        if modal:
+            return self.start_modal(context, steps)
+        try:
+            result = run_steps(steps)
+        finally:
+            self.import_stats.finish()
+        if 'FINISHED' in result:
+            self.report_import_stats()
+        return result
+
+    def import_steps(self, context: 'bpy.types.Context') -> Generator[None, None, set]:
+        '''Imports the file, yielding after each step (decoding a layer, or importing one) so that a modal import can
+        spread the work out. Returns the operator's result.'''
+        if self.use_result_cache and not self.sync_existing:
+            # Updating an existing import changes objects in place, which appending new ones can't do
+            return (yield from self.import_with_result_cache(context))
+        return (yield from self.read_and_import(context))
+
+    def start_modal(self, context: 'bpy.types.Context', steps: Generator[None, None, set]) -> set:
+        '''Starts running an import's steps a few at a time on timer events, so that Blender stays responsive, shows
+        the import's progress, and can cancel it with Esc.'''
+        wm = context.window_manager
+        self.steps = steps
+        # Anything that isn't here yet once the import is cancelled was created by it
+        self.existing_ids = {name: set(getattr(bpy.data, name)) for name in IMPORTED_ID_TYPES}
+        self.timer = wm.event_timer_add(0.001, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0.0, 1.0)
+        self.show_progress(context)
+        return {'RUNNING_MODAL'}
+
+    def show_progress(self, context: 'bpy.types.Context'):
+        progress = self.progress_steps / self.total_steps if self.total_steps else 0.0
+        context.window_manager.progress_update(progress)
+        if context.workspace is not None:
+            context.workspace.status_text_set(
+                f'Importing {os.path.basename(self.filepath)}: {progress:.0%} (Esc to cancel)'
+            )
+
+    def stop_modal(self, context: 'bpy.types.Context'):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        if context.workspace is not None:
+            context.workspace.status_text_set(None)
+        self.import_stats.finish()
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.cancel(context)
+            self.remove_imported_data()
+            self.report({'WARNING'}, 'Import cancelled')
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            # Named timers (like the one that shows reports) still have to run
+            if event.type.startswith('TIMER') or event.type in NAVIGATION_EVENTS:
+                return {'PASS_THROUGH'}
+            return {'RUNNING_MODAL'}
+
+        deadline = perf_counter() + MODAL_STEP_SECONDS
+        try:
+            while perf_counter() < deadline:
+                next(self.steps)
+        except StopIteration as stop:
+            self.stop_modal(context)
+            if 'FINISHED' in stop.value:
+                self.report_import_stats()
+            return stop.value
+        except BaseException:
+            # Don't leave a half-finished import behind
+            self.cancel(context)
+            self.remove_imported_data()
+            raise
+        self.show_progress(context)
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context):
+        '''Stops a modal import. Blender calls this itself if it has to stop the import (like when another file is
+        opened, or the file browser is closed before an import starts), in which case whatever was already imported is
+        left alone.'''
+        if self.steps is None:
+            return
+        # Stops the import where it is, closing the file and any other resources it holds
+        self.steps.close()
+        self.steps = None
+        self.stop_modal(context)
+
+    def remove_imported_data(self):
+        '''Removes everything a cancelled modal import created.'''
+        bpy.data.batch_remove([
+            id_data
+            for name in IMPORTED_ID_TYPES
+            for id_data in getattr(bpy.data, name)
+            if id_data not in self.existing_ids[name]
+        ])
+
+    def report_import_stats(self):
+        stats = self.import_stats
+        if self.show_import_stats:
+            self.report({'INFO'}, stats.report())
+        if self.import_stats_path:
+            entry = {
+                'time': strftime('%Y-%m-%dT%H:%M:%S'),
+                'file': self.filepath,
+                'options': self.as_keywords(ignore=('filepath', 'filter_glob', 'import_stats_path')),
+                **stats.to_dict()
+            }
+            try:
+                with open(bpy.path.abspath(self.import_stats_path), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError as err:
+                self.report({'WARNING'}, f'Couldn\'t write import statistics: {err}')
+
+    def result_cache_options(self, context: 'bpy.types.Context') -> dict:
+        '''Returns every option that affects the objects an import creates, for the result cache's key. Options that
+        only affect the scene or which collections the objects go in are applied after appending cached objects, so
+        they're left out.'''
+        options = self.as_keywords(ignore=UNHASHED_OPTIONS)
+        # Frame times are only remapped to the scene's frame rate with "Remap Frame Times"; otherwise, they're always in
+        # the composition's frame rate
+        options['remapFramerate'] = context.scene.render.fps if self.handle_framerate == 'remap_times' else None
+        return options
+
+    def import_with_result_cache(self, context: 'bpy.types.Context') -> Generator[None, None, set]:
+        '''Appends the result of a previous import of the same file with the same options from the result cache, or
+        imports the file (in steps, like `import_steps`) and adds the result to the cache.'''
+        stats = self.import_stats
+        if self.result_cache_dir:
+            directory = bpy.path.abspath(self.result_cache_dir)
+        else:
+            directory = default_directory(__package__)
+        result_cache = ResultCache(directory, self.result_cache_size << 20)
+
+        try:
+            with stats.phase('result cache'):
+                with CompReader(self.filepath) as reader:
+                    keyframe_data_path = reader.keyframe_data_path
+                paths = [self.filepath] if keyframe_data_path is None else [self.filepath, keyframe_data_path]
+                key = result_cache.key(paths, self.result_cache_options(context))
+        except (OSError, ValueError):
+            # Whatever's wrong with the file gets reported by importing it
+            return (yield from self.read_and_import(context))
+
+        if not self.refresh_result_cache:
+            with stats.phase('result cache'):
+                cached_result = result_cache.describe(key)
+            if cached_result is not None:
+                if cached_result.memory is not None and not self.check_memory_budget(cached_result.memory):
+                    return {'CANCELLED'}
+                with stats.phase('result cache'):
+                    comp_objects = result_cache.load(key, cached_result)
+                if comp_objects is not None:
+                    stats.count('cached results')
+                    return self.import_cached_result(context, cached_result, comp_objects)
+
+        self.import_result = None
+        result = yield from self.read_and_import(context)
+        if 'FINISHED' in result and self.import_result is not None:
+            cached_result, objects = self.import_result
+            self.import_result = None
+            try:
+                with stats.phase('result cache'):
+                    result_cache.save(key, cached_result, objects)
+            except (OSError, RuntimeError) as err:
+                self.report({'WARNING'}, f'Couldn\'t save the import to the result cache: {err}')
+        return result
+
+    def import_cached_result(
         self,
-        slot_mgr: IActionSlotManager,
-        obj: 'bpy.types.Object',
-        ae_obj: dict,
-        data_path: str,
-        prop_data,
-        comp_framerate: float,
-        desired_framerate: float,
-        swizzle: Tuple[int, int, int],
-        mul: Tuple[float, float, float],
-        add: Tuple[float, float, float] = (0.0, 0.0, 0.0)
-    ):
-        '''Import a 3D spatial property.
+        context: 'bpy.types.Context',
+        result: CachedResult,
+        comp_objects: List[List['bpy.types.Object']]):
+        '''Adds objects appended from the result cache to the scene, the same way importing them would have.
 
         Args:
-            slot_mgr (IActionSlotManager): Object for managing animation action slots.
-            obj (bpy_struct): The object to import the property onto.
-            ae_obj (bpy_struct): The After Effects layer object that this property is part of.
-            data_path (str): The destination property's data path.
-            prop_data: The JSON property data.
-            comp_framerate (float): The comp's framerate.
-            desired_framerate (float): The desired framerate.
-            swizzle (int, int, int): The indices to place the destination values onto (e.g. (0, 2, 1) to map
-                the channel with source index 1 to destination index 2, and vice versa).
-            mul (float, float, float): The (pre-swizzle) values to multiply the keyframe values by.
-            add (float, float, float): The (pre-swizzle) values to add to the keyframe values.
+            context (Context): The context to import into.
+            result (CachedResult): The cached import.
+            comp_objects (list[list[Object]]): Each composition's appended objects.
         '''
-        for i in range(3):
-            self.import_property(
-                slot_mgr=slot_mgr,
-                obj=obj,
-                ae_obj=ae_obj,
-                data_path=data_path,
-                data_index=swizzle[i],
-                prop_data=prop_data['channels'][i],
-                comp_framerate=comp_framerate,
-                desired_framerate=desired_framerate,
-                mul=mul[i],
-                add=add[i]
-            )
+        stats = self.import_stats
+        added_objects = []
+        with stats.phase('collections'):
+            for comp, objects in zip(result.comps, comp_objects):
+                if self.create_new_collection or len(result.comps) > 1:
+                    dst_collection = bpy.data.collections.new(comp.name)
+                else:
+                    dst_collection = context.collection
+                collection_objects = dst_collection.objects
+                for obj in objects:
+                    collection_objects.link(obj)
+                if dst_collection != context.collection:
+                    context.collection.children.link(dst_collection)
+                added_objects.extend(objects)
+            for obj in added_objects:
+                obj.select_set(True)
+
+        with stats.phase('view layer update'):
+            context.view_layer.update()
+        stats.count('objects', len(added_objects))
+
+        objects_by_name = {
+            name: obj
+            for comp, objects in zip(result.comps, comp_objects)
+            for name, obj in zip(comp.object_names, objects)
+        }
+        cameras = [
+            CameraLayer(objects_by_name[name], in_frame, out_frame) for name, in_frame, out_frame in result.cameras
+        ]
+        self.apply_scene_settings(context, result.primary_comp, cameras)
+
+        self.report({'INFO'}, f'Appended {len(added_objects)} objects from the result cache')
+        return {'FINISHED'}
 
-    def execute(self, context):
-        scale_factor = self.scale_factor
+    def read_and_import(self, context: 'bpy.types.Context') -> Generator[None, None, set]:
+        '''Reads the file (or reuses it, if it was read by a previous run) and imports it, in steps like
+        `import_steps`.'''
+        stats = self.import_stats
+
+        # Every change made in the redo panel runs the import again, so the file's model is kept around between runs as
+        # long as the file hasn't changed
+        with stats.phase('read'):
+            cache_key = comp_cache.key(self.filepath)
+            comp_file = comp_cache.get(cache_key)
+        if comp_file is not None:
+            stats.count('cached files')
+            self.total_steps = comp_file.num_layers
+            return (yield from self.import_comps(context, comp_file))
+
+        with stats.phase('read'):
+            reader = CompReader(self.filepath)
+        with reader:
+            data = reader.header
+            fileVersion = data.get('version')
+            # Versions 4 through 7 only add binary keyframe data, run-length encoded samples, adaptive sampling, and
+            # multiple compositions, so version 3 files can still be imported
+            if fileVersion not in (3, 4, 5, 6, 7):
+                if fileVersion is None:
+                    warning = 'This isn\'t a valid exported file in the correct format.'
+                elif fileVersion > 7:
+                    warning = 'This file is too new. Update this add-on.'
+                else:
+                    warning = 'This file is too old. Re-export it using a newer version of this add-on.'
+                self.report({'WARNING'}, warning)
+                return {'CANCELLED'}
+
+            try:
+                with stats.phase('read'):
+                    reader.open_keyframe_data()
+            except FileNotFoundError:
+                self.report(
+                    {'WARNING'},
+                    f'Couldn\'t find the keyframe data file "{reader.keyframe_data_path}". It must be kept in the same '
+                    'folder as the exported .json file.'
+                )
+                return {'CANCELLED'}
+            except ValueError as err:
+                self.report({'WARNING'}, str(err))
+                return {'CANCELLED'}
+
+            # Each layer is decoded and then imported
+            self.total_steps = reader.num_layers * 2
+
+            dependency_paths = [] if reader.keyframe_data_path is None else [reader.keyframe_data_path]
+            size = reader.size + sum(os.path.getsize(path) for path in dependency_paths)
+            stats.count('bytes read', size)
+            cacheable = comp_cache.can_fit(size)
+
+            # The whole file is checked and converted to the model before anything is created in the scene, so a
+            # malformed file is rejected rather than left half-imported. Layers are decoded one at a time, and only
+            # their compact model is kept. Cached models can't refer to the memory-mapped keyframe data file, which is
+            # closed after this.
+            try:
+                with stats.phase('decode'):
+                    comp_file = load_header(data)
+                for layer_data in stats.timed(reader.layers(), 'decode'):
+                    with stats.phase('decode'):
+                        add_layer(comp_file, layer_data, copy=cacheable)
+                    self.progress_steps += 1
+                    yield
+                with stats.phase('decode'):
+                    check_layers(comp_file)
+            except ValueError as err:
+                self.report({'WARNING'}, f'This file couldn\'t be imported: {err}')
+                return {'CANCELLED'}
+
+            if cacheable:
+                comp_cache.put(cache_key, comp_file, size, dependency_paths)
+            return (yield from self.import_comps(context, comp_file))
+
+    def desired_framerate(self, context: 'bpy.types.Context', comp: Comp) -> float:
+        '''Returns the frame rate that a composition's frame times are converted to.'''
+        if self.handle_framerate == 'remap_times':
+            return context.scene.render.fps
+        return comp.frame_rate
 
-        with open(self.filepath) as f:
-            data = json.load(f)
+    def import_comps(self, context: 'bpy.types.Context', comp_file: CompFile) -> Generator[None, None, set]:
+        '''Imports every composition in an exported file into the scene, yielding after each layer.
 
-        fileVersion = data.get('version')
-        if fileVersion != 3:
-            if fileVersion is None:
-                warning = 'This isn\'t a valid exported file in the correct format.'
-            elif fileVersion > 3:
-                warning = 'This file is too new. Update this add-on.'
-            else:
-                warning = 'This file is too old. Re-export it using a newer version of this add-on.'
-            self.report({'WARNING'}, warning)
+        Args:
+            context (Context): The context to import into.
+            comp_file (CompFile): The file's model.
+        '''
+        stats = self.import_stats
+        comps = comp_file.comps
+        # The scene's settings come from the first composition, which was the active one when it was exported. Any
+        # others are usually its precomps.
+        primary_comp = comps[0]
+
+        with stats.phase('estimate'):
+            memory_estimate = MemoryEstimate()
+            for comp in comps:
+                estimate_comp_memory(comp, self.plan_settings(context, comp_file, comp), memory_estimate)
+        stats.count('estimated memory bytes', memory_estimate.total_bytes)
+        if not self.check_memory_budget(memory_estimate):
             return {'CANCELLED'}
 
         if hasattr(bpy.types, 'ActionSlot'):
             slot_mgr = ActionSlotManager()
         else:
             slot_mgr = LegacyActionSlotManager()
-        added_objects = []
-        cameras: list[CameraLayer] = []
-        camera_in_out_frames: list[int] = []
+        if isinstance(stats, ImportStats):
+            slot_mgr = TimedSlotManager(slot_mgr, stats)
+        shared = SharedImportState(
+            slot_mgr=slot_mgr,
+            simplify_stats=SimplifyStats(),
+            source_materials=SourceMaterials(),
+            meshes_by_key=dict(),
+            sync_counts={'updated': 0, 'added': 0, 'removed': 0, 'unchanged': 0},
+            added_objects=[]
+        )
+
+        cameras: List[CameraLayer] = []
+        comp_objects: List[List[Object]] = []
+        for comp_index, comp in enumerate(comps):
+            num_added = len(shared.added_objects)
+            comp_cameras = yield from self.import_comp(
+                context, shared, comp_file, comp,
+                primary=comp_index == 0,
+                separate_collection=len(comps) > 1
+            )
+            comp_objects.append(shared.added_objects[num_added:])
+            if comp_index == 0:
+                cameras = comp_cameras
+
+        # Selecting an object makes Blender sync the view layer with any collection changes, so every composition's
+        # objects are linked first and only then selected. Otherwise, each object's selection resyncs the whole view
+        # layer.
+        with stats.phase('collections'):
+            for obj in shared.added_objects:
+                obj.select_set(True)
+
+        with stats.phase('view layer update'):
+            context.view_layer.update()
+
+        self.apply_scene_settings(context, primary_comp, cameras)
+
+        if self.use_result_cache and not self.sync_existing:
+            # Kept for the result cache to save once the import has finished
+            self.import_result = CachedResult(
+                [CachedComp(comp.name, [obj.name for obj in objects]) for comp, objects in zip(comps, comp_objects)],
+                replace(primary_comp, layers=[]),
+                [(camera.camera.name, camera.inFrame, camera.outFrame) for camera in cameras],
+                memory_estimate
+            ), shared.added_objects
+
+        if self.simplify_baked:
+            self.report({'INFO'}, shared.simplify_stats.report())
+
+        source_materials = shared.source_materials
+        if source_materials.missing_files:
+            self.report(
+                {'WARNING'},
+                f'Couldn\'t open {len(source_materials.missing_files)} footage file(s): '
+                f'{", ".join(source_materials.missing_files)}'
+            )
 
-        imported_objects = []
-        innermost_objects_by_index = dict()
+        if self.sync_existing:
+            sync_counts = shared.sync_counts
+            self.report(
+                {'INFO'},
+                f'Updated {sync_counts["updated"]} layers, added {sync_counts["added"]}, removed '
+                f'{sync_counts["removed"]}, and left {sync_counts["unchanged"]} unchanged'
+            )
 
+        return {'FINISHED'}
 
-        if self.handle_framerate == 'remap_times':
-            desired_framerate = context.scene.render.fps
-        else:
-            desired_framerate = data['comp']['frameRate']
+    def apply_scene_settings(self, context: 'bpy.types.Context', primary_comp: Comp, cameras: List[CameraLayer]):
+        '''Sets up the scene from the first composition in a file, as the import options ask: its frame rate,
+        resolution, and frame range, and markers for its camera layers.
+
+        Args:
+            context (Context): The context to import into.
+            primary_comp (Comp): The first composition.
+            cameras (list[CameraLayer]): Its enabled camera layers, in layer order.
+        '''
+        stats = self.import_stats
+        desired_framerate = self.desired_framerate(context, primary_comp)
 
         if self.handle_framerate == 'set_framerate':
-            comp_framerate = data['comp']['frameRate']
+            comp_framerate = primary_comp.frame_rate
             if int(comp_framerate) == comp_framerate:
                 context.scene.render.fps = comp_framerate
                 context.scene.render.fps_base = 1.0
@@ -484,273 +982,12 @@ class ImportAEComp(bpy.types.Operator, ImportHelper):
                 context.scene.render.fps = ceil_framerate
                 context.scene.render.fps_base = fps_base
 
-        for layer in data['layers']:
-            if layer['type'] == 'av':
-                if 'nullLayer' in layer and layer['nullLayer']:
-                    obj_data = None
-                else:
-                    width = data['sources'][layer['source']]['width'] * scale_factor
-                    height = data['sources'][layer['source']]['height'] * scale_factor
-                    verts = [
-                        (0, 0, -height),
-                        (width, 0, -height),
-                        (width, 0, 0),
-                        (0, 0, 0)
-                    ]
-                    obj_data = bpy.data.meshes.new(layer['name'])
-                    obj_data.from_pydata(verts, [], [[0, 1, 2, 3]])
-                    obj_data.uv_layers.new()
-            elif layer['type'] == 'camera':
-                obj_data = bpy.data.cameras.new(layer['name'])
-            elif layer['type'] == 'unknown':
-                obj_data = None
-            obj = bpy.data.objects.new(layer['name'], obj_data)
-            if layer['type'] == 'camera' and 'enabled' in layer and layer['enabled'] and 'inFrame' in layer and 'outFrame' in layer:
-                # If this is an enabled camera layer, add it to the "Camera to Markers" data to be imported
-                # Older files don't have inFrame/outFrame/enabled properties, so confirm their presence
-                # The frames are calculated by multiplying floating-point seconds values by the framerate, so they're
-                # often a bit off and need to be rounded to the nearest frame
-                cameras.append(CameraLayer(obj, round(layer['inFrame']), round(layer['outFrame'])))
-                camera_in_out_frames.append(round(layer['inFrame']))
-                camera_in_out_frames.append(round(layer['outFrame']))
-            added_objects.append(obj)
-
-            innermost_objects_by_index[layer['index']] = obj
-
-            transform_target = obj
-
-            if data['transformsBaked']:
-                # These are used to swap Z and -Y. Not sure this is the best way to do it.
-                pre_quat = Quaternion((1.0, 0.0, 0.0), radians(-90.0))
-                post_quat = Quaternion((1.0, 0.0, 0.0), radians(180.0 if layer['type'] == 'camera' else 90.0))
-                def transform(loc, rot, scale):
-                    if self.comp_center_to_origin:
-                        loc -= Vector((data['comp']['width'] * 0.5, data['comp']['height'] * 0.5, 0.0))
-                    loc = Vector((loc[0] * scale_factor, loc[2] * scale_factor, -loc[1] * scale_factor))
-                    scale = Vector((scale[0], scale[2], scale[1]))
-                    rot = pre_quat @ rot @ post_quat
-                    return loc, rot, scale
-
-                self.import_baked_transform(
-                    slot_mgr,
-                    obj,
-                    layer,
-                    layer['transform'],
-                    comp_framerate=data['comp']['frameRate'],
-                    desired_framerate=desired_framerate,
-                    func=transform
-                )
-            else:
-                if 'anchorPoint' in layer and (
-                    any(channel['isKeyframed'] for channel in layer['anchorPoint']['channels']) or
-                    any(abs(channel['value']) >= 1e-15 for channel in layer['anchorPoint']['channels'])
-                ):
-                    anchor_parent = bpy.data.objects.new(layer['name'] + ' Anchor Point', None)
-                    anchor_parent.empty_display_type = 'ARROWS'
-                    added_objects.append(anchor_parent)
-                    self.import_property_spatial(
-                        slot_mgr=slot_mgr,
-                        obj=transform_target,
-                        ae_obj=layer,
-                        data_path='location',
-                        prop_data=layer['anchorPoint'],
-                        comp_framerate=data['comp']['frameRate'],
-                        desired_framerate=desired_framerate,
-                        swizzle=(0, 2, 1),
-                        mul=(-scale_factor, scale_factor, -scale_factor)
-                    )
-                    transform_target.parent = anchor_parent
-                    transform_target = anchor_parent
-
-                if 'scale' in layer:
-                    self.import_property_spatial(
-                        slot_mgr=slot_mgr,
-                        obj=transform_target,
-                        ae_obj=layer,
-                        data_path='scale',
-                        prop_data=layer['scale'],
-                        comp_framerate=data['comp']['frameRate'],
-                        desired_framerate=desired_framerate,
-                        swizzle=(0, 2, 1),
-                        mul=(0.01, 0.01, 0.01)
-                    )
-
-                ANGLE_CONVERSION_FACTOR = pi / 180
-                if layer['type'] == 'camera':
-                    # Rotate camera upwards 90 degrees along the X axis
-                    transform_target.rotation_mode = 'ZYX'
-                    channel_swizzle = (0, 1, 2)
-                    channel_add = (pi / 2, 0, 0)
-                    channel_multiply = (1, -1, -1)
-                else:
-                    transform_target.rotation_mode = 'YZX'
-                    channel_swizzle = (0, 2, 1)
-                    channel_add = (0, 0, 0)
-                    channel_multiply = (1, -1, 1)
-
-                for index, prop_name in enumerate(['rotationX', 'rotationY', 'rotationZ']):
-                    if prop_name in layer:
-                        self.import_property(
-                            slot_mgr=slot_mgr,
-                            obj=transform_target,
-                            ae_obj=layer,
-                            data_path='rotation_euler',
-                            data_index=channel_swizzle[index],
-                            prop_data=layer[prop_name]['channels'][0],
-                            comp_framerate=data['comp']['frameRate'],
-                            desired_framerate=desired_framerate,
-                            mul=ANGLE_CONVERSION_FACTOR * channel_multiply[index],
-                            add=channel_add[index]
-                        )
-
-                if 'orientation' in layer:
-                    all_keyframed = all(channel['isKeyframed'] for channel in layer['orientation']['channels'])
-                    none_keyframed = all(not channel['isKeyframed'] for channel in layer['orientation']['channels'])
-
-                    if not (all_keyframed or none_keyframed):
-                        raise ValueError('Orientation keyframe channels should either all be keyframed or all be not keyframed')
-
-                    if not (none_keyframed and all(abs(channel['value']) < 1e-15 for channel in layer['orientation']['channels'])):
-                        orientation_parent = bpy.data.objects.new(layer['name'] + ' Orientation', None)
-                        orientation_parent.empty_display_type = 'ARROWS'
-                        added_objects.append(orientation_parent)
-
-                        if all_keyframed:
-                            if any(channel['keyframesFormat'] != 'calculated' for channel in layer['orientation']['channels']):
-                                raise ValueError('Orientation keyframes must be in "calculated" format')
-
-                            orientation_parent.rotation_mode = 'QUATERNION'
-                            num_keyframes = len(layer['orientation']['channels'][0]['keyframes'])
-                            start_frame = layer['orientation']['channels'][0]['startFrame']
-                            rot_fcurves = [slot_mgr.fcurve_for_data_path(orientation_parent, layer, 'rotation_quaternion', i) for i in range(4)]
-                            for fcurve in rot_fcurves:
-                                fcurve.keyframe_points.add(num_keyframes)
-                                for i in range(num_keyframes):
-                                    fcurve.keyframe_points[i].interpolation = 'LINEAR'
-
-                            prev_angle = None
-                            for i, (x, y, z) in enumerate(zip(*(channel['keyframes'] for channel in layer['orientation']['channels']))):
-                                angle = Matrix.Identity(3)
-                                # Apply AE orientation
-                                angle.rotate(Euler((radians(x), radians(z), radians(-y)), 'YZX'))
-                                # Prevent discontinuities in the rotation which can mess up motion blur.
-                                # Euler angles also have a make_compatible function, but it doesn't always work, so it's necessary to use quaternions.
-                                quat = angle.to_quaternion()
-                                if prev_angle:
-                                    quat.make_compatible(prev_angle)
-
-                                prev_angle = quat
-
-                                for j in range(4):
-                                    k = rot_fcurves[j].keyframe_points[i]
-                                    k.co_ui = [i + start_frame, quat[j]]
-                        else:
-                            orientation_parent.rotation_mode = 'YZX'
-                            orientation_parent.rotation_euler = [
-                                radians(layer['orientation']['channels'][0]['value']),
-                                radians(layer['orientation']['channels'][2]['value']),
-                                radians(-layer['orientation']['channels'][1]['value'])
-                            ]
-
-                        transform_target.parent = orientation_parent
-                        transform_target = orientation_parent
-
-                if 'pointOfInterest' in layer:
-                    point_of_interest_parent = bpy.data.objects.new(layer['name'] + ' Point Of Interest Constraint', None)
-                    point_of_interest_parent.empty_display_type = 'ARROWS'
-                    added_objects.append(point_of_interest_parent)
-
-                    point_of_interest = bpy.data.objects.new(layer['name'] + ' Point Of Interest', None)
-                    added_objects.append(point_of_interest)
-
-                    self.import_property_spatial(
-                        slot_mgr=slot_mgr,
-                        obj=point_of_interest,
-                        ae_obj=layer,
-                        data_path='location',
-                        prop_data=layer['pointOfInterest'],
-                        comp_framerate=data['comp']['frameRate'],
-                        desired_framerate=desired_framerate,
-                        swizzle=(0, 2, 1),
-                        mul=(scale_factor, -scale_factor, scale_factor),
-                        add=(
-                            # TODO: abstract the process of "comp center to origin" for all translations
-                            -data['comp']['width'] * 0.5 * self.scale_factor if self.comp_center_to_origin else 0,
-                            data['comp']['height'] * 0.5 * self.scale_factor if self.comp_center_to_origin else 0,
-                            0
-                        )
-                    )
-
-                    track_constraint = point_of_interest_parent.constraints.new('TRACK_TO')
-                    track_constraint.owner_space = 'LOCAL'
-                    track_constraint.target = point_of_interest
-                    track_constraint.track_axis = 'TRACK_Y'
-                    track_constraint.up_axis = 'UP_Z'
-
-                    transform_target.parent = point_of_interest_parent
-                    transform_target = point_of_interest_parent
-
-                should_translate = self.comp_center_to_origin and layer['parentIndex'] is None
-
-                if 'position' in layer:
-                    self.import_property_spatial(
-                        slot_mgr=slot_mgr,
-                        obj=transform_target,
-                        ae_obj=layer,
-                        data_path='location',
-                        prop_data=layer['position'],
-                        comp_framerate=data['comp']['frameRate'],
-                        desired_framerate=desired_framerate,
-                        swizzle=(0, 2, 1),
-                        mul=(scale_factor, -scale_factor, scale_factor),
-                        add=(
-                            -data['comp']['width'] * 0.5 * self.scale_factor if should_translate else 0,
-                            data['comp']['height'] * 0.5 * self.scale_factor if should_translate else 0,
-                            0
-                        )
-                    )
-
-            if layer['type'] == 'camera':
-                obj_data.sensor_fit = 'VERTICAL'
-                self.import_property(
-                    slot_mgr=slot_mgr,
-                    obj=obj_data,
-                    ae_obj=layer,
-                    data_path='lens',
-                    data_index=-1,
-                    prop_data=layer['zoom']['channels'][0],
-                    comp_framerate=data['comp']['frameRate'],
-                    desired_framerate=desired_framerate,
-                    # 24 = default camera sensor height
-                    mul=24 / data['comp']['height']
-                )
-
-            imported_objects.append((transform_target, layer))
-
-        # Baked transforms include parent transforms
-        if not data['transformsBaked']:
-            for obj, layer in imported_objects:
-                if layer['parentIndex'] is not None:
-                    obj.parent = innermost_objects_by_index[layer['parentIndex']]
-
-        if self.create_new_collection:
-            dst_collection = bpy.data.collections.new(data['comp']['name'])
-            context.collection.children.link(dst_collection)
-        else:
-            dst_collection = context.collection
-
-        for obj in added_objects:
-            dst_collection.objects.link(obj)
-            obj.select_set(True)
-
-        context.view_layer.update()
-
         if self.use_comp_resolution:
             render_settings = context.scene.render
-            render_settings.resolution_x = data['comp']['width']
-            render_settings.resolution_y = data['comp']['height']
+            render_settings.resolution_x = primary_comp.width
+            render_settings.resolution_y = primary_comp.height
 
-            pixel_aspect = data['comp']['pixelAspect']
+            pixel_aspect = primary_comp.pixel_aspect
             # Check whether the pixel aspect ratio can be expressed precisely as a ratio of smallish integers
             pixel_aspect_frac = Fraction(pixel_aspect).limit_denominator(1000)
             if isclose(float(pixel_aspect_frac), pixel_aspect, abs_tol=1e-11):
@@ -769,40 +1006,336 @@ class ImportAEComp(bpy.types.Operator, ImportHelper):
             # Compensate for floating-point error
             # TODO: there should be a lot less floating-point error. ExtendScript is probably printing floats poorly.
             # (Or maybe After Effects just uses floats instead of doubles like JS does)
-            context.scene.frame_start = floor(data['comp']['workArea'][0] * desired_framerate + 1e-13)
+            context.scene.frame_start = floor(primary_comp.work_area[0] * desired_framerate + 1e-13)
             # After Effects' work area excludes the end point; Blender's includes it. Subtract 1 from the end.
-            context.scene.frame_end = ceil(data['comp']['workArea'][1] * desired_framerate - 1e-13) - 1
+            context.scene.frame_end = ceil(primary_comp.work_area[1] * desired_framerate - 1e-13) - 1
 
         # Import switching between camera layers as markers
         if self.cameras_to_markers:
-            # Keep track of existing markers to avoid adding new ones in the same place
-            existing_markers: dict[int, TimelineMarker] = dict()
-            for marker in context.scene.timeline_markers.values():
-                existing_markers[marker.frame] = marker
-
-            camera_in_out_frames.sort()
-            prev_enabled_camera = None
-
-            # Check all the camera layer in/out points, since those are the only places a camera change can occur
-            for frame in camera_in_out_frames:
-                # Find the topmost camera layer
-                enabled_camera = None
-                for camera in cameras:
-                    if camera.inFrame <= frame and camera.outFrame > frame:
-                        enabled_camera = camera
-                        break
-
-                # If the camera changed, add or update the marker at that frame
-                if enabled_camera != prev_enabled_camera:
-                    prev_enabled_camera = enabled_camera
-                    if enabled_camera is None:
+            with stats.phase('markers'):
+                # Keep track of existing markers to avoid adding new ones in the same place
+                existing_markers: dict[int, TimelineMarker] = dict()
+                for marker in context.scene.timeline_markers.values():
+                    existing_markers[marker.frame] = marker
+
+                # Cameras are in layer order, so the topmost camera layer is the one After Effects looks through.
+                # Add or update a marker at every frame where that changes.
+                for frame, index in topmost_changes([(camera.inFrame, camera.outFrame) for camera in cameras]):
+                    if index is None:
                         continue
+                    enabled_camera = cameras[index]
                     marker = existing_markers.get(frame)
                     if marker is None:
                         marker = context.scene.timeline_markers.new(f'M_{enabled_camera.camera.name}', frame=frame)
                     marker.camera = enabled_camera.camera
 
-        return {'FINISHED'}
+    def plan_settings(self, context: 'bpy.types.Context', comp_file: CompFile, comp: Comp) -> PlanSettings:
+        '''Returns the settings to plan a composition's layers with.'''
+        desired_framerate = self.desired_framerate(context, comp)
+
+        # Everything besides a layer's own data that affects how it's imported, for detecting which layers changed
+        hash_settings = {
+            'comp': {'width': comp.width, 'height': comp.height, 'frameRate': comp.frame_rate},
+            'transformsBaked': comp_file.transforms_baked,
+            'desiredFramerate': desired_framerate,
+            'options': self.as_keywords(ignore=UNHASHED_OPTIONS)
+        }
+
+        return PlanSettings(
+            scale_factor=self.scale_factor,
+            comp_width=comp.width,
+            comp_height=comp.height,
+            comp_framerate=comp.frame_rate,
+            desired_framerate=desired_framerate,
+            comp_center_to_origin=self.comp_center_to_origin,
+            transforms_baked=comp_file.transforms_baked,
+            sources=comp_file.sources,
+            simplify_baked=self.simplify_baked,
+            simplify_tolerance=self.simplify_tolerance,
+            simplify_angle_tolerance=self.simplify_angle_tolerance,
+            hide_outside_in_out=self.hide_outside_in_out,
+            import_materials=self.import_materials,
+            baked_samples=self.baked_samples,
+            # Hashing every layer isn't free, so it's only done when syncing. Layers from an import that wasn't synced
+            # have no hash, so the first sync re-imports them all (onto their existing objects).
+            hash_settings=hash_settings if self.sync_existing else None
+        )
+
+    def check_memory_budget(self, estimate: MemoryEstimate) -> bool:
+        '''Returns whether an import fits in the memory budget. If it doesn't, reports how much it would take along
+        with options which would make it take less.'''
+        budget = self.memory_budget << 20
+        if budget == 0 or estimate.total_bytes <= budget:
+            return True
+
+        suggestions = []
+        if not self.baked_samples and estimate.sampleable_keyframes > 0:
+            suggestions.append(
+                f'check "Baked Keyframes as Samples" (about {estimate.total_bytes_as_samples >> 20} MB)'
+            )
+        if not self.simplify_baked and estimate.baked_keyframes > 0:
+            suggestions.append('check "Simplify Baked Keyframes"')
+        if estimate.supersampled:
+            suggestions.append('re-export with a lower "Transform sampling rate"')
+        if estimate.baked_keyframes > 0:
+            suggestions.append('re-export with "Adaptive sampling"')
+        suggestions.append('re-export a shorter "Time range" or fewer layers')
+        self.report(
+            {'WARNING'},
+            f'This import would need about {estimate.total_bytes >> 20} MB of memory, over the budget of '
+            f'{self.memory_budget} MB, so nothing was imported. To use less memory, {"; or ".join(suggestions)}.'
+        )
+        return False
+
+    def import_comp(
+        self,
+        context: 'bpy.types.Context',
+        shared: SharedImportState,
+        comp_file: CompFile,
+        comp: Comp,
+        primary: bool,
+        separate_collection: bool
+    ) -> Generator[None, None, List[CameraLayer]]:
+        '''Imports the layers of one of a file's compositions into the scene, yielding after each layer.
+
+        Args:
+            context (Context): The context to import into.
+            shared (SharedImportState): Everything shared with the file's other compositions.
+            comp_file (CompFile): The file's model.
+            comp (Comp): The composition, along with its layers.
+            primary (bool): Whether this is the composition the scene's settings (like its markers) come from.
+            separate_collection (bool): Whether to put the composition's layers into their own new collection, even if
+                "Create New Collection" is unchecked.
+
+        Returns:
+            The composition's enabled camera layers, for "Cameras to Markers".
+        '''
+        scale_factor = self.scale_factor
+
+        simplify_stats = shared.simplify_stats
+        stats = self.import_stats
+
+        slot_mgr = shared.slot_mgr
+        added_objects = []
+        cameras: List[CameraLayer] = []
+
+        imported_objects = []
+        innermost_objects_by_index = dict()
+
+        comp_name = comp.name
+        # Objects from a previous import of this comp, by layer key and role. Whatever's left in here once all the
+        # layers have been imported belongs to layers which no longer exist.
+        existing_layers = find_imported_objects(context.scene, comp_name) if self.sync_existing else dict()
+        existing_collection = None
+        for objects in existing_layers.values():
+            for obj in objects.values():
+                if obj.users_collection:
+                    existing_collection = obj.users_collection[0]
+                    break
+            if existing_collection is not None:
+                break
+        if existing_layers and self.cameras_to_markers and primary:
+            # The markers for this comp's cameras are all recreated once every comp has been imported
+            for marker in list(context.scene.timeline_markers):
+                if marker.camera is not None and marker.camera.get(COMP_PROP) == comp_name:
+                    context.scene.timeline_markers.remove(marker)
+        sync_counts = shared.sync_counts
+
+        meshes_by_key = shared.meshes_by_key
+        for objects in existing_layers.values():
+            obj = objects.get(ROLE_LAYER)
+            if obj is not None and obj.type == 'MESH' and MESH_KEY_PROP in obj.data:
+                meshes_by_key.setdefault(obj.data[MESH_KEY_PROP], obj.data)
+
+        source_materials = shared.source_materials
+
+        def source_mesh(source: Source) -> 'bpy.types.Mesh':
+            width = source.width * scale_factor
+            height = source.height * scale_factor
+            key = layer_mesh_key(source, width, height)
+            mesh = meshes_by_key.get(key)
+            if mesh is None:
+                mesh = bpy.data.meshes.new(source.name or 'Layer')
+                build_layer_mesh(mesh, width, height)
+                mesh[MESH_KEY_PROP] = key
+                meshes_by_key[key] = mesh
+                stats.count('meshes')
+            # Meshes from a previous import might have been given other materials since, which are left alone
+            if self.import_materials and len(mesh.materials) == 0:
+                with stats.phase('materials'):
+                    material = source_materials.material(source)
+                if material is not None:
+                    mesh.materials.append(material)
+            return mesh
+        layer_name_counts: dict[str, int] = dict()
+
+        planner = LayerPlanner(self.plan_settings(context, comp_file, comp))
+
+        def add_camera(obj: 'bpy.types.Object', layer: Layer):
+            if layer.type != 'camera':
+                return
+            in_out_frames = layer_in_out_frames(layer)
+            if in_out_frames is not None:
+                # If this is an enabled camera layer, add it to the "Camera to Markers" data to be imported
+                cameras.append(CameraLayer(obj, *in_out_frames))
+
+        def apply_plan(plan: LayerPlan, existing: Optional[dict]):
+            layer = plan.layer
+            layer_start = stats.clock()
+            layer_objects = LayerObjects(comp_name, plan.key, existing)
+            simplify_stats.add(plan.simplify_stats)
+
+            if plan.unchanged:
+                # Nothing changed, so leave this layer's objects exactly as they are
+                kept = layer_objects.keep()
+                add_camera(kept[ROLE_LAYER], layer)
+                innermost_objects_by_index[layer.index] = kept[ROLE_LAYER]
+                imported_objects.append((outermost_object(kept), layer.parent_index))
+                sync_counts['unchanged'] += 1
+                stats.layer_done(layer.name, layer_start, plan.seconds)
+                return
+            sync_counts['added' if existing is None else 'updated'] += 1
+            layer_objects.release_animation()
+
+            objects_by_role = dict()
+            with stats.phase('objects'):
+                for object_plan in plan.objects:
+                    if object_plan.role != ROLE_LAYER:
+                        obj = layer_objects.empty(object_plan.role, object_plan.name)
+                    elif object_plan.object_type == 'MESH':
+                        obj_data = source_mesh(plan.source)
+                        obj = layer_objects.reuse(ROLE_LAYER, 'MESH')
+                        if obj is None:
+                            obj = layer_objects.add(ROLE_LAYER, bpy.data.objects.new(object_plan.name, obj_data))
+                        elif obj.data != obj_data:
+                            old_mesh = obj.data
+                            obj.data = obj_data
+                            if old_mesh.users == 0:
+                                bpy.data.meshes.remove(old_mesh)
+                    elif object_plan.object_type == 'CAMERA':
+                        obj = layer_objects.reuse(ROLE_LAYER, 'CAMERA')
+                        if obj is None:
+                            obj_data = bpy.data.cameras.new(object_plan.name)
+                            obj = layer_objects.add(ROLE_LAYER, bpy.data.objects.new(object_plan.name, obj_data))
+                    else:
+                        obj = layer_objects.reuse(ROLE_LAYER, 'EMPTY')
+                        if obj is None:
+                            obj = layer_objects.add(ROLE_LAYER, bpy.data.objects.new(object_plan.name, None))
+                    if object_plan.empty_display_type is not None:
+                        obj.empty_display_type = object_plan.empty_display_type
+                    obj.rotation_mode = object_plan.rotation_mode
+                    objects_by_role[object_plan.role] = obj
+
+                obj = objects_by_role[ROLE_LAYER]
+                if plan.import_hash is not None:
+                    obj[HASH_PROP] = plan.import_hash
+                elif HASH_PROP in obj:
+                    del obj[HASH_PROP]
+
+                for object_plan in plan.objects:
+                    dst_obj = objects_by_role[object_plan.role]
+                    if object_plan.parent_role is not None:
+                        dst_obj.parent = objects_by_role[object_plan.parent_role]
+                    if object_plan.track_to_role is not None:
+                        track_constraint = dst_obj.constraints.new('TRACK_TO')
+                        track_constraint.owner_space = 'LOCAL'
+                        track_constraint.target = objects_by_role[object_plan.track_to_role]
+                        track_constraint.track_axis = 'TRACK_Y'
+                        track_constraint.up_axis = 'UP_Z'
+            add_camera(obj, layer)
+
+            innermost_objects_by_index[layer.index] = obj
+
+            for object_plan in plan.objects:
+                dst_obj = objects_by_role[object_plan.role]
+                self.apply_properties(dst_obj, object_plan.properties)
+                self.apply_fcurves(slot_mgr, dst_obj, layer, object_plan.fcurves)
+                if dst_obj.data is not None:
+                    self.apply_properties(dst_obj.data, object_plan.data_properties)
+                    self.apply_fcurves(slot_mgr, dst_obj.data, layer, object_plan.data_fcurves)
+
+            # Remove any objects the layer no longer needs, like the empty for an anchor point that's no longer set
+            layer_objects.finish()
+            added_objects.extend(layer_objects.created)
+
+            imported_objects.append((objects_by_role[plan.outermost_role], layer.parent_index))
+            stats.layer_done(layer.name, layer_start, plan.seconds)
+
+        # Layers are planned (all their keyframes calculated) on worker threads, and then applied to the scene in order
+        # on this one, since only the main thread can touch Blender's data. Planning mostly happens in NumPy, which
+        # releases the GIL, so it can overlap with the main thread creating the previous layers' objects.
+        with ThreadPoolExecutor(max_workers=PLAN_WORKERS) as executor:
+            pending = deque()
+            try:
+                for layer in comp.layers:
+                    stats.count('layers')
+
+                    # Layers are matched up with previously-imported ones by name, since their indices change whenever
+                    # a layer is added or removed
+                    name_count = layer_name_counts.get(layer.name, 0) + 1
+                    layer_name_counts[layer.name] = name_count
+                    key = layer_key(layer.name, name_count)
+                    existing = existing_layers.pop(key, None)
+                    existing_hash = None
+                    if existing is not None and ROLE_LAYER in existing:
+                        existing_hash = existing[ROLE_LAYER].get(HASH_PROP)
+
+                    pending.append((executor.submit(planner.plan_layer, layer, key, existing_hash), existing))
+                    if len(pending) >= MAX_PLANNED_AHEAD:
+                        future, existing = pending.popleft()
+                        with stats.phase('plan'):
+                            plan = future.result()
+                        apply_plan(plan, existing)
+                        self.progress_steps += 1
+                        yield
+
+                while pending:
+                    future, existing = pending.popleft()
+                    with stats.phase('plan'):
+                        plan = future.result()
+                    apply_plan(plan, existing)
+                    self.progress_steps += 1
+                    yield
+            finally:
+                # If anything went wrong, don't wait for the rest of the layers to be planned
+                for future, existing in pending:
+                    future.cancel()
+
+        # Anything from the previous import that wasn't matched up with a layer belongs to one that was deleted
+        sync_counts['removed'] += len(existing_layers)
+        with stats.phase('objects'):
+            remove_layers(existing_layers.values())
+
+        stats.count('objects', len(added_objects))
+
+        # Baked transforms include parent transforms
+        if not comp_file.transforms_baked:
+            with stats.phase('parenting'):
+                for obj, parent_index in imported_objects:
+                    parent = None if parent_index is None else innermost_objects_by_index[parent_index]
+                    # Unchanged layers from a previous import usually have the right parent already
+                    if obj.parent != parent:
+                        obj.parent = parent
+
+        with stats.phase('collections'):
+            new_collection = None
+            if existing_collection is not None:
+                # New layers go alongside the ones from the previous import
+                dst_collection = existing_collection
+            elif self.create_new_collection or separate_collection:
+                dst_collection = new_collection = bpy.data.collections.new(comp_name)
+            else:
+                dst_collection = context.collection
+
+            collection_objects = dst_collection.objects
+            for obj in added_objects:
+                collection_objects.link(obj)
+            # A new collection is only linked into the scene once it's full, so the scene only changes once
+            if new_collection is not None:
+                context.collection.children.link(new_collection)
+            shared.added_objects.extend(added_objects)
+
+        return cameras
 
     def draw(self, context: 'bpy.types.Context'):
         layout = self.layout
@@ -822,6 +1355,45 @@ class ImportAEComp(bpy.types.Operator, ImportHelper):
         col.prop(self, 'create_new_collection')
         col.prop(self, 'adjust_frame_start_end')
         col.prop(self, 'cameras_to_markers')
+        col.prop(self, 'import_materials')
+        col.prop(self, 'hide_outside_in_out')
+        col.prop(self, 'sync_existing')
+        col.prop(self, 'simplify_baked')
+
+        col = layout.column()
+        col.active = self.simplify_baked
+        col.prop(self, 'simplify_tolerance')
+        col.prop(self, 'simplify_angle_tolerance')
+
+        col = layout.column()
+        col.use_property_split = False
+        col.active = not self.simplify_baked
+        col.prop(self, 'baked_samples')
+
+        col = layout.column()
+        col.use_property_split = False
+        col.prop(self, 'use_result_cache')
+        col = layout.column()
+        col.active = self.use_result_cache and not self.sync_existing
+        col.prop(self, 'result_cache_dir')
+        col.prop(self, 'result_cache_size')
+        col = layout.column()
+        col.use_property_split = False
+        col.active = self.use_result_cache and not self.sync_existing
+        col.prop(self, 'refresh_result_cache')
+
+        col = layout.column()
+        col.prop(self, 'memory_budget')
+
+        col = layout.column()
+        col.use_property_split = False
+        col.prop(self, 'show_import_stats')
+        col = layout.column()
+        col.prop(self, 'import_stats_path')
+        col = layout.column()
+        col.use_property_split = False
+        col.active = self.show_import_stats or bool(self.import_stats_path)
+        col.prop(self, 'track_memory')
 
 def menu_func_import(self, context):
     self.layout.operator(ImportAEComp.bl_idname, text="After Effects composition data, converted (.json)")
@@ -833,6 +1405,7 @@ def register():
 def unregister():
     bpy.utils.unregister_class(ImportAEComp)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    comp_cache.clear()
 
 if __name__ == "__main__":
     register()
@@ -0,0 +1,102 @@
+'''
+In-memory cache of loaded composition files. The import operator supports redo, so every tweak to an option in the redo
+panel runs the whole import again. Reading and decoding a large export can take far longer than everything else the
+import does, so each file's model is kept around between runs and reused for as long as the file hasn't changed.
+'''
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from .model import CompFile
+
+# Total size of the files whose models can be kept in memory at once
+MAX_CACHE_BYTES = 1 << 30
+# Size of each block of a file that's hashed to detect changes to its content
+_HASH_BLOCK_SIZE = 1 << 16
+_HASH_BLOCKS = 8
+
+def _file_fingerprint(path: str) -> Tuple[int, int, bytes]:
+    '''Returns the size, modification time, and a content hash of a file.
+
+    Hashing a whole multi-hundred-megabyte export would take nearly as long as decoding it, so only a handful of blocks
+    spread evenly through the file are hashed. Together with the size and modification time, this catches files that are
+    overwritten by a new export even on file systems with coarse timestamps.
+    '''
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        if stat.st_size <= _HASH_BLOCK_SIZE * _HASH_BLOCKS:
+            digest.update(file.read())
+        else:
+            last_block = stat.st_size - _HASH_BLOCK_SIZE
+            for i in range(_HASH_BLOCKS):
+                file.seek(last_block * i // (_HASH_BLOCKS - 1))
+                digest.update(file.read(_HASH_BLOCK_SIZE))
+    return stat.st_size, stat.st_mtime_ns, digest.digest()
+
+class CompCache:
+    """Least-recently-used cache of loaded composition files, bounded by the total size of the files"""
+    max_bytes: int
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+
+    def key(self, filepath: str) -> tuple:
+        '''Returns the key identifying the current contents of a file.'''
+        return os.path.abspath(filepath), _file_fingerprint(filepath)
+
+    def get(self, key: tuple) -> Optional[CompFile]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        comp, _, dependencies = entry
+        # The file itself is unchanged, but the ones it refers to (like binary keyframe data) may not be
+        for path, fingerprint in dependencies:
+            try:
+                changed = _file_fingerprint(path) != fingerprint
+            except OSError:
+                changed = True
+            if changed:
+                self._remove(key)
+                return None
+        self._entries.move_to_end(key)
+        return comp
+
+    def can_fit(self, size: int) -> bool:
+        return size <= self.max_bytes
+
+    def put(self, key: tuple, comp: CompFile, size: int, dependency_paths: Iterable[str] = ()):
+        '''Adds a file's model to the cache, evicting the least recently used ones to make room.
+
+        Args:
+            key (tuple): The file's key, from `key`.
+            comp (CompFile): The file's model, which mustn't refer to a memory-mapped file.
+            size (int): The size of the file(s) it was loaded from, which the memory it takes up is roughly
+                proportional to.
+            dependency_paths (Iterable[str], optional): Other files that were loaded along with it. If any of these
+                change, the cached model is thrown away.
+        '''
+        if not self.can_fit(size):
+            return
+        dependencies = tuple((path, _file_fingerprint(path)) for path in dependency_paths)
+        # An older version of the same file will never be used again
+        for old_key in [old_key for old_key in self._entries if old_key[0] == key[0]]:
+            self._remove(old_key)
+        while self._size + size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        self._entries[key] = (comp, size, dependencies)
+        self._size += size
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+comp_cache = CompCache(MAX_CACHE_BYTES)
@@ -0,0 +1,45 @@
+'''
+Layer in/out points, which are the frames each layer starts and stops being visible at. The topmost of a set of layers
+at any given frame (e.g. which camera After Effects is looking through) is found with a single sweep over all their
+in/out points, rather than checking every layer at every one of them.
+'''
+
+import heapq
+from typing import List, Optional, Sequence, Tuple
+
+from .model import Layer
+
+def layer_in_out_frames(layer: Layer) -> Optional[Tuple[int, int]]:
+    '''Returns the frames an enabled layer's in and out points are at, or None if the layer is disabled. Older files
+    don't have in/out points (or whether the layer is enabled), so they return None too.'''
+    if not layer.enabled or layer.in_frame is None or layer.out_frame is None:
+        return None
+    # The frames are calculated by multiplying floating-point seconds values by the framerate, so they're often a bit
+    # off and need to be rounded to the nearest frame
+    return round(layer.in_frame), round(layer.out_frame)
+
+def topmost_changes(intervals: Sequence[Tuple[int, int]]) -> List[Tuple[int, Optional[int]]]:
+    '''Returns every frame at which the topmost active interval changes, along with the index of the new topmost
+    interval (or None if none are active). Intervals are given as (in, out) frames, topmost first, and are active from
+    their in frame up to but not including their out frame.'''
+    starts = sorted(range(len(intervals)), key=lambda index: intervals[index][0])
+    frames = sorted({frame for interval in intervals for frame in interval})
+    # Min-heap of (index, out frame) for every interval that has started, so the topmost one is always first. Ones
+    # that have ended are only removed once they reach the top.
+    active: List[Tuple[int, int]] = []
+    changes = []
+    next_start = 0
+    prev_topmost = None
+    for frame in frames:
+        while next_start < len(starts) and intervals[starts[next_start]][0] <= frame:
+            index = starts[next_start]
+            heapq.heappush(active, (index, intervals[index][1]))
+            next_start += 1
+        while active and active[0][1] <= frame:
+            heapq.heappop(active)
+
+        topmost = active[0][0] if active else None
+        if topmost != prev_topmost:
+            changes.append((frame, topmost))
+            prev_topmost = topmost
+    return changes
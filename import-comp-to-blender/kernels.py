@@ -0,0 +1,121 @@
+'''
+Vectorized rotation math for baked channels. These operate on every keyframe of a channel at once, rather than building
+`mathutils` objects one keyframe at a time.
+
+Quaternions are stored as (N, 4) arrays in (w, x, y, z) order, the same as `mathutils.Quaternion`.
+'''
+
+import numpy as np
+from typing import Tuple
+
+def quat_multiply(a, b) -> np.ndarray:
+    '''Returns the Hamilton product of two quaternions or arrays of quaternions, like `a @ b` does in mathutils.'''
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw
+    ), axis=-1)
+
+def axis_rotation_quats(axis: int, angles: np.ndarray) -> np.ndarray:
+    '''Returns an array of quaternions rotating by the given angles (in radians) about the X, Y, or Z axis.'''
+    half_angles = np.asarray(angles, dtype=np.float64) * 0.5
+    quats = np.zeros(half_angles.shape + (4,))
+    quats[..., 0] = np.cos(half_angles)
+    quats[..., axis + 1] = np.sin(half_angles)
+    return quats
+
+def rotation_matrices_to_quats(mats: np.ndarray) -> np.ndarray:
+    '''Converts an (N, 3, 3) array of (row-major) rotation matrices to quaternions. Like Blender, this returns the
+    quaternion with a non-negative W component.'''
+    m00, m01, m02 = mats[:, 0, 0], mats[:, 0, 1], mats[:, 0, 2]
+    m10, m11, m12 = mats[:, 1, 0], mats[:, 1, 1], mats[:, 1, 2]
+    m20, m21, m22 = mats[:, 2, 0], mats[:, 2, 1], mats[:, 2, 2]
+
+    # Pick whichever of the four components is largest to divide by, for numerical stability
+    candidates = np.stack((m00 + m11 + m22, m00, m11, m22), axis=-1)
+    largest = np.argmax(candidates, axis=-1)
+
+    quats = np.empty((len(mats), 4))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.sqrt(np.maximum(1.0 + m00 + m11 + m22, 0.0)) * 2.0
+        w_case = np.stack((0.25 * s, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s), axis=-1)
+        s = np.sqrt(np.maximum(1.0 + m00 - m11 - m22, 0.0)) * 2.0
+        x_case = np.stack(((m21 - m12) / s, 0.25 * s, (m01 + m10) / s, (m02 + m20) / s), axis=-1)
+        s = np.sqrt(np.maximum(1.0 - m00 + m11 - m22, 0.0)) * 2.0
+        y_case = np.stack(((m02 - m20) / s, (m01 + m10) / s, 0.25 * s, (m12 + m21) / s), axis=-1)
+        s = np.sqrt(np.maximum(1.0 - m00 - m11 + m22, 0.0)) * 2.0
+        z_case = np.stack(((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, 0.25 * s), axis=-1)
+    for case, case_quats in enumerate((w_case, x_case, y_case, z_case)):
+        mask = largest == case
+        quats[mask] = case_quats[mask]
+
+    quats /= np.linalg.norm(quats, axis=-1, keepdims=True)
+    quats[quats[:, 0] < 0.0] *= -1.0
+    return quats
+
+def make_compatible(quats: np.ndarray) -> np.ndarray:
+    '''Flips the signs of an array of quaternions, in place, so that each one lies in the same hemisphere as the one
+    before it. This does the same thing as calling `Quaternion.make_compatible` on each quaternion in turn, and prevents
+    discontinuities in the rotation which can mess up motion blur.'''
+    if len(quats) > 1:
+        dots = np.einsum('ij,ij->i', quats[1:], quats[:-1])
+        quats[1:] *= np.cumprod(np.where(dots < 0.0, -1.0, 1.0))[:, np.newaxis]
+    return quats
+
+def decompose_baked_transforms(
+    keyframes,
+    origin,
+    scale_factor: float,
+    pre_quat,
+    post_quat) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Decomposes baked transform keyframes (3x4 affine matrices in After Effects' coordinate space) into Blender
+    location, rotation, and scale channels.
+
+    Args:
+        keyframes: The (N, 12) baked transform matrices, one row-major matrix per keyframe.
+        origin: The After Effects location that should end up at Blender's origin.
+        scale_factor (float): Amount to scale the locations by.
+        pre_quat: Quaternion to multiply each rotation by on the left.
+        post_quat: Quaternion to multiply each rotation by on the right.
+
+    Returns:
+        (N, 3) locations, (N, 4) quaternions, and (N, 3) scales.
+    '''
+    mats = np.asarray(keyframes, dtype=np.float64).reshape(-1, 3, 4)
+    linear = mats[:, :, :3]
+
+    # Same as `Matrix.decompose`: the scale is the length of each column, and negative matrices have all of their scale
+    # components and the rotation negated.
+    scales = np.linalg.norm(linear, axis=1)
+    rots = linear / np.where(scales == 0.0, 1.0, scales)[:, np.newaxis, :]
+    negative = np.linalg.det(rots) < 0.0
+    rots[negative] *= -1.0
+    scales[negative] *= -1.0
+
+    # Swap Z and -Y
+    locs = (mats[:, :, 3] - np.asarray(origin, dtype=np.float64)) * scale_factor
+    locs = np.column_stack((locs[:, 0], locs[:, 2], -locs[:, 1]))
+    scales = scales[:, [0, 2, 1]]
+    quats = quat_multiply(quat_multiply(pre_quat, rotation_matrices_to_quats(rots)), post_quat)
+
+    return locs, make_compatible(quats), scales
+
+def orientation_to_quats(x_degrees, y_degrees, z_degrees) -> np.ndarray:
+    '''Converts After Effects orientation channels (in degrees) into Blender quaternions.
+
+    This is the same rotation as a YZX Euler rotation of (x, z, -y) after swapping Z and -Y.
+    '''
+    quats = quat_multiply(
+        quat_multiply(
+            axis_rotation_quats(0, np.radians(x_degrees)),
+            axis_rotation_quats(2, -np.radians(y_degrees))
+        ),
+        axis_rotation_quats(1, np.radians(z_degrees))
+    )
+    quats[quats[:, 0] < 0.0] *= -1.0
+    return make_compatible(quats)
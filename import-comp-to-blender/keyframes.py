@@ -0,0 +1,62 @@
+'''
+Bulk keyframe writing. Adding keyframe points and then setting their properties one at a time goes through RNA for every
+single attribute, which is very slow for the long baked channels that After Effects exports can contain. Instead, all
+the keyframes for an F-curve are built up as flat arrays and written with one `foreach_set` call per attribute.
+'''
+
+import bpy
+import numpy as np
+from typing import Optional, Union
+
+def _enum_value(prop_name: str, identifier: str) -> int:
+    return bpy.types.Keyframe.bl_rna.properties[prop_name].enum_items[identifier].value
+
+INTERPOLATION_CONSTANT = _enum_value('interpolation', 'CONSTANT')
+INTERPOLATION_LINEAR = _enum_value('interpolation', 'LINEAR')
+INTERPOLATION_BEZIER = _enum_value('interpolation', 'BEZIER')
+HANDLE_FREE = _enum_value('handle_left_type', 'FREE')
+
+INTERPOLATION_BY_NAME = {
+    'CONSTANT': INTERPOLATION_CONSTANT,
+    'LINEAR': INTERPOLATION_LINEAR,
+    'BEZIER': INTERPOLATION_BEZIER,
+}
+
+def _flat(values, dtype) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=dtype).ravel()
+
+def write_keyframes(
+    fcurve: 'bpy.types.FCurve',
+    co: np.ndarray,
+    interpolation: Union[str, np.ndarray],
+    handle_left: Optional[np.ndarray] = None,
+    handle_right: Optional[np.ndarray] = None):
+    '''Writes a set of keyframes onto a newly-created F-curve in bulk.
+
+    Args:
+        fcurve (FCurve): The F-curve to add the keyframes to.
+        co (ndarray): The (frame, value) coordinates of each keyframe, as an (N, 2) array.
+        interpolation (str | ndarray): Either the name of one interpolation mode to use for all keyframes, or an (N,)
+            array of interpolation mode values (INTERPOLATION_CONSTANT, INTERPOLATION_LINEAR, INTERPOLATION_BEZIER).
+        handle_left (ndarray, optional): The (frame, value) coordinates of each keyframe's left handle, as an (N, 2)
+            array. If given, both handles are made free handles. If not, they are calculated automatically.
+        handle_right (ndarray, optional): The (frame, value) coordinates of each keyframe's right handle.
+    '''
+    num_keyframes = len(co)
+    points = fcurve.keyframe_points
+    points.add(num_keyframes)
+    points.foreach_set('co', _flat(co, np.float32))
+
+    if isinstance(interpolation, str):
+        interpolation = np.full(num_keyframes, INTERPOLATION_BY_NAME[interpolation], dtype=np.int32)
+    points.foreach_set('interpolation', _flat(interpolation, np.int32))
+
+    if handle_left is not None and handle_right is not None:
+        handle_types = np.full(num_keyframes, HANDLE_FREE, dtype=np.int32)
+        points.foreach_set('handle_left_type', handle_types)
+        points.foreach_set('handle_right_type', handle_types)
+        points.foreach_set('handle_left', _flat(handle_left, np.float32))
+        points.foreach_set('handle_right', _flat(handle_right, np.float32))
+
+    # Sorts the keyframes and recalculates any automatic handles
+    fcurve.update()
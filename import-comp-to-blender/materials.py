@@ -0,0 +1,169 @@
+'''
+Materials for AV layers, so that footage shows up in the viewport and renders. Every layer with the same source shares
+one material: file footage gets an image texture, and solids get a flat color. Images are only opened, not decoded, so
+importing stays fast no matter how large the footage is; Blender reads the pixels once something actually displays them.
+
+Each layer's opacity can be animated separately even though materials are shared, since it's stored on the layer's object
+(as the `OPACITY_PROP` custom property) and read by one shared node group.
+'''
+
+import bpy
+import json
+import os
+import re
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from .model import Source
+
+# Custom property on each AV layer's object holding its opacity, from 0 to 1
+OPACITY_PROP = 'ae_opacity'
+OPACITY_DATA_PATH = f'["{OPACITY_PROP}"]'
+
+# Custom property identifying which source a material was made for, or that a node group is the opacity node group
+MATERIAL_KEY_PROP = 'ae_source'
+OPACITY_GROUP_PROP = 'ae_opacity_group'
+OPACITY_GROUP_NAME = 'AE Layer Opacity'
+
+def footage_path(uri: str) -> str:
+    '''Converts an ExtendScript file URI (e.g. "/c/Footage/Plate%2001.png" or "~/Footage/Plate%2001.png") to a path.'''
+    path = unquote(uri)
+    if path.startswith('~'):
+        return os.path.expanduser(path)
+    # Windows drive letters are written as the first directory
+    if os.name == 'nt' and re.match(r'^/[A-Za-z]/', path):
+        return f'{path[1].upper()}:{path[2:]}'
+    return path
+
+def srgb_to_linear(value: float) -> float:
+    '''Converts an After Effects color component (in sRGB) to the linear values Blender's shader nodes use.'''
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+def source_material_key(source: Source) -> Optional[str]:
+    '''Returns the key identifying the material for a source, or None if it's a kind of source (like a precomp) that
+    doesn't get one.'''
+    if source.type == 'file':
+        return json.dumps(['file', footage_path(source.file)])
+    if source.type == 'solid':
+        return json.dumps(['solid', source.color])
+    return None
+
+def _opacity_node_group() -> 'bpy.types.ShaderNodeTree':
+    '''Returns the node group which turns a color and alpha into a shader, faded out by the object's opacity, creating
+    it if it doesn't exist yet.'''
+    for group in bpy.data.node_groups:
+        if group.get(OPACITY_GROUP_PROP):
+            return group
+
+    group = bpy.data.node_groups.new(OPACITY_GROUP_NAME, 'ShaderNodeTree')
+    group[OPACITY_GROUP_PROP] = True
+    group.interface.new_socket('Color', in_out='INPUT', socket_type='NodeSocketColor')
+    alpha_socket = group.interface.new_socket('Alpha', in_out='INPUT', socket_type='NodeSocketFloat')
+    alpha_socket.default_value = 1.0
+    alpha_socket.min_value = 0.0
+    alpha_socket.max_value = 1.0
+    group.interface.new_socket('Shader', in_out='OUTPUT', socket_type='NodeSocketShader')
+
+    nodes = group.nodes
+    links = group.links
+    group_input = nodes.new('NodeGroupInput')
+    group_input.location = (-600, 0)
+    group_output = nodes.new('NodeGroupOutput')
+    group_output.location = (400, 0)
+
+    opacity = nodes.new('ShaderNodeAttribute')
+    opacity.attribute_type = 'OBJECT'
+    opacity.attribute_name = OPACITY_PROP
+    opacity.location = (-600, 250)
+    alpha = nodes.new('ShaderNodeMath')
+    alpha.operation = 'MULTIPLY'
+    alpha.use_clamp = True
+    alpha.location = (-350, 150)
+    links.new(opacity.outputs['Fac'], alpha.inputs[0])
+    links.new(group_input.outputs['Alpha'], alpha.inputs[1])
+
+    # Footage is shown as-is rather than lit, like in After Effects
+    emission = nodes.new('ShaderNodeEmission')
+    emission.location = (-350, -100)
+    links.new(group_input.outputs['Color'], emission.inputs['Color'])
+    transparent = nodes.new('ShaderNodeBsdfTransparent')
+    transparent.location = (-350, -250)
+
+    mix = nodes.new('ShaderNodeMixShader')
+    mix.location = (150, 0)
+    links.new(alpha.outputs['Value'], mix.inputs['Fac'])
+    links.new(transparent.outputs['BSDF'], mix.inputs[1])
+    links.new(emission.outputs['Emission'], mix.inputs[2])
+    links.new(mix.outputs['Shader'], group_output.inputs['Shader'])
+    return group
+
+class SourceMaterials:
+    """Creates materials for layer sources, sharing one material (and image) per source file or solid color, including
+    with previous imports"""
+    _materials: Optional[Dict[str, 'bpy.types.Material']]
+    # Paths of footage files that couldn't be opened
+    missing_files: List[str]
+
+    def __init__(self):
+        self._materials = None
+        self.missing_files = []
+
+    def material(self, source: Source) -> Optional['bpy.types.Material']:
+        '''Returns the material for a given source, or None if it doesn't get one.'''
+        key = source_material_key(source)
+        if key is None:
+            return None
+
+        if self._materials is None:
+            self._materials = dict()
+            for material in bpy.data.materials:
+                if MATERIAL_KEY_PROP in material:
+                    self._materials.setdefault(material[MATERIAL_KEY_PROP], material)
+        material = self._materials.get(key)
+        if material is not None:
+            return material
+
+        material = bpy.data.materials.new(source.name or 'Layer')
+        material[MATERIAL_KEY_PROP] = key
+        material.use_nodes = True
+        nodes = material.node_tree.nodes
+        links = material.node_tree.links
+        nodes.clear()
+
+        opacity = nodes.new('ShaderNodeGroup')
+        opacity.node_tree = _opacity_node_group()
+        output = nodes.new('ShaderNodeOutputMaterial')
+        output.location = (300, 0)
+        links.new(opacity.outputs['Shader'], output.inputs['Surface'])
+
+        if source.type == 'file':
+            texture = nodes.new('ShaderNodeTexImage')
+            texture.location = (-350, 0)
+            texture.image = image = self._footage_image(source)
+            if image.source == 'MOVIE':
+                # Reading the length only opens the file, without decoding any frames
+                texture.image_user.frame_duration = image.frame_duration
+                texture.image_user.use_auto_refresh = True
+            links.new(texture.outputs['Color'], opacity.inputs['Color'])
+            links.new(texture.outputs['Alpha'], opacity.inputs['Alpha'])
+        else:
+            opacity.inputs['Color'].default_value = (*(srgb_to_linear(value) for value in source.color), 1.0)
+            material.diffuse_color = opacity.inputs['Color'].default_value
+
+        self._materials[key] = material
+        return material
+
+    def _footage_image(self, source: Source) -> 'bpy.types.Image':
+        '''Returns the image for a file source. Missing files still get an image, which can be pointed at the right file
+        later (e.g. with File > External Data > Find Missing Files).'''
+        path = footage_path(source.file)
+        try:
+            return bpy.data.images.load(path, check_existing=True)
+        except RuntimeError:
+            self.missing_files.append(path)
+            image = bpy.data.images.new(os.path.basename(path), 1, 1)
+            image.source = 'FILE'
+            image.filepath = path
+            return image
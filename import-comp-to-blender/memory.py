@@ -0,0 +1,209 @@
+'''
+Estimating how much memory an import will take in Blender, before anything is created. Nearly all of it is animation:
+every keyframe takes the same fixed amount of memory no matter what it animates, so the estimate comes from counting
+the F-curves and keyframes each layer will be imported as, which only needs the model's channel lengths.
+
+Blender keeps a second, evaluated copy of every animated object and its action for the depsgraph as soon as the scene
+is updated, so everything is counted twice.
+'''
+
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from .intervals import layer_in_out_frames
+from .model import BakedChannel, BakedTransform, BezierChannel, Channel, Comp, Layer
+from .plan import PlanSettings
+
+# Size of one keyframe (a `BezTriple`), whatever its interpolation
+KEYFRAME_BYTES = 72
+# Size of one sample point (an `FPoint`)
+SAMPLE_POINT_BYTES = 16
+# Rough size of an F-curve besides its keyframes, and of an object besides its animation, measured from imports
+FCURVE_BYTES = 1024
+OBJECT_BYTES = 8192
+# The original data, plus the depsgraph's evaluated copy of it
+COPIES = 2
+
+# Channels of non-baked layers' properties which become F-curves when they're animated
+_ANIMATED_PROPERTIES = (
+    'position', 'anchor_point', 'scale', 'rotation_x', 'rotation_y', 'rotation_z', 'point_of_interest'
+)
+
+@dataclass
+class MemoryEstimate:
+    """Counts of what an import will create, and how much memory they'll take"""
+    objects: int = 0
+    fcurves: int = 0
+    keyframes: int = 0
+    sample_points: int = 0
+    # Keyframes which "Baked Keyframes as Samples" would store as sample points instead
+    sampleable_keyframes: int = 0
+    # Keyframes of baked channels, which "Simplify Baked Keyframes" can reduce (so they're an upper bound when it's on)
+    baked_keyframes: int = 0
+    # Whether any baked channels were supersampled, in which case a lower "Transform sampling rate" would help
+    supersampled: bool = False
+
+    @property
+    def total_bytes(self) -> int:
+        return COPIES * (
+            self.objects * OBJECT_BYTES +
+            self.fcurves * FCURVE_BYTES +
+            self.keyframes * KEYFRAME_BYTES +
+            self.sample_points * SAMPLE_POINT_BYTES
+        )
+
+    @property
+    def total_bytes_as_samples(self) -> int:
+        '''Returns what the import would take with "Baked Keyframes as Samples" checked.'''
+        return self.total_bytes - COPIES * self.sampleable_keyframes * (KEYFRAME_BYTES - SAMPLE_POINT_BYTES)
+
+    def to_json(self) -> dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    @staticmethod
+    def from_json(data: dict) -> 'MemoryEstimate':
+        return MemoryEstimate(**data)
+
+def _consecutive(sample_frames: Optional[np.ndarray]) -> bool:
+    '''Returns whether a baked channel's samples are one comp frame apart, which only adaptively sampled ones
+    (which list the frame of each sample) might not be.'''
+    return sample_frames is None or bool(np.all(np.diff(sample_frames) == 1))
+
+class _Counter:
+    """Adds up one composition's F-curves and keyframes the same way `LayerPlanner` plans them"""
+    settings: PlanSettings
+    estimate: MemoryEstimate
+
+    def __init__(self, settings: PlanSettings, estimate: MemoryEstimate):
+        self.settings = settings
+        self.estimate = estimate
+
+    def baked(
+        self,
+        num_fcurves: int,
+        num_keyframes: int,
+        start_frame: float,
+        supersampling: int,
+        sample_frames: Optional[np.ndarray],
+        runs: bool):
+        '''Counts F-curves of baked keyframes, which all have the same frames.
+
+        Args:
+            num_fcurves (int): The number of F-curves.
+            num_keyframes (int): The number of keyframes on each one, which is one per run for run-length encoded
+                channels.
+            start_frame (float): The frame the keyframes start at.
+            supersampling (int): How many samples there are per frame.
+            sample_frames (ndarray, optional): The comp frame of each sample, for adaptively sampled channels.
+            runs (bool): Whether the channels are run-length encoded, in which case they're never simplified or
+                converted to sample points.
+        '''
+        settings = self.settings
+        estimate = self.estimate
+        estimate.fcurves += num_fcurves
+        estimate.supersampled = estimate.supersampled or supersampling > 1
+        total = num_fcurves * num_keyframes
+        if runs:
+            estimate.keyframes += total
+            return
+        estimate.baked_keyframes += total
+        # The same conditions as `LayerPlanner.baked_keyframes`, where simplifying takes precedence
+        sampleable = (
+            not settings.simplify_baked and num_keyframes > 1 and supersampling == 1 and
+            float(start_frame).is_integer() and settings.desired_framerate == settings.comp_framerate and
+            _consecutive(sample_frames)
+        )
+        if sampleable and settings.baked_samples:
+            estimate.sample_points += total
+            return
+        estimate.keyframes += total
+        if sampleable:
+            estimate.sampleable_keyframes += total
+
+    def channel(self, channel: Channel):
+        if isinstance(channel, BezierChannel):
+            self.estimate.fcurves += 1
+            self.estimate.keyframes += len(channel.times)
+        elif isinstance(channel, BakedChannel):
+            self.baked(
+                1,
+                len(channel.values),
+                channel.start_frame,
+                channel.supersampling,
+                channel.sample_frames,
+                channel.run_lengths is not None
+            )
+
+    def transform(self, transform: BakedTransform):
+        # Location, rotation (as a quaternion), and scale
+        self.baked(
+            10,
+            len(transform.matrices),
+            transform.start_frame,
+            transform.supersampling,
+            transform.sample_frames,
+            transform.run_lengths is not None
+        )
+
+    def layer(self, layer: Layer):
+        settings = self.settings
+        estimate = self.estimate
+        estimate.objects += 1
+
+        if settings.transforms_baked:
+            self.transform(layer.transform)
+        else:
+            for name in _ANIMATED_PROPERTIES:
+                prop = getattr(layer, name)
+                if prop is not None:
+                    for channel in prop.channels:
+                        self.channel(channel)
+            # Anchor points, orientations, and points of interest (which take two) get empties of their own. Static
+            # ones are sometimes left out, but the empties are small enough not to matter.
+            estimate.objects += sum(
+                prop is not None for prop in (layer.anchor_point, layer.orientation, layer.point_of_interest)
+            )
+            if layer.point_of_interest is not None:
+                estimate.objects += 1
+
+            if layer.orientation is not None and isinstance(layer.orientation.channels[0], BakedChannel):
+                # Expanded into every sample, and converted into a quaternion
+                channel = layer.orientation.channels[0]
+                self.baked(
+                    4,
+                    channel.num_samples(),
+                    channel.start_frame,
+                    channel.supersampling,
+                    channel.sample_frames,
+                    False
+                )
+
+        if layer.type == 'camera' and layer.zoom is not None:
+            self.channel(layer.zoom.channels[0])
+        if settings.import_materials and layer.type == 'av' and not layer.null_layer and layer.opacity is not None:
+            self.channel(layer.opacity.channels[0])
+        if settings.hide_outside_in_out:
+            in_out_frames = layer_in_out_frames(layer)
+            if in_out_frames is not None and in_out_frames[1] > in_out_frames[0]:
+                # Hidden in viewports and renders, with a keyframe before the in point, at it, and at the out point
+                estimate.fcurves += 2
+                estimate.keyframes += 6
+
+def estimate_comp_memory(
+    comp: Comp,
+    settings: PlanSettings,
+    estimate: Optional[MemoryEstimate] = None) -> MemoryEstimate:
+    '''Adds what importing a composition will create to an estimate.
+
+    Args:
+        comp (Comp): The composition, along with its layers.
+        settings (PlanSettings): The settings its layers will be planned with.
+        estimate (MemoryEstimate, optional): The estimate to add to. Defaults to a new one.
+    '''
+    if estimate is None:
+        estimate = MemoryEstimate()
+    counter = _Counter(settings, estimate)
+    for layer in comp.layers:
+        counter.layer(layer)
+    return estimate
@@ -0,0 +1,455 @@
+'''
+Typed model of decoded composition files. Every layer is checked and converted as soon as it's decoded, so that a
+malformed file is rejected as a whole before anything is created in Blender, rather than partway through importing it.
+
+Animated channels are stored as a handful of contiguous NumPy arrays (e.g. one array of times and one of values for all
+of a channel's keyframes) rather than a dict per keyframe, and baked transforms as one (N, 12) array of matrices rather
+than a list per matrix. This takes a fraction of the memory, and lets the planner work on whole channels at once.
+'''
+
+import numpy as np
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+# After Effects keyframe interpolation types, stored by their index in this tuple
+AE_INTERPOLATION_TYPES = ('linear', 'bezier', 'hold')
+AE_INTERPOLATION_HOLD = AE_INTERPOLATION_TYPES.index('hold')
+_AE_INTERPOLATION_CODES = {name: code for code, name in enumerate(AE_INTERPOLATION_TYPES)}
+
+# Properties of non-baked layers, by their key in the file, with how many channels each one must have
+_LAYER_PROPERTIES = {
+    'position': ('position', 3),
+    'anchorPoint': ('anchor_point', 3),
+    'scale': ('scale', 3),
+    'rotationX': ('rotation_x', 1),
+    'rotationY': ('rotation_y', 1),
+    'rotationZ': ('rotation_z', 1),
+    'orientation': ('orientation', 3),
+    'pointOfInterest': ('point_of_interest', 3)
+}
+
+class InvalidFileError(ValueError):
+    """Raised when an exported file doesn't have the structure the importer expects"""
+
+@dataclass(slots=True)
+class StaticChannel:
+    """A channel that isn't animated"""
+    value: float
+
+@dataclass(slots=True)
+class BezierChannel:
+    """A channel exported as After Effects keyframes, with one element per keyframe in each array"""
+    # In seconds
+    times: np.ndarray
+    values: np.ndarray
+    # In units per second
+    ease_in_speeds: np.ndarray
+    # As a percentage of the time since the previous keyframe
+    ease_in_influences: np.ndarray
+    ease_out_speeds: np.ndarray
+    # As a percentage of the time until the next keyframe
+    ease_out_influences: np.ndarray
+    # Indices into `AE_INTERPOLATION_TYPES`
+    interpolation_in: np.ndarray
+    interpolation_out: np.ndarray
+
+@dataclass(slots=True)
+class BakedChannel:
+    """A channel sampled by the exporter ("calculated"), which may be run-length encoded ("runs") or adaptively
+    sampled"""
+    values: np.ndarray
+    start_frame: float
+    supersampling: int
+    # The number of samples in each run, for run-length encoded channels
+    run_lengths: Optional[np.ndarray] = None
+    # The comp frame each value was sampled at, for adaptively sampled channels
+    sample_frames: Optional[np.ndarray] = None
+
+    def num_samples(self) -> int:
+        '''Returns the number of samples the channel stands for, counting every sample in a run.'''
+        if self.run_lengths is not None:
+            return int(self.run_lengths.sum())
+        return len(self.values)
+
+Channel = Union[StaticChannel, BezierChannel, BakedChannel]
+
+@dataclass(slots=True)
+class Property:
+    """An animatable layer property, with one channel per dimension"""
+    channels: Tuple[Channel, ...]
+
+@dataclass(slots=True)
+class BakedTransform:
+    """A layer's transform, baked into one 3x4 affine matrix (row-major) per sample"""
+    # (N, 12)
+    matrices: np.ndarray
+    start_frame: float
+    supersampling: int
+    run_lengths: Optional[np.ndarray] = None
+    sample_frames: Optional[np.ndarray] = None
+
+@dataclass(slots=True)
+class Source:
+    """What an AV layer shows: a footage file, a solid, a precomp, or something else"""
+    name: Optional[str]
+    # 'file', 'solid', 'comp', or 'unknown'
+    type: str
+    width: float
+    height: float
+    file: Optional[str] = None
+    color: Optional[Tuple[float, float, float]] = None
+    # For precomps which were exported too, their index in the file's compositions
+    comp: Optional[int] = None
+
+@dataclass(slots=True)
+class Layer:
+    name: str
+    # 'av', 'camera', or 'unknown'
+    type: str
+    index: int
+    parent_index: Optional[int]
+    comp_index: int = 0
+    # Older files don't have in/out points, or whether the layer is enabled
+    in_frame: Optional[float] = None
+    out_frame: Optional[float] = None
+    enabled: Optional[bool] = None
+    source: Optional[int] = None
+    null_layer: bool = False
+    # Only for files with baked transforms, which don't have any of the transform properties below
+    transform: Optional[BakedTransform] = None
+    position: Optional[Property] = None
+    anchor_point: Optional[Property] = None
+    scale: Optional[Property] = None
+    rotation_x: Optional[Property] = None
+    rotation_y: Optional[Property] = None
+    rotation_z: Optional[Property] = None
+    orientation: Optional[Property] = None
+    point_of_interest: Optional[Property] = None
+    opacity: Optional[Property] = None
+    zoom: Optional[Property] = None
+
+@dataclass(slots=True)
+class Comp:
+    name: str
+    width: float
+    height: float
+    pixel_aspect: float
+    frame_rate: float
+    # Start and end, in seconds
+    work_area: Tuple[float, float]
+    layers: List[Layer] = field(default_factory=list)
+
+@dataclass(slots=True)
+class CompFile:
+    """Everything in an exported file"""
+    comps: List[Comp]
+    sources: List[Source]
+    transforms_baked: bool
+
+    @property
+    def num_layers(self) -> int:
+        return sum(len(comp.layers) for comp in self.comps)
+
+def _get(data, key: str, where: str):
+    if not isinstance(data, dict):
+        raise InvalidFileError(f'{where} should be an object')
+    if key not in data:
+        raise InvalidFileError(f'{where} is missing "{key}"')
+    return data[key]
+
+def _number(value, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidFileError(f'{where} should be a number')
+    return value
+
+def _integer(value, where: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        # Numbers may have been written as floats
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        raise InvalidFileError(f'{where} should be a whole number')
+    return value
+
+def _string(value, where: str) -> str:
+    if not isinstance(value, str):
+        raise InvalidFileError(f'{where} should be a string')
+    return value
+
+def _boolean(value, where: str) -> bool:
+    if not isinstance(value, bool):
+        raise InvalidFileError(f'{where} should be true or false')
+    return value
+
+def _array(value, where: str, copy: bool) -> np.ndarray:
+    '''Converts a list of numbers to a float64 array. Arrays from the binary keyframe data file are kept as they are
+    (as float32), unless `copy` is set, in which case they're copied out of the memory-mapped file so it can be
+    closed.'''
+    if isinstance(value, np.ndarray):
+        return value.copy() if copy else value
+    if not isinstance(value, list):
+        raise InvalidFileError(f'{where} should be an array of numbers')
+    try:
+        array = np.array(value, dtype=np.float64)
+    except (TypeError, ValueError) as err:
+        raise InvalidFileError(f'{where} should be an array of numbers') from err
+    if array.ndim != 1:
+        raise InvalidFileError(f'{where} should be an array of numbers')
+    return array
+
+def _run_lengths(value, num_values: int, where: str, copy: bool) -> np.ndarray:
+    lengths = _array(value, where, copy)
+    if len(lengths) != num_values:
+        raise InvalidFileError(f'{where} should have one run length per keyframe')
+    if np.any(lengths < 1) or np.any(lengths != np.round(lengths)):
+        raise InvalidFileError(f'{where} should only contain positive whole numbers')
+    return lengths.astype(np.int64)
+
+def _supersampling(value, where: str) -> int:
+    supersampling = _integer(value, where)
+    if supersampling < 1:
+        raise InvalidFileError(f'{where} should be a positive whole number')
+    return supersampling
+
+def _sample_frames(value, num_values: int, where: str, copy: bool) -> np.ndarray:
+    frames = _array(value, where, copy)
+    if len(frames) != num_values:
+        raise InvalidFileError(f'{where} should have one sample frame per keyframe')
+    return frames
+
+def _load_bezier_keyframes(keyframes, where: str) -> BezierChannel:
+    if not isinstance(keyframes, list):
+        raise InvalidFileError(f'{where} should be an array of keyframes')
+    try:
+        columns = (
+            [keyframe['time'] for keyframe in keyframes],
+            [keyframe['value'] for keyframe in keyframes],
+            [keyframe['easeIn']['speed'] for keyframe in keyframes],
+            [keyframe['easeIn']['influence'] for keyframe in keyframes],
+            [keyframe['easeOut']['speed'] for keyframe in keyframes],
+            [keyframe['easeOut']['influence'] for keyframe in keyframes]
+        )
+        interpolation = (
+            [_AE_INTERPOLATION_CODES[keyframe['interpolationIn']] for keyframe in keyframes],
+            [_AE_INTERPOLATION_CODES[keyframe['interpolationOut']] for keyframe in keyframes]
+        )
+        arrays = [np.array(column, dtype=np.float64) for column in columns]
+    except (KeyError, TypeError, ValueError) as err:
+        raise InvalidFileError(f'{where} has a malformed keyframe') from err
+    if any(array.ndim != 1 for array in arrays):
+        raise InvalidFileError(f'{where} has a malformed keyframe')
+    return BezierChannel(*arrays, *(np.array(codes, dtype=np.uint8) for codes in interpolation))
+
+def _load_channel(data, where: str, copy: bool) -> Channel:
+    if not _boolean(_get(data, 'isKeyframed', where), f'{where} "isKeyframed"'):
+        return StaticChannel(_number(_get(data, 'value', where), f'{where} value'))
+
+    keyframes_format = _get(data, 'keyframesFormat', where)
+    keyframes = _get(data, 'keyframes', where)
+    if keyframes_format == 'bezier':
+        return _load_bezier_keyframes(keyframes, f'{where} keyframes')
+    if keyframes_format not in ('calculated', 'runs'):
+        raise InvalidFileError(f'{where} has unknown keyframe format "{keyframes_format}"')
+
+    values = _array(keyframes, f'{where} keyframes', copy)
+    channel = BakedChannel(
+        values,
+        _number(_get(data, 'startFrame', where), f'{where} start frame'),
+        _supersampling(data.get('supersampling', 1), f'{where} supersampling')
+    )
+    if 'sampleFrames' in data:
+        channel.sample_frames = _sample_frames(data['sampleFrames'], len(values), f'{where} sample frames', copy)
+    elif keyframes_format == 'runs':
+        channel.run_lengths = _run_lengths(_get(data, 'runLengths', where), len(values), f'{where} run lengths', copy)
+    return channel
+
+def _load_property(data, num_channels: int, where: str, copy: bool) -> Property:
+    channels = _get(data, 'channels', where)
+    if not isinstance(channels, list) or len(channels) < num_channels:
+        raise InvalidFileError(f'{where} should have {num_channels} channel(s)')
+    return Property(tuple(
+        _load_channel(channel, f'{where} channel {i}', copy) for i, channel in enumerate(channels[:num_channels])
+    ))
+
+def _check_orientation(orientation: Property, where: str):
+    '''Checks that orientation can be converted to quaternions, which needs all of its channels sampled together.'''
+    channels = orientation.channels
+    if all(isinstance(channel, StaticChannel) for channel in channels):
+        return
+    if not all(isinstance(channel, BakedChannel) for channel in channels):
+        raise InvalidFileError(
+            f'{where} channels should either all be keyframed in "calculated" or "runs" format, or all be not '
+            'keyframed'
+        )
+    sample_frames = channels[0].sample_frames
+    if not all(np.array_equal(channel.sample_frames, sample_frames) for channel in channels[1:]):
+        raise InvalidFileError(f'{where} channels should all be sampled at the same frames')
+    num_samples = channels[0].num_samples()
+    if not all(channel.num_samples() == num_samples for channel in channels[1:]):
+        raise InvalidFileError(f'{where} channels should all have the same number of samples')
+
+def _load_baked_transform(data, where: str, copy: bool) -> BakedTransform:
+    keyframes = _get(data, 'keyframes', where)
+    if isinstance(keyframes, np.ndarray):
+        # Binary keyframe data stores all the matrices one after another in a single flat array
+        if len(keyframes) % 12 != 0:
+            raise InvalidFileError(f'{where} keyframes should be a whole number of 3x4 matrices')
+        matrices = (keyframes.copy() if copy else keyframes).reshape(-1, 12)
+    else:
+        try:
+            matrices = np.array(keyframes, dtype=np.float64)
+        except (TypeError, ValueError) as err:
+            raise InvalidFileError(f'{where} keyframes should be an array of 3x4 matrices') from err
+        if len(keyframes) == 0:
+            matrices = matrices.reshape(0, 12)
+        if matrices.ndim != 2 or matrices.shape[1] != 12:
+            raise InvalidFileError(f'{where} keyframes should be an array of 3x4 matrices')
+
+    transform = BakedTransform(
+        matrices,
+        _number(_get(data, 'startFrame', where), f'{where} start frame'),
+        _supersampling(data.get('supersampling', 1), f'{where} supersampling')
+    )
+    if 'sampleFrames' in data:
+        transform.sample_frames = _sample_frames(data['sampleFrames'], len(matrices), f'{where} sample frames', copy)
+    elif 'runLengths' in data:
+        transform.run_lengths = _run_lengths(data['runLengths'], len(matrices), f'{where} run lengths', copy)
+    return transform
+
+def load_layer(data, transforms_baked: bool, num_comps: int, num_sources: int, copy: bool = False) -> Layer:
+    '''Checks a decoded layer and converts it to the model.
+
+    Args:
+        data (dict): The decoded layer.
+        transforms_baked (bool): Whether the file's transforms are baked.
+        num_comps (int): The number of compositions in the file.
+        num_sources (int): The number of sources in the file.
+        copy (bool, optional): Whether to copy arrays from the binary keyframe data file, so it can be closed while the
+            layer is still around.
+
+    Raises:
+        InvalidFileError: If the layer is malformed.
+    '''
+    name = _string(_get(data, 'name', 'A layer'), 'A layer\'s name')
+    where = f'Layer "{name}"'
+    parent_index = _get(data, 'parentIndex', where)
+    layer = Layer(
+        name,
+        _string(_get(data, 'type', where), f'{where} type'),
+        _integer(_get(data, 'index', where), f'{where} index'),
+        None if parent_index is None else _integer(parent_index, f'{where} parent index'),
+        _integer(data.get('compIndex', 0), f'{where} composition index')
+    )
+    if not 0 <= layer.comp_index < num_comps:
+        raise InvalidFileError(f'{where} belongs to a composition that isn\'t in the file')
+    if 'inFrame' in data and 'outFrame' in data:
+        layer.in_frame = _number(data['inFrame'], f'{where} in point')
+        layer.out_frame = _number(data['outFrame'], f'{where} out point')
+    if 'enabled' in data:
+        layer.enabled = _boolean(data['enabled'], f'{where} "enabled"')
+    layer.null_layer = _boolean(data.get('nullLayer', False), f'{where} "nullLayer"')
+
+    if layer.type == 'av' and not layer.null_layer:
+        # AV layers get a mesh the size of their source
+        layer.source = _integer(_get(data, 'source', where), f'{where} source')
+        if not 0 <= layer.source < num_sources:
+            raise InvalidFileError(f'{where} has a source that isn\'t in the file')
+
+    if transforms_baked:
+        layer.transform = _load_baked_transform(_get(data, 'transform', where), f'{where} transform', copy)
+    else:
+        for key, (attr, num_channels) in _LAYER_PROPERTIES.items():
+            if key in data:
+                setattr(layer, attr, _load_property(data[key], num_channels, f'{where} {key}', copy))
+        if layer.orientation is not None:
+            _check_orientation(layer.orientation, f'{where} orientation')
+
+    if 'opacity' in data:
+        layer.opacity = _load_property(data['opacity'], 1, f'{where} opacity', copy)
+    if layer.type == 'camera':
+        layer.zoom = _load_property(_get(data, 'zoom', where), 1, f'{where} zoom', copy)
+    return layer
+
+def _load_comp(data, where: str) -> Comp:
+    work_area = _get(data, 'workArea', where)
+    if not isinstance(work_area, list) or len(work_area) != 2:
+        raise InvalidFileError(f'{where} work area should be a start and end time')
+    comp = Comp(
+        _string(_get(data, 'name', where), f'{where} name'),
+        _number(_get(data, 'width', where), f'{where} width'),
+        _number(_get(data, 'height', where), f'{where} height'),
+        _number(_get(data, 'pixelAspect', where), f'{where} pixel aspect ratio'),
+        _number(_get(data, 'frameRate', where), f'{where} frame rate'),
+        (_number(work_area[0], f'{where} work area'), _number(work_area[1], f'{where} work area'))
+    )
+    if comp.width <= 0 or comp.height <= 0 or comp.pixel_aspect <= 0 or comp.frame_rate <= 0:
+        raise InvalidFileError(f'{where} should have a positive size, pixel aspect ratio, and frame rate')
+    return comp
+
+def _load_source(data, where: str) -> Source:
+    source = Source(
+        data.get('name') if isinstance(data, dict) else None,
+        _string(data.get('type', 'unknown') if isinstance(data, dict) else None, f'{where} type'),
+        _number(_get(data, 'width', where), f'{where} width'),
+        _number(_get(data, 'height', where), f'{where} height')
+    )
+    if source.type == 'file':
+        source.file = _string(_get(data, 'file', where), f'{where} file')
+    elif source.type == 'solid':
+        color = _get(data, 'color', where)
+        if not isinstance(color, list) or len(color) != 3:
+            raise InvalidFileError(f'{where} color should have 3 components')
+        source.color = tuple(_number(value, f'{where} color') for value in color)
+    elif source.type == 'comp' and 'comp' in data:
+        source.comp = _integer(data['comp'], f'{where} composition')
+    return source
+
+def load_header(header: dict) -> CompFile:
+    '''Checks everything in a decoded file besides its layers, and converts it to a model with no layers yet, for
+    `add_layer` to add them to one at a time.
+
+    Raises:
+        InvalidFileError: If anything in the file is malformed.
+    '''
+    # Files from before version 7 only hold one composition
+    if 'comps' in header:
+        comps_data = header['comps']
+        if not isinstance(comps_data, list) or len(comps_data) == 0:
+            raise InvalidFileError('The file should have at least one composition')
+    else:
+        comps_data = [_get(header, 'comp', 'The file')]
+    comps = [_load_comp(comp, f'Composition {i}') for i, comp in enumerate(comps_data)]
+
+    sources_data = _get(header, 'sources', 'The file')
+    if not isinstance(sources_data, list):
+        raise InvalidFileError('The file\'s sources should be an array')
+    sources = [_load_source(source, f'Source {i}') for i, source in enumerate(sources_data)]
+
+    return CompFile(
+        comps,
+        sources,
+        _boolean(_get(header, 'transformsBaked', 'The file'), 'The file\'s "transformsBaked"')
+    )
+
+def add_layer(comp_file: CompFile, data, copy: bool = False):
+    '''Checks a decoded layer and adds it to its composition in a model from `load_header`.
+
+    Raises:
+        InvalidFileError: If anything in the layer is malformed.
+    '''
+    layer = load_layer(data, comp_file.transforms_baked, len(comp_file.comps), len(comp_file.sources), copy)
+    comp_file.comps[layer.comp_index].layers.append(layer)
+
+def check_layers(comp_file: CompFile):
+    '''Checks what can only be checked once every layer has been added to a model: that every layer's parent is in
+    the file.
+
+    Raises:
+        InvalidFileError: If a layer's parent is missing.
+    '''
+    if not comp_file.transforms_baked:
+        # Parents are looked up by index once all of a composition's layers have been imported
+        for comp in comp_file.comps:
+            indices = {layer.index for layer in comp.layers}
+            for layer in comp.layers:
+                if layer.parent_index is not None and layer.parent_index not in indices:
+                    raise InvalidFileError(f'Layer "{layer.name}" has a parent that isn\'t in the file')
@@ -0,0 +1,687 @@
+'''
+Planning an import: turning each layer's model into everything needed to create its objects and animation, without
+touching Blender's data. This covers all the per-layer math (Bezier handles, framerate remapping, decomposing baked
+transforms, converting orientation to quaternions, and simplifying baked channels), which leaves only writing the results
+into Blender for the main thread. Since planning never touches Blender, layers are planned on a pool of worker threads
+while the main thread applies the plans of the layers before them.
+'''
+
+import numpy as np
+from dataclasses import dataclass, field
+from mathutils import Quaternion
+from math import pi, radians, sin, asin
+from time import perf_counter
+from typing import Any, List, Optional, Tuple, Union
+
+from .intervals import layer_in_out_frames
+from .keyframes import INTERPOLATION_CONSTANT, INTERPOLATION_LINEAR, INTERPOLATION_BEZIER
+from .kernels import decompose_baked_transforms, orientation_to_quats
+from .materials import OPACITY_DATA_PATH
+from .model import (
+    AE_INTERPOLATION_HOLD, BakedChannel, BakedTransform, BezierChannel, Channel, Layer, Property, Source, StaticChannel
+)
+from .simplify import SimplifyStats, simplify_channel
+from .sync import (
+    ROLE_LAYER, ROLE_ANCHOR, ROLE_ORIENTATION, ROLE_POINT_OF_INTEREST_PARENT, ROLE_POINT_OF_INTEREST, layer_hash
+)
+
+ANGLE_CONVERSION_FACTOR = pi / 180
+
+# These are used to swap Z and -Y for baked transforms. Not sure this is the best way to do it.
+BAKED_PRE_QUAT = tuple(Quaternion((1.0, 0.0, 0.0), radians(-90.0)))
+BAKED_POST_QUAT = tuple(Quaternion((1.0, 0.0, 0.0), radians(90.0)))
+BAKED_CAMERA_POST_QUAT = tuple(Quaternion((1.0, 0.0, 0.0), radians(180.0)))
+
+@dataclass
+class PlanSettings:
+    """Everything besides a layer's own data that affects how it's imported"""
+    scale_factor: float
+    comp_width: float
+    comp_height: float
+    comp_framerate: float
+    desired_framerate: float
+    comp_center_to_origin: bool
+    transforms_baked: bool
+    sources: List[Source]
+    simplify_baked: bool = False
+    simplify_tolerance: float = 0.001
+    simplify_angle_tolerance: float = 0.0
+    hide_outside_in_out: bool = False
+    import_materials: bool = False
+    baked_samples: bool = False
+    # Settings which go into each layer's hash when syncing, or None when not syncing
+    hash_settings: Optional[dict] = None
+
+@dataclass
+class FCurvePlan:
+    """The keyframes for one F-curve, ready to be passed to `write_keyframes`"""
+    data_path: str
+    index: int
+    co: np.ndarray
+    interpolation: Union[str, np.ndarray] = 'LINEAR'
+    handle_left: Optional[np.ndarray] = None
+    handle_right: Optional[np.ndarray] = None
+    # Whether to convert the keyframes into sample points once they're written. They must all be linear, on whole
+    # frames, and one frame apart.
+    samples: bool = False
+
+@dataclass
+class ObjectPlan:
+    """One Blender object to create for a layer, along with its static property values and animation"""
+    role: str
+    name: str
+    # 'MESH', 'CAMERA', or 'EMPTY'
+    object_type: str = 'EMPTY'
+    empty_display_type: Optional[str] = None
+    rotation_mode: str = 'XYZ'
+    # Role of the object (within the same layer) that this one is parented to
+    parent_role: Optional[str] = None
+    # Role of the object that a "Track To" constraint on this one should target
+    track_to_role: Optional[str] = None
+    # (data path, index, value), with index -1 for single-dimension properties
+    properties: List[Tuple[str, int, Any]] = field(default_factory=list)
+    fcurves: List[FCurvePlan] = field(default_factory=list)
+    # The same, for the object's data (e.g. a camera's lens)
+    data_properties: List[Tuple[str, int, Any]] = field(default_factory=list)
+    data_fcurves: List[FCurvePlan] = field(default_factory=list)
+
+@dataclass
+class LayerPlan:
+    """Everything needed to import one layer"""
+    layer: Layer
+    key: str
+    import_hash: Optional[str] = None
+    # Whether the layer is the same as when it was last imported, in which case there's nothing else to do
+    unchanged: bool = False
+    # Objects to create, innermost (the layer itself) first
+    objects: List[ObjectPlan] = field(default_factory=list)
+    # Role of the object that gets parented to the layer's parent
+    outermost_role: str = ROLE_LAYER
+    # For AV layers with a mesh, the source it's made from
+    source: Optional[Source] = None
+    simplify_stats: SimplifyStats = field(default_factory=SimplifyStats)
+    # Time spent planning the layer, on whichever thread did it
+    seconds: float = 0.0
+
+def baked_keyframe_frames(
+    num_keyframes: int,
+    start_frame: int,
+    comp_framerate: float,
+    desired_framerate: float,
+    supersampling_rate: int) -> np.ndarray:
+    '''Returns the frame numbers of each keyframe of a baked channel, which has keyframes at regular intervals.
+
+    Args:
+        num_keyframes (int): The number of keyframes in the channel.
+        start_frame (int): The frame number at which the keyframe data starts.
+        comp_framerate (float): The comp's framerate.
+        desired_framerate (float): The desired framerate.
+        supersampling_rate (int): Multiplier for the framerate; this many keyframes were created per frame.
+    '''
+    return (((np.arange(num_keyframes) / supersampling_rate) + start_frame) * desired_framerate) / comp_framerate
+
+def run_keyframes(
+    run_lengths: np.ndarray,
+    start_frame: int,
+    comp_framerate: float,
+    desired_framerate: float,
+    supersampling_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Returns the frame number and interpolation of the keyframe for each run of a run-length encoded baked channel,
+    whose samples are stored once per run of repeated values. Runs of more than one sample hold their value until the
+    next run starts, and single samples are interpolated linearly like other baked keyframes.
+
+    Args:
+        run_lengths (ndarray): The number of samples in each run.
+        start_frame (int): The frame number at which the keyframe data starts.
+        comp_framerate (float): The comp's framerate.
+        desired_framerate (float): The desired framerate.
+        supersampling_rate (int): Multiplier for the framerate; this many samples were created per frame.
+    '''
+    starts = np.cumsum(run_lengths) - run_lengths
+    frames = (((starts / supersampling_rate) + start_frame) * desired_framerate) / comp_framerate
+    interpolation = np.where(run_lengths > 1, INTERPOLATION_CONSTANT, INTERPOLATION_LINEAR)
+    return frames, interpolation
+
+def sampled_keyframe_frames(
+    sample_frames: np.ndarray,
+    comp_framerate: float,
+    desired_framerate: float) -> np.ndarray:
+    '''Returns the frame numbers of each keyframe of an adaptively sampled baked channel, which stores the (comp) frame
+    each of its keyframes was sampled at since they aren't evenly spaced.
+
+    Args:
+        sample_frames (ndarray): The comp frame number of each keyframe.
+        comp_framerate (float): The comp's framerate.
+        desired_framerate (float): The desired framerate.
+    '''
+    return (sample_frames.astype(np.float64) * desired_framerate) / comp_framerate
+
+def channel_samples(channel: BakedChannel) -> np.ndarray:
+    '''Returns every sample of a baked ("calculated" or run-length encoded "runs") channel.'''
+    values = channel.values.astype(np.float64)
+    if channel.run_lengths is not None:
+        return np.repeat(values, channel.run_lengths)
+    return values
+
+class LayerPlanner:
+    """Plans the import of individual layers. Planning a layer only reads the settings and the layer itself, so several
+    layers can be planned at once on different threads."""
+    settings: PlanSettings
+
+    def __init__(self, settings: PlanSettings):
+        self.settings = settings
+
+    def baked_keyframes(
+        self,
+        data_path: str,
+        index: int,
+        frames: np.ndarray,
+        values: np.ndarray,
+        simplify_stats: SimplifyStats,
+        interpolation: Optional[np.ndarray] = None) -> FCurvePlan:
+        '''Returns the keyframes for the samples of a baked channel, simplifying them first if enabled.
+
+        Args:
+            data_path (str): The data path of the F-curve the keyframes are for.
+            index (int): The index of the F-curve the keyframes are for.
+            frames (ndarray): The frame number of each sample.
+            values (ndarray): The value of each sample.
+            simplify_stats (SimplifyStats): Running totals to add this channel's simplification to.
+            interpolation (ndarray, optional): The interpolation of each keyframe, for run-length encoded samples. These
+                already have one keyframe per run, and aren't simplified or converted to sample points. Defaults to
+                linear.
+        '''
+        settings = self.settings
+        if settings.simplify_baked and interpolation is None:
+            # Quaternion components change by sin(angle / 2) for a given rotation angle
+            if data_path == 'rotation_quaternion':
+                simplified = simplify_channel(frames, values, sin(settings.simplify_angle_tolerance * 0.5))
+            elif data_path == 'rotation_euler':
+                simplified = simplify_channel(frames, values, settings.simplify_angle_tolerance)
+            else:
+                simplified = simplify_channel(frames, values, settings.simplify_tolerance)
+
+            stats = simplify_stats
+            stats.keyframes_before += len(frames)
+            if simplified is None:
+                stats.keyframes_after += len(frames)
+            else:
+                stats.keyframes_after += len(simplified.co)
+                if data_path == 'rotation_quaternion':
+                    stats.max_angle_error = max(stats.max_angle_error, 2 * asin(min(simplified.max_error, 1.0)))
+                elif data_path == 'rotation_euler':
+                    stats.max_angle_error = max(stats.max_angle_error, simplified.max_error)
+                else:
+                    stats.max_error = max(stats.max_error, simplified.max_error)
+                return FCurvePlan(
+                    data_path,
+                    index,
+                    simplified.co,
+                    simplified.interpolation,
+                    simplified.handle_left,
+                    simplified.handle_right
+                )
+
+        # Blender evaluates sample points as if they're one frame apart, so supersampled channels and ones whose frames
+        # were remapped stay as keyframes
+        samples = (
+            settings.baked_samples and interpolation is None and len(frames) > 1 and
+            frames[0] == round(frames[0]) and bool(np.all(np.diff(frames) == 1.0))
+        )
+        return FCurvePlan(
+            data_path,
+            index,
+            np.column_stack((frames, values)),
+            'LINEAR' if interpolation is None else interpolation,
+            samples=samples
+        )
+
+    def bezier_keyframes(
+        self,
+        data_path: str,
+        index: int,
+        channel: BezierChannel,
+        mul = 1.0,
+        add = 0.0) -> FCurvePlan:
+        '''Returns the keyframes for a given keyframe channel in Bezier format.
+
+        Args:
+            data_path (str): The data path of the F-curve the keyframes are for.
+            index (int): The index of the F-curve the keyframes are for.
+            channel (BezierChannel): The channel.
+            mul (float, optional): Multiply all keyframes by this value. Defaults to 1.
+            add (float, optional): Add this value to all keyframes. Defaults to 0.
+        '''
+        framerate = self.settings.desired_framerate
+        values = channel.values
+        ease_in_speeds = channel.ease_in_speeds
+        ease_in_influences = channel.ease_in_influences * 0.01
+        ease_out_speeds = channel.ease_out_speeds
+        ease_out_influences = channel.ease_out_influences * 0.01
+        holds = channel.interpolation_out == AE_INTERPOLATION_HOLD
+
+        x = channel.times * framerate
+        co = np.column_stack((x, values * mul + add))
+
+        # After Effects keyframe handles have a "speed" (in units per second) which determines the vertical position of
+        # the handle, and an "influence" (as a percentage of the distance to the previous/next keyframe) which
+        # determines the horizontal position and also scales the vertical position. The first keyframe's left handle
+        # and the last keyframe's right handle don't affect the curve, and are left on top of the keyframe itself.
+        durations = np.diff(x)
+        handle_left = co.copy()
+        influences = ease_in_influences[1:]
+        handle_left[1:, 0] = x[1:] - (durations * influences)
+        handle_left[1:, 1] = (values[1:] - (ease_in_speeds[1:] * influences * (durations / framerate))) * mul + add
+        handle_right = co.copy()
+        influences = ease_out_influences[:-1]
+        handle_right[:-1, 0] = x[:-1] + (durations * influences)
+        handle_right[:-1, 1] = (values[:-1] + (ease_out_speeds[:-1] * influences * (durations / framerate))) * mul + add
+
+        interpolation = np.where(holds, INTERPOLATION_CONSTANT, INTERPOLATION_BEZIER)
+        return FCurvePlan(data_path, index, co, interpolation, handle_left, handle_right)
+
+    def baked_channel_keyframes(
+        self,
+        data_path: str,
+        index: int,
+        channel: BakedChannel,
+        simplify_stats: SimplifyStats,
+        mul = 1.0,
+        add = 0.0) -> FCurvePlan:
+        '''Returns the keyframes for a given keyframe channel in "calculated"/baked (or run-length encoded "runs")
+        format. Baked channels are sampled at regular intervals, unless they were adaptively sampled and list the frame
+        each keyframe is at.
+
+        Args:
+            data_path (str): The data path of the F-curve the keyframes are for.
+            index (int): The index of the F-curve the keyframes are for.
+            channel (BakedChannel): The channel.
+            simplify_stats (SimplifyStats): Running totals to add this channel's simplification to.
+            mul (float, optional): Multiply all keyframes by this value. Defaults to 1.
+            add (float, optional): Add this value to all keyframes. Defaults to 0.
+        '''
+        settings = self.settings
+        values = channel.values.astype(np.float64) * mul + add
+        if channel.sample_frames is not None:
+            frames = sampled_keyframe_frames(channel.sample_frames, settings.comp_framerate, settings.desired_framerate)
+            return self.baked_keyframes(data_path, index, frames, values, simplify_stats)
+        if channel.run_lengths is None:
+            frames = baked_keyframe_frames(
+                len(values),
+                channel.start_frame,
+                settings.comp_framerate,
+                settings.desired_framerate,
+                channel.supersampling
+            )
+            return self.baked_keyframes(data_path, index, frames, values, simplify_stats)
+
+        frames, interpolation = run_keyframes(
+            channel.run_lengths,
+            channel.start_frame,
+            settings.comp_framerate,
+            settings.desired_framerate,
+            channel.supersampling
+        )
+        return self.baked_keyframes(data_path, index, frames, values, simplify_stats, interpolation)
+
+    def plan_property(
+        self,
+        plan: LayerPlan,
+        target: ObjectPlan,
+        data_path: str,
+        data_index: int,
+        channel: Channel,
+        mul = 1.0,
+        add = 0.0,
+        on_data = False):
+        '''Plans the import of one channel of a layer's property onto a given object.
+
+        Args:
+            plan (LayerPlan): The plan for the layer this property is part of.
+            target (ObjectPlan): The object to import the property onto.
+            data_path (str): The destination data path of the property.
+            data_index (int): The index into the destination data path, for multidimensional properties. -1 for single-dimension properties.
+            channel (Channel): The property's channel.
+            mul (float, optional): Multiply the property by this value. Defaults to 1.
+            add (float, optional): Add this value to the property. Defaults to 0.
+            on_data (bool, optional): Import the property onto the object's data instead of the object itself.
+        '''
+        if isinstance(channel, BezierChannel):
+            fcurve = self.bezier_keyframes(data_path, data_index, channel, mul, add)
+            (target.data_fcurves if on_data else target.fcurves).append(fcurve)
+        elif isinstance(channel, BakedChannel):
+            fcurve = self.baked_channel_keyframes(data_path, data_index, channel, plan.simplify_stats, mul, add)
+            (target.data_fcurves if on_data else target.fcurves).append(fcurve)
+        else:
+            value = channel.value * mul + add
+            (target.data_properties if on_data else target.properties).append((data_path, data_index, value))
+
+    def plan_property_spatial(
+        self,
+        plan: LayerPlan,
+        target: ObjectPlan,
+        data_path: str,
+        prop: Property,
+        swizzle: Tuple[int, int, int],
+        mul: Tuple[float, float, float],
+        add: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    ):
+        '''Plans the import of a 3D spatial property.
+
+        Args:
+            plan (LayerPlan): The plan for the layer this property is part of.
+            target (ObjectPlan): The object to import the property onto.
+            data_path (str): The destination property's data path.
+            prop (Property): The property.
+            swizzle (int, int, int): The indices to place the destination values onto (e.g. (0, 2, 1) to map
+                the channel with source index 1 to destination index 2, and vice versa).
+            mul (float, float, float): The (pre-swizzle) values to multiply the keyframe values by.
+            add (float, float, float): The (pre-swizzle) values to add to the keyframe values.
+        '''
+        for i in range(3):
+            self.plan_property(
+                plan,
+                target,
+                data_path,
+                swizzle[i],
+                prop.channels[i],
+                mul=mul[i],
+                add=add[i]
+            )
+
+    def plan_baked_transform(self, plan: LayerPlan, target: ObjectPlan, transform: BakedTransform, post_quat):
+        '''Plans the import of a baked transform (one 4x4 transform matrix per frame) onto a given object.
+
+        Args:
+            plan (LayerPlan): The plan for the layer this transform is part of.
+            target (ObjectPlan): The object to import the transform onto.
+            transform (BakedTransform): The baked transform.
+            post_quat: Rotation to apply after each keyframe's rotation.
+        '''
+        settings = self.settings
+        target.rotation_mode = 'QUATERNION'
+
+        # Run-length encoded transforms store each run of repeated matrices once, and adaptively sampled ones store the
+        # frame each matrix was sampled at
+        run_lengths = transform.run_lengths
+        sample_frames = transform.sample_frames
+
+        if settings.comp_center_to_origin:
+            origin = (settings.comp_width * 0.5, settings.comp_height * 0.5, 0.0)
+        else:
+            origin = (0.0, 0.0, 0.0)
+        locs, rots, scales = decompose_baked_transforms(
+            transform.matrices, origin, settings.scale_factor, BAKED_PRE_QUAT, post_quat)
+
+        if sample_frames is not None:
+            frames = sampled_keyframe_frames(sample_frames, settings.comp_framerate, settings.desired_framerate)
+            interpolation = None
+        elif run_lengths is None:
+            frames = baked_keyframe_frames(
+                len(locs),
+                transform.start_frame,
+                settings.comp_framerate,
+                settings.desired_framerate,
+                transform.supersampling
+            )
+            interpolation = None
+        else:
+            frames, interpolation = run_keyframes(
+                run_lengths,
+                transform.start_frame,
+                settings.comp_framerate,
+                settings.desired_framerate,
+                transform.supersampling
+            )
+        for data_path, channels in (('location', locs), ('rotation_quaternion', rots), ('scale', scales)):
+            for j in range(channels.shape[1]):
+                target.fcurves.append(self.baked_keyframes(
+                    data_path, j, frames, channels[:, j], plan.simplify_stats, interpolation))
+
+    def plan_opacity(self, plan: LayerPlan, target: ObjectPlan, layer: Layer):
+        '''Plans the import of a layer's opacity onto its object, for its material to read.
+
+        Args:
+            plan (LayerPlan): The plan for the layer.
+            target (ObjectPlan): The layer's object.
+            layer (Layer): The layer.
+        '''
+        # The property has to exist for its animation to apply, and layers without any opacity are fully opaque
+        target.properties.append((OPACITY_DATA_PATH, -1, 1.0))
+        if layer.opacity is not None:
+            self.plan_property(plan, target, OPACITY_DATA_PATH, -1, layer.opacity.channels[0], mul=0.01)
+
+    def plan_visibility(self, target: ObjectPlan, layer: Layer):
+        '''Plans keyframes which hide a layer's object outside of its in/out points, or hide it entirely if the layer is
+        disabled.
+
+        Args:
+            target (ObjectPlan): The object to hide.
+            layer (Layer): The layer.
+        '''
+        settings = self.settings
+        # Older files don't have in/out points or say whether layers are enabled, in which case they're left visible
+        in_out_frames = layer_in_out_frames(layer)
+        if in_out_frames is None and layer.enabled is not False:
+            return
+        if in_out_frames is None or in_out_frames[1] <= in_out_frames[0]:
+            target.properties.extend((('hide_viewport', -1, True), ('hide_render', -1, True)))
+            return
+
+        remap = settings.desired_framerate / settings.comp_framerate
+        in_frame, out_frame = (frame * remap for frame in in_out_frames)
+        # With constant interpolation, each keyframe's value holds until the next one, and the first keyframe's value
+        # holds before it. The extra keyframe before the in point keeps the object hidden up until then.
+        co = np.array(((in_frame - 1, 1.0), (in_frame, 0.0), (out_frame, 1.0)))
+        for data_path in ('hide_viewport', 'hide_render'):
+            target.fcurves.append(FCurvePlan(data_path, -1, co, 'CONSTANT'))
+
+    def plan_layer(self, layer: Layer, key: str, existing_hash: Optional[str] = None) -> LayerPlan:
+        '''Plans the import of a layer.
+
+        Args:
+            layer (Layer): The layer.
+            key (str): The key identifying the layer, from `layer_key`.
+            existing_hash (str, optional): When syncing, the hash the layer had when it was last imported. If it hasn't
+                changed, the layer isn't planned any further.
+        '''
+        start = perf_counter()
+        settings = self.settings
+        scale_factor = settings.scale_factor
+        plan = LayerPlan(layer, key)
+
+        if settings.hash_settings is not None:
+            plan.import_hash = layer_hash(layer, {
+                **settings.hash_settings,
+                'source': settings.sources[layer.source] if layer.source is not None else None,
+                # Whether a layer has a parent affects "Comp Center to Origin", but which parent it has doesn't matter
+                # since parents are always reassigned
+                'hasParent': layer.parent_index is not None
+            })
+            if plan.import_hash == existing_hash:
+                plan.unchanged = True
+                plan.seconds = perf_counter() - start
+                return plan
+
+        if layer.type == 'av' and not layer.null_layer:
+            obj = ObjectPlan(ROLE_LAYER, layer.name, 'MESH')
+            plan.source = settings.sources[layer.source]
+        elif layer.type == 'camera':
+            obj = ObjectPlan(ROLE_LAYER, layer.name, 'CAMERA')
+        else:
+            obj = ObjectPlan(ROLE_LAYER, layer.name)
+        plan.objects.append(obj)
+        transform_target = obj
+
+        if settings.transforms_baked:
+            self.plan_baked_transform(
+                plan,
+                obj,
+                layer.transform,
+                post_quat=BAKED_CAMERA_POST_QUAT if layer.type == 'camera' else BAKED_POST_QUAT
+            )
+        else:
+            def add_parent(role: str, name: str) -> ObjectPlan:
+                parent = ObjectPlan(role, name, empty_display_type='ARROWS')
+                plan.objects.append(parent)
+                transform_target.parent_role = role
+                return parent
+
+            if layer.anchor_point is not None and (
+                any(not isinstance(channel, StaticChannel) for channel in layer.anchor_point.channels) or
+                any(abs(channel.value) >= 1e-15 for channel in layer.anchor_point.channels)
+            ):
+                anchor_parent = add_parent(ROLE_ANCHOR, layer.name + ' Anchor Point')
+                self.plan_property_spatial(
+                    plan,
+                    transform_target,
+                    'location',
+                    layer.anchor_point,
+                    swizzle=(0, 2, 1),
+                    mul=(-scale_factor, scale_factor, -scale_factor)
+                )
+                transform_target = anchor_parent
+
+            if layer.scale is not None:
+                self.plan_property_spatial(
+                    plan,
+                    transform_target,
+                    'scale',
+                    layer.scale,
+                    swizzle=(0, 2, 1),
+                    mul=(0.01, 0.01, 0.01)
+                )
+
+            if layer.type == 'camera':
+                # Rotate camera upwards 90 degrees along the X axis
+                transform_target.rotation_mode = 'ZYX'
+                channel_swizzle = (0, 1, 2)
+                channel_add = (pi / 2, 0, 0)
+                channel_multiply = (1, -1, -1)
+            else:
+                transform_target.rotation_mode = 'YZX'
+                channel_swizzle = (0, 2, 1)
+                channel_add = (0, 0, 0)
+                channel_multiply = (1, -1, 1)
+
+            for index, prop in enumerate((layer.rotation_x, layer.rotation_y, layer.rotation_z)):
+                if prop is not None:
+                    self.plan_property(
+                        plan,
+                        transform_target,
+                        'rotation_euler',
+                        channel_swizzle[index],
+                        prop.channels[0],
+                        mul=ANGLE_CONVERSION_FACTOR * channel_multiply[index],
+                        add=channel_add[index]
+                    )
+
+            if layer.orientation is not None:
+                # The model has already checked that the channels are either all baked or all static
+                channels = layer.orientation.channels
+                all_keyframed = isinstance(channels[0], BakedChannel)
+
+                if all_keyframed or any(abs(channel.value) >= 1e-15 for channel in channels):
+                    orientation_parent = add_parent(ROLE_ORIENTATION, layer.name + ' Orientation')
+
+                    if all_keyframed:
+                        orientation_parent.rotation_mode = 'QUATERNION'
+                        sample_frames = channels[0].sample_frames
+
+                        # Apply AE orientation. This is converted to quaternions to prevent discontinuities in the
+                        # rotation which can mess up motion blur. The channels' runs of repeated samples don't line up
+                        # with each other, so they're expanded back into every sample.
+                        quats = orientation_to_quats(*(channel_samples(channel) for channel in channels))
+
+                        if sample_frames is not None:
+                            frames = sampled_keyframe_frames(
+                                sample_frames,
+                                settings.comp_framerate,
+                                settings.desired_framerate
+                            )
+                        else:
+                            frames = baked_keyframe_frames(
+                                len(quats),
+                                channels[0].start_frame,
+                                settings.comp_framerate,
+                                settings.desired_framerate,
+                                channels[0].supersampling
+                            )
+                        for j in range(4):
+                            orientation_parent.fcurves.append(self.baked_keyframes(
+                                'rotation_quaternion', j, frames, quats[:, j], plan.simplify_stats))
+                    else:
+                        orientation_parent.rotation_mode = 'YZX'
+                        orientation_parent.properties.extend((
+                            ('rotation_euler', 0, radians(channels[0].value)),
+                            ('rotation_euler', 1, radians(channels[2].value)),
+                            ('rotation_euler', 2, radians(-channels[1].value))
+                        ))
+
+                    transform_target = orientation_parent
+
+            if layer.point_of_interest is not None:
+                point_of_interest_parent = add_parent(
+                    ROLE_POINT_OF_INTEREST_PARENT,
+                    layer.name + ' Point Of Interest Constraint'
+                )
+                point_of_interest = ObjectPlan(ROLE_POINT_OF_INTEREST, layer.name + ' Point Of Interest')
+                plan.objects.append(point_of_interest)
+
+                self.plan_property_spatial(
+                    plan,
+                    point_of_interest,
+                    'location',
+                    layer.point_of_interest,
+                    swizzle=(0, 2, 1),
+                    mul=(scale_factor, -scale_factor, scale_factor),
+                    add=(
+                        # TODO: abstract the process of "comp center to origin" for all translations
+                        -settings.comp_width * 0.5 * scale_factor if settings.comp_center_to_origin else 0,
+                        settings.comp_height * 0.5 * scale_factor if settings.comp_center_to_origin else 0,
+                        0
+                    )
+                )
+                point_of_interest_parent.track_to_role = ROLE_POINT_OF_INTEREST
+
+                transform_target = point_of_interest_parent
+
+            should_translate = settings.comp_center_to_origin and layer.parent_index is None
+
+            if layer.position is not None:
+                self.plan_property_spatial(
+                    plan,
+                    transform_target,
+                    'location',
+                    layer.position,
+                    swizzle=(0, 2, 1),
+                    mul=(scale_factor, -scale_factor, scale_factor),
+                    add=(
+                        -settings.comp_width * 0.5 * scale_factor if should_translate else 0,
+                        settings.comp_height * 0.5 * scale_factor if should_translate else 0,
+                        0
+                    )
+                )
+
+        if layer.type == 'camera':
+            obj.data_properties.append(('sensor_fit', -1, 'VERTICAL'))
+            self.plan_property(
+                plan,
+                obj,
+                'lens',
+                -1,
+                layer.zoom.channels[0],
+                # 24 = default camera sensor height
+                mul=24 / settings.comp_height,
+                on_data=True
+            )
+
+        if settings.import_materials and obj.object_type == 'MESH':
+            self.plan_opacity(plan, obj, layer)
+
+        if settings.hide_outside_in_out:
+            self.plan_visibility(obj, layer)
+
+        plan.outermost_role = transform_target.role
+        plan.seconds = perf_counter() - start
+        return plan
@@ -0,0 +1,254 @@
+'''
+Incremental reading of exported composition files. Baked exports of long comps can be huge, and decoding the entire file
+at once means holding every layer in memory as Python objects at the same time. Instead, the file is memory-mapped and
+only scanned for the boundaries of each value; the top-level values other than the layers are decoded up front, and the
+layers are decoded one at a time, each one converted to the compact model in `model` before the next is decoded.
+
+Files can also store their baked keyframe arrays in a separate binary file, described by the top-level `keyframeData`
+value. Each `keyframes` array (and `runLengths` array, for run-length encoded samples, or `sampleFrames` array, for
+adaptively sampled ones) in the layers is then an `{"offset", "length"}` reference (in bytes and elements respectively)
+into that file, which is memory-mapped and turned into NumPy arrays without copying anything.
+
+Since version 7, a file can hold several compositions (e.g. a composition and its precomps), which share one table of
+sources. Their layers are stored one composition after another, each recording which composition it belongs to.
+'''
+
+import json
+import mmap
+import os
+import re
+import numpy as np
+from typing import Iterator, List, Optional, Tuple, Union
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# Strings are matched whole so that brackets inside them are skipped over
+_STRUCTURE = re.compile(rb'("[^"\\]*(?:\\.[^"\\]*)*")|([\[{])|([\]}])')
+_SCALAR = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[^,:\[\]{}\s]+')
+_UTF8_BOM = b'\xef\xbb\xbf'
+_KEYFRAME_DATA_TYPES = {'float32': 'f4', 'float64': 'f8'}
+_BYTE_ORDERS = {'little': '<', 'big': '>'}
+# Keys under which layers hold arrays of baked samples, which may be stored in the binary keyframe data file
+SAMPLE_ARRAY_KEYS = frozenset(('keyframes', 'runLengths', 'sampleFrames'))
+
+def _map_file(file) -> Union[mmap.mmap, bytes]:
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can't be memory-mapped
+        return b''
+
+class CompReader:
+    """Reads an exported composition file, one layer at a time"""
+    header: dict
+    size: int
+    _layer_spans: List[Tuple[int, int]]
+    _keyframe_dtype: Optional[np.dtype]
+
+    def __init__(self, filepath: str):
+        self._filepath = filepath
+        self._file = open(filepath, 'rb')
+        self._buf = _map_file(self._file)
+        self._keyframe_file = None
+        self._keyframe_data = b''
+        self._keyframe_dtype = None
+        self.size = len(self._buf)
+        self.header = dict()
+        self._layer_spans = []
+        try:
+            self._scan()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+        if isinstance(self._keyframe_data, mmap.mmap):
+            try:
+                self._keyframe_data.close()
+            except BufferError:
+                # Keyframe arrays that are still alive keep the mapping open, and it'll be closed once they're freed
+                pass
+        if self._keyframe_file is not None:
+            self._keyframe_file.close()
+
+    @property
+    def keyframe_data_path(self) -> Optional[str]:
+        '''The path of the binary file that keyframe arrays are stored in, or None if they're stored inline.'''
+        keyframe_data = self.header.get('keyframeData')
+        if keyframe_data is None:
+            return None
+        # Stored relative to the exported file, so the two can be moved around together
+        return os.path.join(os.path.dirname(self._filepath), keyframe_data['file'])
+
+    def open_keyframe_data(self):
+        '''Opens the binary file that keyframe arrays are stored in, if there is one. This is separate from opening the
+        exported file so that its version can be checked first.
+
+        Raises:
+            FileNotFoundError: If the binary file is missing.
+            ValueError: If the binary file's data type isn't supported.
+        '''
+        path = self.keyframe_data_path
+        if path is None:
+            return
+        keyframe_data = self.header['keyframeData']
+        data_type = _KEYFRAME_DATA_TYPES.get(keyframe_data.get('type'))
+        byte_order = _BYTE_ORDERS.get(keyframe_data.get('byteOrder', 'little'))
+        if data_type is None or byte_order is None:
+            raise ValueError(
+                f'Unsupported keyframe data type "{keyframe_data.get("type")}" '
+                f'({keyframe_data.get("byteOrder", "little")} endian)'
+            )
+        self._keyframe_file = open(path, 'rb')
+        self._keyframe_data = _map_file(self._keyframe_file)
+        self._keyframe_dtype = np.dtype(byte_order + data_type)
+
+    def _keyframe_array(self, ref: dict) -> np.ndarray:
+        offset = ref['offset']
+        length = ref['length']
+        if offset < 0 or length < 0 or offset + length * self._keyframe_dtype.itemsize > len(self._keyframe_data):
+            raise ValueError(f'Keyframe data reference (offset {offset}, length {length}) is past the end of the file')
+        return np.frombuffer(self._keyframe_data, dtype=self._keyframe_dtype, count=length, offset=offset)
+
+    def _resolve_keyframes(self, value: Union[dict, list]):
+        '''Replaces every keyframe array reference inside a decoded layer, in place, with the array it refers to.'''
+        children = value.items() if isinstance(value, dict) else enumerate(value)
+        for key, child in children:
+            if key in SAMPLE_ARRAY_KEYS and isinstance(child, dict):
+                value[key] = self._keyframe_array(child)
+            elif isinstance(child, (dict, list)):
+                self._resolve_keyframes(child)
+
+    @property
+    def num_layers(self) -> int:
+        return len(self._layer_spans)
+
+    def layers(self) -> Iterator[dict]:
+        '''Decodes and yields each layer in turn. Only one layer is decoded at a time, so each one can be freed once
+        it has been converted to the model.'''
+        for start, end in self._layer_spans:
+            layer = json.loads(self._buf[start:end])
+            if self._keyframe_dtype is not None:
+                self._resolve_keyframes(layer)
+            yield layer
+
+    def _error(self, message: str, pos: int):
+        return json.JSONDecodeError(message, '', pos)
+
+    def _skip_whitespace(self, pos: int) -> int:
+        return _WHITESPACE.match(self._buf, pos).end()
+
+    def _expect(self, pos: int, chars: bytes) -> bytes:
+        char = self._buf[pos:pos + 1]
+        if len(char) == 0 or char not in chars:
+            raise self._error(f'Expecting one of {chars.decode()}', pos)
+        return char
+
+    def _object_end(self, pos: int) -> int:
+        '''Returns the position just past the end of the JSON object starting at `pos`, without decoding it.
+
+        Arrays inside a valid object are always balanced, so only braces and strings need to be tracked. Layers are
+        mostly made up of long arrays of numbers, which this skips over quickly by searching for the next occurrence of
+        each character rather than matching every token.
+        '''
+        buf = self._buf
+        next_quote = buf.find(b'"', pos)
+        next_open = buf.find(b'{', pos)
+        next_close = buf.find(b'}', pos)
+        depth = 0
+        while next_close != -1:
+            if next_quote != -1 and next_quote < next_close and (next_open == -1 or next_quote < next_open):
+                match = _STRING.match(buf, next_quote)
+                if match is None:
+                    break
+                string_end = match.end()
+                next_quote = buf.find(b'"', string_end)
+                if next_open != -1 and next_open < string_end:
+                    next_open = buf.find(b'{', string_end)
+                if next_close < string_end:
+                    next_close = buf.find(b'}', string_end)
+            elif next_open != -1 and next_open < next_close:
+                depth += 1
+                next_open = buf.find(b'{', next_open + 1)
+            else:
+                depth -= 1
+                if depth == 0:
+                    return next_close + 1
+                next_close = buf.find(b'}', next_close + 1)
+        raise self._error('Unterminated object', pos)
+
+    def _value_end(self, pos: int) -> int:
+        '''Returns the position just past the end of the JSON value starting at `pos`, without decoding it.'''
+        char = self._buf[pos:pos + 1]
+        if char == b'{':
+            return self._object_end(pos)
+        if char != b'[':
+            match = _SCALAR.match(self._buf, pos)
+            if match is None:
+                raise self._error('Expecting value', pos)
+            return match.end()
+
+        depth = 0
+        for match in _STRUCTURE.finditer(self._buf, pos):
+            if match.lastindex == 2:
+                depth += 1
+            elif match.lastindex == 3:
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        raise self._error('Unterminated array', pos)
+
+    def _scan_layers(self, pos: int) -> int:
+        '''Records the position of each element of the `layers` array starting at `pos`, and returns the position just
+        past its end.'''
+        pos = self._skip_whitespace(pos + 1)
+        if self._buf[pos:pos + 1] == b']':
+            return pos + 1
+        while True:
+            end = self._value_end(pos)
+            self._layer_spans.append((pos, end))
+            pos = self._skip_whitespace(end)
+            if self._expect(pos, b',]') == b']':
+                return pos + 1
+            pos = self._skip_whitespace(pos + 1)
+
+    def _scan(self):
+        pos = len(_UTF8_BOM) if self._buf[:len(_UTF8_BOM)] == _UTF8_BOM else 0
+        pos = self._skip_whitespace(pos)
+        if self._buf[pos:pos + 1] != b'{':
+            # Not an object, so it can't be an exported file. Leave the header empty and let the caller report that.
+            json.loads(self._buf[pos:])
+            return
+
+        pos = self._skip_whitespace(pos + 1)
+        if self._buf[pos:pos + 1] == b'}':
+            return
+        while True:
+            self._expect(pos, b'"')
+            key_end = self._value_end(pos)
+            key = json.loads(self._buf[pos:key_end])
+            pos = self._skip_whitespace(key_end)
+            self._expect(pos, b':')
+            pos = self._skip_whitespace(pos + 1)
+
+            if key == 'layers' and self._buf[pos:pos + 1] == b'[':
+                self._layer_spans = []
+                pos = self._scan_layers(pos)
+            else:
+                value_end = self._value_end(pos)
+                self.header[key] = json.loads(self._buf[pos:value_end])
+                pos = value_end
+
+            pos = self._skip_whitespace(pos)
+            if self._expect(pos, b',}') == b'}':
+                return
+            pos = self._skip_whitespace(pos + 1)
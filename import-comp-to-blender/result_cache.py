@@ -0,0 +1,251 @@
+'''
+Persistent cache of import results, as .blend files. Importing the same file with the same options always creates the
+same objects, so after an import, its objects (along with their animation, meshes, and materials) are written to a
+.blend file in the cache folder, and the next import of that file with those options appends them from there instead of
+rebuilding them. Pointing several machines at the same folder shares the cache between them.
+
+Each entry is named after a hash of the exported file's contents and every option that affects the objects. Alongside
+its .blend file is a small JSON file describing the rest of the import: which composition each object came from, and the
+settings and camera layers the scene is set up from. Options that only affect the scene or collections (like "Use Comp
+Resolution") are applied afresh from that, so they don't need entries of their own.
+
+Results are appended rather than linked, so evicting an entry (least recently used first, once the folder is over its
+size limit) never breaks a scene that was imported from it.
+'''
+
+import bpy
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, fields
+from typing import Iterable, List, Optional, Tuple
+
+from .materials import MATERIAL_KEY_PROP, OPACITY_GROUP_PROP
+from .memory import MemoryEstimate
+from .model import Comp
+from .sync import HASH_VERSION
+
+# Bump this whenever the format of cache entries changes
+RESULT_CACHE_VERSION = 1
+_HASH_CHUNK_SIZE = 1 << 20
+
+@dataclass
+class CachedComp:
+    """One of the compositions in a cached import"""
+    name: str
+    # Names of the composition's objects in the entry's .blend file
+    object_names: List[str]
+
+@dataclass
+class CachedResult:
+    """Everything about a cached import besides its objects"""
+    comps: List[CachedComp]
+    # The first composition, without its layers, which the scene's settings come from
+    primary_comp: Comp
+    # (object name, in frame, out frame) for each of the first composition's enabled camera layers
+    cameras: List[Tuple[str, int, int]]
+    # What importing the file was estimated to take, for checking against a memory budget. Entries from before
+    # estimates were added don't have one.
+    memory: Optional[MemoryEstimate] = None
+
+    def to_json(self) -> dict:
+        primary_comp = {field.name: getattr(self.primary_comp, field.name) for field in fields(Comp)}
+        del primary_comp['layers']
+        return {
+            'version': RESULT_CACHE_VERSION,
+            'comps': [{'name': comp.name, 'objects': comp.object_names} for comp in self.comps],
+            'primaryComp': primary_comp,
+            'cameras': self.cameras,
+            'memory': None if self.memory is None else self.memory.to_json()
+        }
+
+    @staticmethod
+    def from_json(data: dict) -> 'CachedResult':
+        '''Reads a description written by `to_json`.
+
+        Raises:
+            ValueError: If the description is from a different version of the cache.
+            KeyError, TypeError: If the description is malformed.
+        '''
+        if data.get('version') != RESULT_CACHE_VERSION:
+            raise ValueError('Cache entry is from a different version')
+        primary_comp = Comp(**data['primaryComp'])
+        primary_comp.work_area = tuple(primary_comp.work_area)
+        result = CachedResult(
+            [CachedComp(comp['name'], comp['objects']) for comp in data['comps']],
+            primary_comp,
+            [tuple(camera) for camera in data['cameras']],
+            MemoryEstimate.from_json(data['memory']) if data.get('memory') is not None else None
+        )
+        if len(result.comps) == 0 or not {name for name, _, _ in result.cameras} <= set(result.comps[0].object_names):
+            raise ValueError('Cache entry is malformed')
+        return result
+
+def default_directory(package: str) -> str:
+    '''Returns the cache folder to use if none is set: one in the extension's user folder, or in the temporary folder if
+    the add-on isn't installed as an extension.'''
+    try:
+        return bpy.utils.extension_path_user(package, path='result-cache', create=True)
+    except ValueError:
+        return os.path.join(tempfile.gettempdir(), 'ae-comp-import-cache')
+
+def _reuse_existing(id_collection, existing: set, key_prop: str):
+    '''Replaces each newly-appended ID with the one that was already in the file with the same key, if any, the same way
+    importing shares materials with previous imports.'''
+    ids_by_key = dict()
+    for id_data in existing:
+        if key_prop in id_data:
+            ids_by_key.setdefault(id_data[key_prop], id_data)
+    for id_data in list(id_collection):
+        if id_data in existing or key_prop not in id_data:
+            continue
+        match = ids_by_key.get(id_data[key_prop])
+        if match is not None:
+            id_data.user_remap(match)
+            id_collection.remove(id_data)
+
+class ResultCache:
+    """A folder of cached import results, bounded by their total size"""
+    directory: str
+    max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, paths: Iterable[str], options: dict) -> str:
+        '''Returns the key identifying the result of importing the given files with the given options.
+
+        The in-memory cache only hashes parts of each file, but entries here can be reused long after (and on other
+        machines than) the import that created them, so every byte of every file is hashed. The .blend format only
+        loads in the same or newer versions of Blender, and a new version of the importer may create different objects,
+        so both versions are part of the key too.
+
+        Raises:
+            OSError: If a file can't be read.
+        '''
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps(
+            [RESULT_CACHE_VERSION, HASH_VERSION, tuple(bpy.app.version), options],
+            sort_keys=True
+        ).encode())
+        for path in paths:
+            digest.update(b'\0')
+            with open(path, 'rb') as file:
+                while chunk := file.read(_HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        '''Returns the paths of an entry's .blend file and description.'''
+        return os.path.join(self.directory, key + '.blend'), os.path.join(self.directory, key + '.json')
+
+    def describe(self, key: str) -> Optional[CachedResult]:
+        '''Returns the description of an entry, or None if there's no such entry or it can't be read (in which case
+        it's removed).'''
+        _, info_path = self._paths(key)
+        try:
+            with open(info_path, encoding='utf-8') as file:
+                return CachedResult.from_json(json.load(file))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            self.remove(key)
+            return None
+
+    def load(self, key: str, result: CachedResult) -> Optional[List[List['bpy.types.Object']]]:
+        '''Appends the objects of an entry into the current file, and returns each composition's objects. Returns None
+        if the entry can't be read, in which case it's removed. The objects aren't linked into any collection yet.
+
+        Args:
+            key (str): The entry's key.
+            result (CachedResult): The entry's description, from `describe`.
+        '''
+        blend_path, info_path = self._paths(key)
+        names = [name for comp in result.comps for name in comp.object_names]
+        existing_materials = set(bpy.data.materials)
+        existing_node_groups = set(bpy.data.node_groups)
+        existing_images = set(bpy.data.images)
+        try:
+            with bpy.data.libraries.load(blend_path, link=False) as (data_from, data_to):
+                data_to.objects = names
+        except OSError:
+            self.remove(key)
+            return None
+        objects = data_to.objects
+        if any(obj is None for obj in objects):
+            for obj in objects:
+                if obj is not None:
+                    bpy.data.objects.remove(obj)
+            self.remove(key)
+            return None
+
+        # Layers with the same source share materials with previous imports, so appended copies of those are dropped
+        _reuse_existing(bpy.data.materials, existing_materials, MATERIAL_KEY_PROP)
+        _reuse_existing(bpy.data.node_groups, existing_node_groups, OPACITY_GROUP_PROP)
+        for image in list(bpy.data.images):
+            if image not in existing_images and image.users == 0:
+                bpy.data.images.remove(image)
+
+        # Entries are evicted by when they were last used
+        os.utime(info_path)
+        comp_objects = []
+        start = 0
+        for comp in result.comps:
+            comp_objects.append(objects[start:start + len(comp.object_names)])
+            start += len(comp.object_names)
+        return comp_objects
+
+    def save(self, key: str, result: CachedResult, objects: Iterable['bpy.types.Object']):
+        '''Writes the objects of an import, along with everything they use, to a new entry, and then evicts the least
+        recently used entries until the folder is back under its size limit.
+
+        Raises:
+            OSError: If the entry can't be written.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        blend_path, info_path = self._paths(key)
+        # Other machines may be reading from the same folder, so files only appear under their real names once they're
+        # complete. The description is written last, since an entry only counts once it exists.
+        temp_suffix = f'.{os.getpid()}.tmp'
+        # Footage paths are made absolute, since relative ones would be relative to the cache folder once appended
+        bpy.data.libraries.write(blend_path + temp_suffix, set(objects), path_remap='ABSOLUTE', compress=True)
+        os.replace(blend_path + temp_suffix, blend_path)
+        with open(info_path + temp_suffix, 'w', encoding='utf-8') as file:
+            json.dump(result.to_json(), file)
+        os.replace(info_path + temp_suffix, info_path)
+        self.evict(keep=key)
+
+    def remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self, keep: Optional[str] = None):
+        '''Removes the least recently used entries, other than `keep`, until the folder is under its size limit.'''
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            blend_path, info_path = self._paths(key)
+            try:
+                size = os.path.getsize(blend_path) + os.path.getsize(info_path)
+                last_used = os.path.getmtime(info_path)
+            except OSError:
+                # Removed by another machine in the meantime
+                continue
+            entries.append((last_used, key, size))
+            total_size += size
+
+        entries.sort()
+        for _, key, size in entries:
+            if total_size <= self.max_bytes:
+                break
+            if key != keep:
+                self.remove(key)
+                total_size -= size
@@ -0,0 +1,166 @@
+'''
+Simplification of baked channels. Baked channels contain one sample per frame (or more, with supersampling), which can
+add up to F-curves with tens of thousands of keyframes. This fits the samples with as few linear and Bezier segments as
+possible while staying within an error tolerance of every sample.
+'''
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from .keyframes import INTERPOLATION_LINEAR, INTERPOLATION_BEZIER
+
+@dataclass
+class SimplifyStats:
+    """Running totals of how much simplification has removed and how much error it has introduced"""
+    keyframes_before: int = 0
+    keyframes_after: int = 0
+    max_error: float = 0.0
+    max_angle_error: float = 0.0
+
+    def add(self, other: 'SimplifyStats'):
+        '''Adds another set of totals (e.g. from one layer) to these.'''
+        self.keyframes_before += other.keyframes_before
+        self.keyframes_after += other.keyframes_after
+        self.max_error = max(self.max_error, other.max_error)
+        self.max_angle_error = max(self.max_angle_error, other.max_angle_error)
+
+    def report(self) -> str:
+        return (
+            f'Simplified baked channels: removed {self.keyframes_before - self.keyframes_after} of '
+            f'{self.keyframes_before} keyframes (max error {self.max_error:.4g} units, '
+            f'{np.degrees(self.max_angle_error):.4g} degrees)'
+        )
+
+@dataclass
+class SimplifiedChannel:
+    """The keyframes that a channel was simplified down to, ready to be passed to `write_keyframes`"""
+    co: np.ndarray
+    interpolation: np.ndarray
+    handle_left: np.ndarray
+    handle_right: np.ndarray
+    max_error: float
+
+def _linear_error(x: np.ndarray, y: np.ndarray, start: int, end: int) -> float:
+    '''Returns the largest error of a straight line between samples `start` and `end`.'''
+    xs = x[start:end + 1]
+    ys = y[start:end + 1]
+    t = (xs - xs[0]) / (xs[-1] - xs[0])
+    return float(np.max(np.abs(ys[0] + (ys[-1] - ys[0]) * t - ys)))
+
+def _hermite_basis(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    t2 = t * t
+    t3 = t2 * t
+    return 2 * t3 - 3 * t2 + 1, t3 - 2 * t2 + t, -2 * t3 + 3 * t2, t3 - t2
+
+def _fit_cubic(x: np.ndarray, y: np.ndarray, start: int, end: int) -> Tuple[float, float, float]:
+    '''Fits a cubic segment between samples `start` and `end`, which passes through both of them, to the samples in
+    between in the least-squares sense.
+
+    Returns:
+        The outgoing and incoming slopes (as value change over the whole segment), and the largest error.
+    '''
+    xs = x[start:end + 1]
+    ys = y[start:end + 1]
+    span = xs[-1] - xs[0]
+    h00, h10, h01, h11 = _hermite_basis((xs - xs[0]) / span)
+    residual = ys - h00 * ys[0] - h01 * ys[-1]
+    (slope_out, slope_in), *_ = np.linalg.lstsq(np.column_stack((h10, h11)), residual, rcond=None)
+    error = np.max(np.abs(h10 * slope_out + h11 * slope_in - residual))
+
+    # Unlike a straight line, a cubic can stray from the samples in between them (for instance, overshooting a sudden
+    # jump), so also measure the error halfway between each pair of samples.
+    h00, h10, h01, h11 = _hermite_basis(((xs[:-1] + xs[1:]) * 0.5 - xs[0]) / span)
+    fitted = h00 * ys[0] + h10 * slope_out + h01 * ys[-1] + h11 * slope_in
+    error = max(error, np.max(np.abs(fitted - (ys[:-1] + ys[1:]) * 0.5)))
+    return float(slope_out), float(slope_in), float(error)
+
+def _furthest_within(start: int, last: int, error_at: Callable[[int], float], tolerance: float) -> int:
+    '''Returns the furthest sample index that a segment starting at `start` can extend to while staying within the
+    tolerance. The error is assumed to grow with the segment length, so this searches exponentially and then bisects
+    instead of trying every possible end point.'''
+    good = start + 1
+    step = 2
+    bad = None
+    while good < last:
+        candidate = min(start + step, last)
+        if error_at(candidate) <= tolerance:
+            good = candidate
+            step *= 2
+        else:
+            bad = candidate
+            break
+    if bad is None:
+        return good
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        if error_at(mid) <= tolerance:
+            good = mid
+        else:
+            bad = mid
+    return good
+
+def simplify_channel(frames: np.ndarray, values: np.ndarray, tolerance: float) -> Optional[SimplifiedChannel]:
+    '''Fits a channel's samples with as few keyframes as possible.
+
+    Constant and linear stretches are collapsed into single linear segments first. Anything that can't be covered by a
+    straight line is fitted with Bezier segments, each extended as far as the tolerance allows.
+
+    Args:
+        frames (ndarray): The frame number of each sample, in increasing order.
+        values (ndarray): The value of each sample.
+        tolerance (float): The largest error allowed at any sample.
+
+    Returns:
+        The simplified keyframes, or None if there aren't enough samples to simplify.
+    '''
+    x = np.asarray(frames, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    num_samples = len(x)
+    if num_samples < 3:
+        return None
+
+    last = num_samples - 1
+    key_indices = [0]
+    # (interpolation, outgoing slope, incoming slope) for each segment
+    segments = []
+    max_error = 0.0
+
+    start = 0
+    while start < last:
+        linear_end = _furthest_within(start, last, lambda end: _linear_error(x, y, start, end), tolerance)
+        cubic_end = linear_end
+        if linear_end < last:
+            cubic_end = _furthest_within(start, last, lambda end: _fit_cubic(x, y, start, end)[2], tolerance)
+
+        if cubic_end > linear_end:
+            slope_out, slope_in, error = _fit_cubic(x, y, start, cubic_end)
+            segments.append((INTERPOLATION_BEZIER, slope_out, slope_in))
+            end = cubic_end
+        else:
+            error = _linear_error(x, y, start, linear_end) if linear_end - start > 1 else 0.0
+            segments.append((INTERPOLATION_LINEAR, 0.0, 0.0))
+            end = linear_end
+
+        max_error = max(max_error, error)
+        key_indices.append(end)
+        start = end
+
+    key_x = x[key_indices]
+    key_y = y[key_indices]
+    co = np.column_stack((key_x, key_y))
+    handle_left = co.copy()
+    handle_right = co.copy()
+    interpolation = np.full(len(key_indices), INTERPOLATION_LINEAR, dtype=np.int32)
+
+    # Handles one third of the way along a segment make its X coordinate linear in the curve parameter, so the segment
+    # traces exactly the fitted cubic.
+    for i, (segment_interpolation, slope_out, slope_in) in enumerate(segments):
+        interpolation[i] = segment_interpolation
+        if segment_interpolation != INTERPOLATION_BEZIER:
+            continue
+        third = (key_x[i + 1] - key_x[i]) / 3
+        handle_right[i] = (key_x[i] + third, key_y[i] + slope_out / 3)
+        handle_left[i + 1] = (key_x[i + 1] - third, key_y[i + 1] - slope_in / 3)
+
+    return SimplifiedChannel(co, interpolation, handle_left, handle_right, max_error)
@@ -0,0 +1,193 @@
+'''
+Instrumentation for imports: how long each phase of an import takes, how much it creates, and which layers are the
+slowest to import. Phases can be nested, in which case time spent in an inner phase isn't counted towards the outer one.
+
+Optionally, the peak memory Python allocates during each phase is tracked too, with `tracemalloc`. That slows down every
+allocation, so it's kept separate from timing. Layers are planned on worker threads while the main thread applies the
+layers before them, so memory allocated by planning counts towards whichever phase the main thread is in.
+
+When instrumentation is off, `NullImportStats` is used instead, which has the same interface but does nothing.
+'''
+
+import heapq
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# Number of slowest layers to keep track of
+NUM_SLOWEST_LAYERS = 5
+
+def _format_bytes(value: int) -> str:
+    return f'{value / (1 << 20):.1f} MiB'
+
+def _format_count(name: str, value: int) -> str:
+    if name.endswith('bytes read'):
+        return f'{_format_bytes(value)} read'
+    if name.endswith(' bytes'):
+        return f'{_format_bytes(value)} {name[:-len(" bytes")]}'
+    return f'{value} {name}'
+
+class ImportStats:
+    """Wall time (and optionally peak memory) for each phase of an import, counters, and the slowest layers"""
+    phase_seconds: Dict[str, float]
+    counters: Dict[str, int]
+    # Only when tracking memory: the most memory Python had allocated since the import started, at any point during
+    # each phase and during the whole import
+    phase_peak_bytes: Dict[str, int]
+    peak_bytes: Optional[int]
+
+    def __init__(self, track_memory: bool = False):
+        self.phase_seconds = dict()
+        self.counters = dict()
+        self.phase_peak_bytes = dict()
+        self.peak_bytes = None
+        self._track_memory = track_memory
+        # If something else is already tracing (like a profiler), it's left running afterwards
+        self._started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        # Peak memory of each phase that's currently running, from before the peak was reset for the phases nested in
+        # it
+        self._running_peaks: List[int] = []
+        self._max_peak = 0
+        self._start = perf_counter()
+        self._total_seconds = None
+        # Time spent in nested phases, for each phase that's currently running
+        self._child_seconds: List[float] = []
+        # Min-heap of (seconds, name), so the fastest of the slowest layers is the one replaced
+        self._slowest_layers: List[Tuple[float, str]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        '''Context manager which adds the time spent inside it to the given phase.'''
+        if self._track_memory:
+            self._reset_peak()
+        start = perf_counter()
+        self._child_seconds.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            self_seconds = elapsed - self._child_seconds.pop()
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + self_seconds
+            if self._child_seconds:
+                self._child_seconds[-1] += elapsed
+            if self._track_memory:
+                self._phase_peak(name)
+
+    def _reset_peak(self):
+        '''Resets tracemalloc's peak at the start of a phase, first saving it for the phase it's nested in.'''
+        _, peak = tracemalloc.get_traced_memory()
+        if self._running_peaks:
+            self._running_peaks[-1] = max(self._running_peaks[-1], peak)
+        self._max_peak = max(self._max_peak, peak)
+        tracemalloc.reset_peak()
+        self._running_peaks.append(0)
+
+    def _phase_peak(self, name: str):
+        '''Records the peak of a phase that just ended, which also counts towards the phase it's nested in.'''
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(self._running_peaks.pop(), peak)
+        self.phase_peak_bytes[name] = max(self.phase_peak_bytes.get(name, 0), peak)
+        if self._running_peaks:
+            self._running_peaks[-1] = max(self._running_peaks[-1], peak)
+        self._max_peak = max(self._max_peak, peak)
+
+    def timed(self, iterable: Iterable[T], name: str) -> Iterator[T]:
+        '''Yields each item of an iterable, adding the time spent producing each one to the given phase.'''
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def clock(self) -> float:
+        return perf_counter()
+
+    def layer_done(self, name: str, start: float, extra_seconds: float = 0.0):
+        '''Records how long a layer took to import, given the `clock()` from when it started, plus any time spent on it
+        elsewhere (like planning it on another thread).'''
+        entry = (perf_counter() - start + extra_seconds, name)
+        if len(self._slowest_layers) < NUM_SLOWEST_LAYERS:
+            heapq.heappush(self._slowest_layers, entry)
+        else:
+            heapq.heappushpop(self._slowest_layers, entry)
+
+    def finish(self):
+        '''Stops timing the import, and stops tracing memory if this started it. Called however the import ends.'''
+        if self._total_seconds is not None:
+            return
+        self._total_seconds = perf_counter() - self._start
+        if self._track_memory:
+            self.peak_bytes = max(self._max_peak, tracemalloc.get_traced_memory()[1])
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    @property
+    def total_seconds(self) -> float:
+        return perf_counter() - self._start if self._total_seconds is None else self._total_seconds
+
+    @property
+    def slowest_layers(self) -> List[Tuple[str, float]]:
+        return [(name, seconds) for seconds, name in sorted(self._slowest_layers, reverse=True)]
+
+    def phases_with_other(self) -> Dict[str, float]:
+        '''Returns the time spent in each phase, slowest first, plus the time spent outside of any phase.'''
+        phases = dict(sorted(self.phase_seconds.items(), key=lambda item: item[1], reverse=True))
+        phases['other'] = max(self.total_seconds - sum(self.phase_seconds.values()), 0.0)
+        return phases
+
+    def report(self) -> str:
+        phases = ', '.join(f'{name} {seconds:.3f}s' for name, seconds in self.phases_with_other().items())
+        counters = ', '.join(_format_count(name, value) for name, value in self.counters.items())
+        line = f'Imported in {self.total_seconds:.3f}s ({phases}); {counters}'
+        if self.peak_bytes is not None:
+            phase_peaks = sorted(self.phase_peak_bytes.items(), key=lambda item: item[1], reverse=True)
+            phase_peaks = ', '.join(f'{name} {_format_bytes(peak)}' for name, peak in phase_peaks)
+            line += f'; peak Python memory {_format_bytes(self.peak_bytes)} ({phase_peaks})'
+        if self._slowest_layers:
+            slowest = ', '.join(f'"{name}" {seconds:.3f}s' for name, seconds in self.slowest_layers)
+            line += f'; slowest layers: {slowest}'
+        return line
+
+    def to_dict(self) -> dict:
+        return {
+            'total_seconds': self.total_seconds,
+            'phase_seconds': self.phases_with_other(),
+            'counters': dict(self.counters),
+            'slowest_layers': [{'name': name, 'seconds': seconds} for name, seconds in self.slowest_layers],
+            'peak_bytes': self.peak_bytes,
+            'phase_peak_bytes': dict(self.phase_peak_bytes)
+        }
+
+_NULL_CONTEXT = nullcontext()
+
+class NullImportStats:
+    """Stand-in for ImportStats which records nothing, for when instrumentation is off"""
+
+    def phase(self, name: str):
+        return _NULL_CONTEXT
+
+    def timed(self, iterable: Iterable[T], name: str) -> Iterable[T]:
+        return iterable
+
+    def count(self, name: str, amount: int = 1):
+        pass
+
+    def clock(self) -> float:
+        return 0.0
+
+    def layer_done(self, name: str, start: float, extra_seconds: float = 0.0):
+        pass
+
+    def finish(self):
+        pass
@@ -0,0 +1,197 @@
+'''
+Updating a previous import of a composition in place, rather than importing a second copy of it.
+
+Every imported object is tagged with custom properties recording which composition and layer it came from, and which
+part of that layer it is (the layer itself, or one of the empties used for its anchor point, orientation, or point of
+interest). The layer's object also records a hash of everything that went into importing it. When the composition is
+imported again, layers whose hash hasn't changed are left alone entirely, changed layers have their existing objects
+reset and re-animated (so that anything else referring to them, like the scene camera or constraints, keeps working),
+and objects belonging to layers that no longer exist are removed.
+'''
+
+import bpy
+import hashlib
+import json
+import numpy as np
+from dataclasses import fields, is_dataclass
+from typing import Dict, Iterable, List, Optional
+
+from .model import Layer
+
+COMP_PROP = 'ae_comp'
+LAYER_KEY_PROP = 'ae_layer_key'
+ROLE_PROP = 'ae_role'
+HASH_PROP = 'ae_import_hash'
+
+ROLE_LAYER = 'layer'
+ROLE_ANCHOR = 'anchor'
+ROLE_ORIENTATION = 'orientation'
+ROLE_POINT_OF_INTEREST_PARENT = 'point_of_interest_parent'
+ROLE_POINT_OF_INTEREST = 'point_of_interest'
+# The roles which can make up a layer's parent chain, from outermost to innermost
+PARENT_CHAIN_ROLES = (ROLE_POINT_OF_INTEREST_PARENT, ROLE_ORIENTATION, ROLE_ANCHOR, ROLE_LAYER)
+
+# Bump this whenever a change to the importer changes what it creates from the same layer, so that syncing re-imports
+# every layer instead of keeping the results of the old version
+HASH_VERSION = 2
+
+def layer_key(name: str, occurrence: int) -> str:
+    '''Returns the key identifying a layer across exports: its name, and which of the layers with that name it is.
+    Layer indices aren't used, since they all shift whenever a layer is added or removed above.'''
+    return f'{name}#{occurrence}'
+
+def _hashable(value, arrays: List[np.ndarray]):
+    '''Returns a JSON-serializable copy of model data, with arrays replaced by their position (and shape) in `arrays`.
+    Arrays are all hashed as float64, whatever type they were stored as.'''
+    if is_dataclass(value):
+        children = {field.name: _hashable(getattr(value, field.name), arrays) for field in fields(value)}
+        return [type(value).__name__, children]
+    if isinstance(value, np.ndarray):
+        arrays.append(np.ascontiguousarray(value, dtype=np.float64))
+        return ['array', len(arrays) - 1, value.shape]
+    if isinstance(value, dict):
+        return {key: _hashable(child, arrays) for key, child in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_hashable(child, arrays) for child in value]
+    return value
+
+def layer_hash(layer: Layer, settings: dict) -> str:
+    '''Returns a hash of a layer's data, excluding its (and its parent's) index and which composition it's in, along
+    with any other settings that affect how it's imported.'''
+    arrays = []
+    data = _hashable(layer, arrays)
+    for key in ('index', 'parent_index', 'comp_index'):
+        del data[1][key]
+    settings = _hashable(settings, arrays)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([HASH_VERSION, data, settings], sort_keys=True).encode())
+    for array in arrays:
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def find_imported_objects(scene: 'bpy.types.Scene', comp_name: str) -> Dict[str, Dict[str, 'bpy.types.Object']]:
+    '''Returns the objects in a scene that were imported from a given composition, by layer key and then role.'''
+    layers = dict()
+    for obj in scene.objects:
+        if obj.get(COMP_PROP) != comp_name:
+            continue
+        key = obj.get(LAYER_KEY_PROP)
+        role = obj.get(ROLE_PROP)
+        if key is None or role is None:
+            continue
+        layers.setdefault(key, dict())[role] = obj
+    return layers
+
+def release_animation(id_data: 'bpy.types.ID'):
+    '''Removes the animation from an ID, and removes its action too if nothing else uses it.'''
+    if id_data.animation_data is None:
+        return
+    action = id_data.animation_data.action
+    id_data.animation_data_clear()
+    if action is not None and action.users == 0:
+        bpy.data.actions.remove(action)
+
+def remove_object(obj: 'bpy.types.Object'):
+    '''Removes an imported object, along with its animation and data if nothing else uses them.'''
+    obj_data = obj.data
+    release_animation(obj)
+    bpy.data.objects.remove(obj)
+    if obj_data is not None and obj_data.users == 0:
+        release_animation(obj_data)
+        if isinstance(obj_data, bpy.types.Mesh):
+            bpy.data.meshes.remove(obj_data)
+        elif isinstance(obj_data, bpy.types.Camera):
+            bpy.data.cameras.remove(obj_data)
+
+def reset_object(obj: 'bpy.types.Object'):
+    '''Resets the transform-related properties which importing sets on an object, so it can be imported onto again.'''
+    obj.parent = None
+    obj.rotation_mode = 'XYZ'
+    obj.location = (0.0, 0.0, 0.0)
+    obj.rotation_euler = (0.0, 0.0, 0.0)
+    obj.rotation_quaternion = (1.0, 0.0, 0.0, 0.0)
+    obj.scale = (1.0, 1.0, 1.0)
+    obj.hide_viewport = False
+    obj.hide_render = False
+
+class LayerObjects:
+    """Creates the objects for one layer, reusing the ones from a previous import of it where possible"""
+    comp_name: str
+    key: str
+    created: List['bpy.types.Object']
+    updated: List['bpy.types.Object']
+
+    def __init__(self, comp_name: str, key: str, existing: Optional[Dict[str, 'bpy.types.Object']] = None):
+        self.comp_name = comp_name
+        self.key = key
+        self._existing = dict(existing) if existing else dict()
+        self.created = []
+        self.updated = []
+
+    def _tag(self, obj: 'bpy.types.Object', role: str):
+        obj[COMP_PROP] = self.comp_name
+        obj[LAYER_KEY_PROP] = self.key
+        obj[ROLE_PROP] = role
+
+    def release_animation(self):
+        '''Removes the animation from all the previously-imported objects, before any of them are re-animated. This is
+        done all at once so that the layer's old action is removed before its new one is created with the same name.'''
+        for obj in self._existing.values():
+            release_animation(obj)
+            if obj.data is not None:
+                release_animation(obj.data)
+
+    def reuse(self, role: str, object_type: str) -> Optional['bpy.types.Object']:
+        '''Returns the previously-imported object with the given role, reset and ready to be imported onto, or None if
+        there isn't one of the right type. One of the wrong type is removed.'''
+        obj = self._existing.pop(role, None)
+        if obj is None:
+            return None
+        if obj.type != object_type:
+            remove_object(obj)
+            return None
+        reset_object(obj)
+        self._tag(obj, role)
+        self.updated.append(obj)
+        return obj
+
+    def add(self, role: str, obj: 'bpy.types.Object') -> 'bpy.types.Object':
+        '''Records a newly-created object as having the given role.'''
+        self._tag(obj, role)
+        self.created.append(obj)
+        return obj
+
+    def empty(self, role: str, name: str) -> 'bpy.types.Object':
+        '''Returns an empty with the given role, either reused or newly created.'''
+        obj = self.reuse(role, 'EMPTY')
+        if obj is not None:
+            # Constraints on the empties are all created by the importer, so they're recreated from scratch
+            obj.constraints.clear()
+            return obj
+        return self.add(role, bpy.data.objects.new(name, None))
+
+    def keep(self) -> Dict[str, 'bpy.types.Object']:
+        '''Keeps all the previously-imported objects as they are, and returns them by role.'''
+        existing = self._existing
+        self._existing = dict()
+        return existing
+
+    def finish(self):
+        '''Removes any previously-imported objects which weren't reused, like the empty for an anchor point which is no
+        longer set.'''
+        for obj in self._existing.values():
+            remove_object(obj)
+        self._existing = dict()
+
+def outermost_object(objects: Dict[str, 'bpy.types.Object']) -> Optional['bpy.types.Object']:
+    '''Returns the outermost object of a layer's parent chain, which is the one that gets parented to its parent layer.'''
+    for role in PARENT_CHAIN_ROLES:
+        if role in objects:
+            return objects[role]
+    return None
+
+def remove_layers(layers: Iterable[Dict[str, 'bpy.types.Object']]):
+    '''Removes all the objects belonging to the given previously-imported layers.'''
+    for objects in layers:
+        for obj in objects.values():
+            remove_object(obj)
@@ -0,0 +1,234 @@
+'''
+Import many exported compositions into .blend files at once, using several background Blender processes.
+
+Each file is imported by its own Blender process, started with factory settings, which saves the result to its own
+.blend file. A file that fails to import (or crashes Blender) only fails that file. Once everything is done, a summary
+with per-file timings and failures is written out.
+
+Usage:
+    python util/batch-import.py --blender /path/to/blender -j 4 -o out/ \\
+        --option scale_factor=0.02 --option handle_framerate=remap_times exports/*.json
+
+This can also be run by Blender itself, in which case it uses that Blender for the workers:
+    blender -b --factory-startup --python util/batch-import.py -- -j 4 -o out/ exports/*.json
+
+Option values are parsed as JSON where possible (so `true`, `0.02`, and `[1, 2]` work), and otherwise used as strings.
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+DEFAULT_ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'import-comp-to-blender')
+# Lines of a failed worker's output to include in the summary
+LOG_TAIL_LINES = 20
+
+def parse_option(option: str):
+    name, sep, value = option.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'Option "{option}" must be in the form name=value')
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+def script_args() -> List[str]:
+    # When run inside Blender, Blender's own arguments come before `--`
+    if bpy is not None and '--' in sys.argv:
+        return sys.argv[sys.argv.index('--') + 1:]
+    return sys.argv[1:]
+
+# Worker (inside Blender)
+
+def ensure_importer_registered(addon_dir: str):
+    '''Factory settings don't enable any add-ons, so register the importer straight from its source folder if it isn't
+    already available.'''
+    if hasattr(bpy.types, 'IMPORT_OT_ae_comp'):
+        return
+    spec = importlib.util.spec_from_file_location(
+        'import_comp_to_blender',
+        os.path.join(addon_dir, '__init__.py'),
+        submodule_search_locations=[addon_dir]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    module.register()
+
+def run_worker(args):
+    result = {'input': args.input, 'output': args.output}
+    start = time.perf_counter()
+    try:
+        ensure_importer_registered(args.addon_dir)
+        if args.template:
+            bpy.ops.wm.open_mainfile(filepath=args.template)
+        else:
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+
+        import_start = time.perf_counter()
+        status = getattr(bpy.ops, 'import').ae_comp(filepath=args.input, **dict(args.option))
+        result['import_seconds'] = time.perf_counter() - import_start
+        if 'FINISHED' not in status:
+            raise RuntimeError(f'Import did not finish (status: {", ".join(sorted(status))})')
+
+        save_start = time.perf_counter()
+        bpy.ops.wm.save_as_mainfile(filepath=args.output, check_existing=False)
+        result['save_seconds'] = time.perf_counter() - save_start
+        result['status'] = 'ok'
+    except Exception as err:
+        result['status'] = 'failed'
+        result['error'] = f'{type(err).__name__}: {err}'
+        result['traceback'] = traceback.format_exc()
+    result['worker_seconds'] = time.perf_counter() - start
+
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    return 0 if result['status'] == 'ok' else 1
+
+# Driver
+
+def output_paths(inputs: List[str], output_dir: str) -> List[str]:
+    '''Returns a .blend path in the output directory for each input file, named after it.'''
+    used = set()
+    paths = []
+    for input_path in inputs:
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        name = stem
+        suffix = 2
+        # Files with the same name in different folders shouldn't overwrite each other
+        while name in used:
+            name = f'{stem}-{suffix}'
+            suffix += 1
+        used.add(name)
+        paths.append(os.path.join(output_dir, name + '.blend'))
+    return paths
+
+def import_one(args, input_path: str, output_path: str, result_dir: str, index: int) -> dict:
+    result_path = os.path.join(result_dir, f'{index}.json')
+    command = [
+        args.blender, '-b', '--factory-startup', '--python', os.path.abspath(__file__), '--',
+        '--worker',
+        '--input', input_path,
+        '--output', output_path,
+        '--result', result_path,
+        '--addon-dir', args.addon_dir
+    ]
+    if args.template:
+        command += ['--template', args.template]
+    for name, value in args.option:
+        command += ['--option', f'{name}={json.dumps(value)}']
+
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=args.timeout,
+            encoding='utf-8',
+            errors='replace'
+        )
+        log = process.stdout
+        returncode = process.returncode
+    except subprocess.TimeoutExpired as err:
+        log = err.stdout.decode('utf-8', 'replace') if isinstance(err.stdout, bytes) else (err.stdout or '')
+        returncode = None
+    elapsed = time.perf_counter() - start
+
+    try:
+        with open(result_path, encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        # The worker never got as far as writing its result, so Blender itself must have failed or crashed
+        result = {'input': input_path, 'output': output_path, 'status': 'failed'}
+        if returncode is None:
+            result['error'] = f'Timed out after {args.timeout} seconds'
+        else:
+            result['error'] = f'Blender exited with code {returncode}'
+    result['total_seconds'] = elapsed
+    if result['status'] != 'ok':
+        result['log_tail'] = log.splitlines()[-LOG_TAIL_LINES:]
+    return result
+
+def run_driver(args):
+    if args.blender is None:
+        if bpy is None or not bpy.app.binary_path:
+            print('The path to Blender must be given with --blender', file=sys.stderr)
+            return 2
+        args.blender = bpy.app.binary_path
+    os.makedirs(args.output_dir, exist_ok=True)
+    inputs = [os.path.abspath(path) for path in args.inputs]
+    outputs = output_paths(inputs, os.path.abspath(args.output_dir))
+    summary_path = args.summary or os.path.join(args.output_dir, 'batch-summary.json')
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as result_dir, ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(import_one, args, input_path, output_path, result_dir, i)
+            for i, (input_path, output_path) in enumerate(zip(inputs, outputs))
+        ]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f'[{len(results)}/{len(futures)}] {result["status"]:6} {result["total_seconds"]:8.2f}s  {result["input"]}')
+            if result['status'] != 'ok':
+                print(f'    {result["error"]}')
+
+    failed = [result for result in results if result['status'] != 'ok']
+    summary = {
+        'options': dict(args.option),
+        'jobs': args.jobs,
+        'wall_seconds': time.perf_counter() - start,
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'files': results
+    }
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f'{summary["succeeded"]} succeeded, {summary["failed"]} failed in {summary["wall_seconds"]:.2f}s')
+    print(f'Summary written to {summary_path}')
+    return 1 if failed else 0
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Import exported After Effects compositions into .blend files.')
+    parser.add_argument('inputs', nargs='*', help='Exported .json files to import')
+    parser.add_argument('-o', '--output-dir', default='.', help='Folder to save the .blend files in')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Number of Blender processes to run at once')
+    parser.add_argument('--blender', help='Path to the Blender executable (defaults to the running Blender, if any)')
+    parser.add_argument('--option', type=parse_option, action='append', default=[], metavar='NAME=VALUE', help='Import operator option, e.g. scale_factor=0.02')
+    parser.add_argument('--template', help='.blend file to import each composition into, instead of an empty scene')
+    parser.add_argument('--timeout', type=float, default=None, help='Seconds to allow for each file before giving up on it')
+    parser.add_argument('--summary', help='Where to write the summary (defaults to batch-summary.json in the output folder)')
+    parser.add_argument('--addon-dir', default=DEFAULT_ADDON_DIR, help=argparse.SUPPRESS)
+    # Used by the driver to run a single import inside a worker
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args(script_args() if argv is None else argv)
+
+    if args.worker:
+        if bpy is None:
+            parser.error('--worker must be run inside Blender')
+        return run_worker(args)
+    if not args.inputs:
+        parser.error('No input files given')
+    return run_driver(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+'''
+Benchmark the importer on synthetic compositions, and check for performance regressions.
+
+Each scenario is a composition generated by `generate-test-comp.py` plus a set of import options. Every run of a scenario
+starts a fresh background Blender, which imports the file once from scratch (a "cold" import) and then a few more times
+with the same file (like redoing the import with different options), and records the timings and peak memory use.
+
+Usage:
+    python util/benchmark-import.py --blender /path/to/blender -o results.json
+    python util/benchmark-import.py --blender /path/to/blender --baseline baseline.json --update-baseline
+    python util/benchmark-import.py --blender /path/to/blender --baseline baseline.json --threshold 0.15
+
+When given a baseline, the benchmark fails (exits with a non-zero code) if any scenario's median cold import time or peak
+memory use has regressed by more than the threshold. Baselines are specific to the machine they were recorded on.
+'''
+
+import argparse
+import json
+import os
+import platform
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+UTIL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ADDON_DIR = os.path.join(os.path.dirname(UTIL_DIR), 'import-comp-to-blender')
+
+SCENARIOS = {
+    'bezier': {
+        'comp': {'layers': 200, 'cameras': 2, 'frames': 240, 'channels': 'bezier', 'bezier_keyframes': 16},
+        'options': {}
+    },
+    'calculated': {
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'channels': 'calculated'},
+        'options': {}
+    },
+    'calculated-pretty': {
+        # Pretty-printed with every number in full, like older versions of the exporter wrote
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'channels': 'calculated', 'pretty': True, 'significant_digits': None},
+        'options': {}
+    },
+    'calculated-supersampled': {
+        'comp': {'layers': 50, 'cameras': 2, 'frames': 1200, 'channels': 'calculated', 'supersampling': 4},
+        'options': {'handle_framerate': 'remap_times'}
+    },
+    'calculated-adaptive': {
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'channels': 'calculated', 'adaptive_tolerance': 0.5},
+        'options': {}
+    },
+    'baked': {
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'baked': True},
+        'options': {}
+    },
+    'baked-binary': {
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'baked': True, 'binary': True},
+        'options': {}
+    },
+    'baked-simplified': {
+        'comp': {'layers': 20, 'cameras': 2, 'frames': 2400, 'baked': True},
+        'options': {'simplify_baked': True}
+    },
+    'baked-stepped': {
+        'comp': {'layers': 100, 'cameras': 2, 'frames': 2400, 'baked': True, 'posterize': 4},
+        'options': {}
+    },
+    'cameras': {
+        'comp': {'layers': 0, 'cameras': 50, 'frames': 2400, 'channels': 'mixed'},
+        'options': {'cameras_to_markers': True, 'adjust_frame_start_end': True}
+    },
+    'precomps': {
+        # A main composition and the precomps its layers use, all imported from one file
+        'comp': {'layers': 50, 'cameras': 1, 'frames': 1200, 'baked': True, 'precomps': 4},
+        'options': {}
+    },
+    'many-layers': {
+        'comp': {'layers': 2000, 'cameras': 1, 'frames': 48, 'channels': 'mixed', 'orientation': False},
+        'options': {'create_new_collection': True}
+    },
+}
+
+# Values which are compared against the baseline. Lower is better for all of them.
+COMPARED_METRICS = ('cold_seconds', 'peak_rss_bytes')
+
+def script_args() -> List[str]:
+    # When run inside Blender, Blender's own arguments come before `--`
+    if bpy is not None and '--' in sys.argv:
+        return sys.argv[sys.argv.index('--') + 1:]
+    return sys.argv[1:]
+
+def max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+# Worker (inside Blender)
+
+def run_worker(args):
+    batch_import = runpy.run_path(os.path.join(UTIL_DIR, 'batch-import.py'))
+    batch_import['ensure_importer_registered'](args.addon_dir)
+    options = json.loads(args.options)
+
+    timings = []
+    rss_before = max_rss_bytes()
+    for _ in range(args.repeat + 1):
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        start = time.perf_counter()
+        status = getattr(bpy.ops, 'import').ae_comp(filepath=args.input, **options)
+        timings.append(time.perf_counter() - start)
+        if 'FINISHED' not in status:
+            raise RuntimeError(f'Import did not finish (status: {", ".join(sorted(status))})')
+
+    result = {
+        'cold_seconds': timings[0],
+        'warm_seconds': timings[1:],
+        'peak_rss_bytes': max_rss_bytes(),
+        'rss_before_bytes': rss_before,
+        'objects': len(bpy.data.objects),
+        'blender_version': bpy.app.version_string
+    }
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    return 0
+
+# Driver
+
+def generate_scenario_file(name: str, scenario: dict, work_dir: str) -> str:
+    '''Generates a scenario's composition, reusing the one from a previous run if it was generated the same way.'''
+    path = os.path.join(work_dir, name + '.json')
+    params_path = os.path.join(work_dir, name + '.params.json')
+    try:
+        with open(params_path, encoding='utf-8') as f:
+            if json.load(f) == scenario['comp'] and os.path.exists(path):
+                return path
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    generator = runpy.run_path(os.path.join(UTIL_DIR, 'generate-test-comp.py'))
+    generator['generate_comp'](path, **scenario['comp'])
+    with open(params_path, 'w', encoding='utf-8') as f:
+        json.dump(scenario['comp'], f)
+    return path
+
+def run_scenario(args, name: str, scenario: dict, path: str) -> dict:
+    runs = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as result_dir:
+            result_path = os.path.join(result_dir, 'result.json')
+            command = [
+                args.blender, '-b', '--factory-startup', '--python', os.path.abspath(__file__), '--',
+                '--worker',
+                '--input', path,
+                '--result', result_path,
+                '--options', json.dumps(scenario['options']),
+                '--repeat', str(args.repeat),
+                '--addon-dir', args.addon_dir
+            ]
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8', errors='replace')
+            try:
+                with open(result_path, encoding='utf-8') as f:
+                    runs.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                raise RuntimeError(f'Scenario "{name}" failed:\n{process.stdout}')
+
+    cold = [run['cold_seconds'] for run in runs]
+    warm = [seconds for run in runs for seconds in run['warm_seconds']]
+    peak_rss = [run['peak_rss_bytes'] for run in runs if run['peak_rss_bytes'] is not None]
+    return {
+        'comp': scenario['comp'],
+        'options': scenario['options'],
+        'file_bytes': os.path.getsize(path),
+        'objects': runs[0]['objects'],
+        'cold_seconds': statistics.median(cold),
+        'cold_seconds_all': cold,
+        'warm_seconds': statistics.median(warm) if warm else None,
+        'peak_rss_bytes': max(peak_rss) if peak_rss else None,
+        'blender_version': runs[0]['blender_version']
+    }
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float) -> List[str]:
+    '''Returns a description of each metric which has regressed past the threshold.'''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            value, base_value = result.get(metric), base.get(metric)
+            if value is None or base_value is None or base_value <= 0:
+                continue
+            # Ignore tiny differences in short timings, which are mostly noise
+            if metric == 'cold_seconds' and value - base_value < min_seconds:
+                continue
+            change = value / base_value - 1
+            if change > threshold:
+                regressions.append(f'{name}: {metric} {base_value:.4g} -> {value:.4g} (+{change:.1%})')
+    return regressions
+
+def run_driver(args):
+    if args.blender is None:
+        if bpy is None or not bpy.app.binary_path:
+            print('The path to Blender must be given with --blender', file=sys.stderr)
+            return 2
+        args.blender = bpy.app.binary_path
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f'Unknown scenario(s): {", ".join(unknown)}. Available: {", ".join(SCENARIOS)}', file=sys.stderr)
+        return 2
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = {}
+    for name in names:
+        path = generate_scenario_file(name, SCENARIOS[name], args.work_dir)
+        result = run_scenario(args, name, SCENARIOS[name], path)
+        results[name] = result
+        warm = f'{result["warm_seconds"]:8.3f}s' if result['warm_seconds'] is not None else '       -'
+        peak = f'{result["peak_rss_bytes"] / (1 << 20):8.1f} MiB' if result['peak_rss_bytes'] is not None else '-'
+        print(f'{name:24} cold {result["cold_seconds"]:8.3f}s  warm {warm}  peak {peak}')
+
+    output = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'processor': platform.processor(), 'python': platform.python_version()},
+        'scenarios': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        baseline = {}
+        try:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+        # Only the scenarios that were run are replaced
+        baseline.setdefault('scenarios', {}).update(results)
+        baseline['timestamp'] = output['timestamp']
+        baseline['machine'] = output['machine']
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'Baseline updated: {args.baseline}')
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get('scenarios', {}), args.threshold, args.min_seconds)
+    if regressions:
+        print(f'{len(regressions)} regression(s) past the {args.threshold:.0%} threshold:')
+        for regression in regressions:
+            print('    ' + regression)
+        return 1
+    print(f'No regressions past the {args.threshold:.0%} threshold')
+    return 0
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the After Effects composition importer.')
+    parser.add_argument('--blender', help='Path to the Blender executable (defaults to the running Blender, if any)')
+    parser.add_argument('--scenario', action='append', help=f'Scenario to run (can be repeated). Available: {", ".join(SCENARIOS)}')
+    parser.add_argument('--runs', type=int, default=3, help='Number of Blender processes to run each scenario in')
+    parser.add_argument('--repeat', type=int, default=2, help='Number of warm imports after the cold one, in each process')
+    parser.add_argument('-o', '--output', help='Where to write the results')
+    parser.add_argument('--baseline', help='Baseline results to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Fraction by which a metric can regress before failing')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='Ignore time regressions smaller than this')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'ae-comp-benchmark'), help='Where to generate the scenario files')
+    parser.add_argument('--addon-dir', default=DEFAULT_ADDON_DIR, help=argparse.SUPPRESS)
+    # Used by the driver to run a single scenario inside a worker
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--options', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args(script_args() if argv is None else argv)
+
+    if args.worker:
+        if bpy is None:
+            parser.error('--worker must be run inside Blender')
+        return run_worker(args)
+    if args.update_baseline and args.baseline is None:
+        parser.error('--update-baseline requires --baseline')
+    return run_driver(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,480 @@
+'''
+Generate synthetic exported composition files, for testing and benchmarking the importer.
+
+The files have the same structure as those exported from After Effects: animated properties which the exporter can
+export directly are written as Bezier keyframes, and those it would have to bake (spatial properties, and anything with
+an expression) are written as calculated keyframes, one per sample. Posterized (stepped) channels are run-length encoded
+the same way the exporter does it, and calculated keyframes can be adaptively sampled like with the exporter's "Adaptive
+sampling" option. Files can also hold precomps used by the main composition, like the exporter's "Also export" option.
+
+Usage:
+    python util/generate-test-comp.py out.json --layers 100 --frames 2400 --baked --supersampling 2
+'''
+
+import argparse
+import array
+import json
+import math
+import os
+import random
+import sys
+from typing import Callable, List, Optional, Sequence, Tuple
+
+FILE_VERSION = 3
+BINARY_FILE_VERSION = 4
+RUNS_FILE_VERSION = 5
+ADAPTIVE_FILE_VERSION = 6
+MULTI_COMP_FILE_VERSION = 7
+# The exporter's `ADAPTIVE_COARSE_FRAMES`
+ADAPTIVE_COARSE_FRAMES = 4
+
+class KeyframeStore:
+    """Writes calculated keyframe arrays either inline, or to a binary keyframe data file (like the exporter's "Binary
+    keyframe data" option)"""
+
+    def __init__(self, binary_path: Optional[str]):
+        self.file = open(binary_path, 'wb') if binary_path else None
+        self.offset = 0
+
+    def store(self, values: List[float]):
+        if self.file is None:
+            return values
+        packed = array.array('f', values)
+        if sys.byteorder != 'little':
+            packed.byteswap()
+        self.file.write(packed.tobytes())
+        ref = {'offset': self.offset, 'length': len(values)}
+        self.offset += len(values) * packed.itemsize
+        return ref
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def encode_runs(samples: list) -> Optional[Tuple[list, List[int]]]:
+    '''Run-length encodes samples like the exporter's `encodeRuns`, returning None if it wouldn't make them smaller.'''
+    values = []
+    lengths = []
+    for sample in samples:
+        if values and values[-1] == sample:
+            lengths[-1] += 1
+        else:
+            values.append(sample)
+            lengths.append(1)
+    if len(values) * 2 >= len(samples):
+        return None
+    return values, lengths
+
+def sample_adaptive(
+    evaluate: Callable[[int], Sequence[float]],
+    num_samples: int,
+    coarse_step: int,
+    tolerances: Sequence[float]) -> Tuple[List[int], list]:
+    '''Adaptively samples a signal like the exporter's `sampleAdaptive`, returning the sample indices that were kept and
+    their values.'''
+    indices = []
+    values = []
+
+    def keep(index, value):
+        if len(values) >= 2 and values[-1] == value and values[-2] == value:
+            indices[-1] = index
+        else:
+            indices.append(index)
+            values.append(value)
+
+    def refine(a, a_value, b, b_value):
+        if b - a > 1:
+            mid = (a + b) // 2
+            mid_value = evaluate(mid)
+            t = (mid - a) / (b - a)
+            if any(
+                abs(mid_value[j] - (a_value[j] + (b_value[j] - a_value[j]) * t)) > tolerances[j]
+                for j in range(len(mid_value))
+            ):
+                refine(a, a_value, mid, mid_value)
+                refine(mid, mid_value, b, b_value)
+                return
+        keep(b, b_value)
+
+    if num_samples <= 0:
+        return indices, values
+    prev = 0
+    prev_value = evaluate(0)
+    keep(prev, prev_value)
+    while prev < num_samples - 1:
+        next_index = min(prev + coarse_step, num_samples - 1)
+        next_value = evaluate(next_index)
+        refine(prev, prev_value, next_index, next_value)
+        prev, prev_value = next_index, next_value
+    return indices, values
+
+def round_numbers(value, significant_digits: int):
+    '''Rounds every non-integer number inside a value to a given number of significant digits, like the exporter's
+    `formatNumber`.'''
+    if isinstance(value, float) and not value.is_integer():
+        return float(f'{value:.{significant_digits}g}')
+    if isinstance(value, list):
+        return [round_numbers(child, significant_digits) for child in value]
+    if isinstance(value, dict):
+        return {key: round_numbers(child, significant_digits) for key, child in value.items()}
+    return value
+
+def static_channel(value: float) -> dict:
+    return {'isKeyframed': False, 'value': value}
+
+def bezier_channel(rng: random.Random, num_keyframes: int, duration: float, base: float, amplitude: float) -> dict:
+    keyframes = []
+    for i in range(num_keyframes):
+        interpolation = rng.choice(['bezier', 'bezier', 'linear', 'hold'])
+        keyframes.append({
+            'value': base + rng.uniform(-amplitude, amplitude),
+            'easeIn': {'speed': rng.uniform(-amplitude, amplitude), 'influence': rng.uniform(0.1, 100)},
+            'easeOut': {'speed': rng.uniform(-amplitude, amplitude), 'influence': rng.uniform(0.1, 100)},
+            'time': duration * i / max(num_keyframes - 1, 1),
+            'interpolationIn': interpolation,
+            'interpolationOut': interpolation
+        })
+    return {'isKeyframed': True, 'keyframesFormat': 'bezier', 'keyframes': keyframes}
+
+def calculated_values(
+    rng: random.Random,
+    num_frames: int,
+    supersampling: int,
+    base: float,
+    amplitude: float,
+    posterize: int = 1) -> List[float]:
+    # A mix of smooth motion and noise, like a "wiggle" expression
+    frequency = rng.uniform(0.01, 0.1)
+    phase = rng.uniform(0, math.tau)
+    values = [
+        base + amplitude * (math.sin(i * frequency / supersampling + phase) + rng.uniform(-0.05, 0.05))
+        for i in range(num_frames * supersampling)
+    ]
+    if posterize > 1:
+        # Hold each value for several samples, like a "posterizeTime" expression
+        values = [values[i - i % posterize] for i in range(len(values))]
+    return values
+
+def calculated_channels(
+    store: KeyframeStore,
+    start_frame: int,
+    supersampling: int,
+    channel_values: List[List[float]],
+    posterize: int = 1,
+    adaptive_tolerance: Optional[float] = None) -> List[dict]:
+    '''Returns the calculated keyframe channels of a property, given every sample of each of its channels. Like the
+    exporter, adaptive sampling samples all of a property's channels at the same times.'''
+    def channel() -> dict:
+        return {
+            'isKeyframed': True,
+            'keyframesFormat': 'calculated',
+            'startFrame': start_frame,
+            'supersampling': supersampling
+        }
+
+    channels = []
+    if adaptive_tolerance is not None:
+        indices, sampled = sample_adaptive(
+            lambda i: tuple(values[i] for values in channel_values),
+            len(channel_values[0]),
+            ADAPTIVE_COARSE_FRAMES * supersampling,
+            (adaptive_tolerance,) * len(channel_values)
+        )
+        sample_frames = store.store([i / supersampling + start_frame for i in indices])
+        for j in range(len(channel_values)):
+            adaptive_channel = channel()
+            adaptive_channel['keyframes'] = store.store([value[j] for value in sampled])
+            adaptive_channel['sampleFrames'] = sample_frames
+            channels.append(adaptive_channel)
+        return channels
+
+    for values in channel_values:
+        uniform_channel = channel()
+        runs = encode_runs(values) if posterize > 1 else None
+        if runs is not None:
+            values, run_lengths = runs
+            uniform_channel['keyframesFormat'] = 'runs'
+            uniform_channel['runLengths'] = store.store(run_lengths)
+        uniform_channel['keyframes'] = store.store(values)
+        channels.append(uniform_channel)
+    return channels
+
+class CompGenerator:
+    def __init__(
+        self,
+        store: KeyframeStore,
+        seed: int,
+        frames: int,
+        frame_rate: float,
+        supersampling: int,
+        channels: str,
+        bezier_keyframes: int,
+        posterize: int,
+        adaptive_tolerance: Optional[float]):
+        self.store = store
+        self.rng = random.Random(seed)
+        self.frames = frames
+        self.frame_rate = frame_rate
+        self.supersampling = supersampling
+        self.channels = channels
+        self.bezier_keyframes = bezier_keyframes
+        self.posterize = posterize
+        self.adaptive_tolerance = adaptive_tolerance
+
+    def use_bezier(self, layer_index: int) -> bool:
+        if self.channels == 'mixed':
+            return layer_index % 2 == 0
+        return self.channels == 'bezier'
+
+    def calculated(self, bases: List[float], amplitude: float) -> List[dict]:
+        channel_values = [
+            calculated_values(self.rng, self.frames, self.supersampling, base, amplitude, self.posterize)
+            for base in bases
+        ]
+        return calculated_channels(
+            self.store, 0, self.supersampling, channel_values, self.posterize, self.adaptive_tolerance)
+
+    def prop(self, layer_index: int, values: List[float], amplitude: float) -> dict:
+        '''Returns an animated property. Spatial properties can only be exported as Bezier keyframes if their dimensions
+        are separated, which is what the Bezier version of them stands in for.'''
+        if self.use_bezier(layer_index):
+            channels = [
+                bezier_channel(self.rng, self.bezier_keyframes, self.frames / self.frame_rate, value, amplitude)
+                for value in values
+            ]
+        else:
+            channels = self.calculated(values, amplitude)
+        return {'numDimensions': len(values), 'channels': channels}
+
+    def static_prop(self, values: List[float]) -> dict:
+        return {'numDimensions': len(values), 'channels': [static_channel(value) for value in values]}
+
+    def baked_transform(self) -> dict:
+        matrices = []
+        spin = self.rng.uniform(-0.05, 0.05)
+        tilt = self.rng.uniform(-0.02, 0.02)
+        start = [self.rng.uniform(0, 1920), self.rng.uniform(0, 1080), self.rng.uniform(-500, 500)]
+        velocity = [self.rng.uniform(-5, 5) for _ in range(3)]
+        for i in range(self.frames * self.supersampling):
+            t = (i - i % self.posterize) / self.supersampling
+            a = spin * t
+            b = tilt * t
+            scale = 1 + 0.2 * math.sin(t * 0.03)
+            ca, sa, cb, sb = math.cos(a), math.sin(a), math.cos(b), math.sin(b)
+            # Rotation about Z, then X, then scaled
+            matrix = [
+                ca * scale, -sa * cb * scale, sa * sb * scale, start[0] + velocity[0] * t,
+                sa * scale, ca * cb * scale, -ca * sb * scale, start[1] + velocity[1] * t,
+                0.0, sb * scale, cb * scale, start[2] + velocity[2] * t
+            ]
+            matrices.append(matrix)
+
+        transform = {'startFrame': 0, 'supersampling': self.supersampling}
+        runs = None
+        if self.adaptive_tolerance is not None:
+            # Like the exporter, the tolerance is in pixels for the translation and scaled by the comp size for the rest
+            linear_tolerance = self.adaptive_tolerance / 1920
+            tolerances = [self.adaptive_tolerance if i % 4 == 3 else linear_tolerance for i in range(12)]
+            indices, matrices = sample_adaptive(
+                lambda i: matrices[i], len(matrices), ADAPTIVE_COARSE_FRAMES * self.supersampling, tolerances)
+            transform['sampleFrames'] = self.store.store([i / self.supersampling for i in indices])
+        elif self.posterize > 1:
+            runs = encode_runs(matrices)
+        if runs is not None:
+            matrices, run_lengths = runs
+            transform['runLengths'] = self.store.store(run_lengths)
+        # Binary keyframe data stores all the matrices one after another in a single flat array
+        transform['keyframes'] = self.store.store(
+            matrices if self.store.file is None else [value for matrix in matrices for value in matrix])
+        return transform
+
+    def layer(
+        self,
+        index: int,
+        layer_type: str,
+        baked: bool,
+        parent_index: Optional[int],
+        orientation: bool,
+        point_of_interest: bool) -> dict:
+        in_frame = self.rng.randrange(0, max(self.frames // 4, 1))
+        layer = {
+            'name': f'{"Camera" if layer_type == "camera" else "Layer"} {index}',
+            'type': 'camera' if layer_type == 'camera' else 'av',
+            'index': index,
+            'parentIndex': parent_index,
+            'inFrame': float(in_frame),
+            'outFrame': float(self.frames - self.rng.randrange(0, max(self.frames // 4, 1))),
+            'enabled': True
+        }
+
+        if baked:
+            layer['transform'] = self.baked_transform()
+        else:
+            layer['position'] = self.prop(index, [960.0, 540.0, -1000.0], 500.0)
+            layer['rotationX'] = self.prop(index, [0.0], 45.0)
+            layer['rotationY'] = self.static_prop([0.0])
+            layer['rotationZ'] = self.prop(index, [0.0], 180.0)
+            if orientation:
+                # Orientation can only be imported as calculated keyframes
+                layer['orientation'] = {
+                    'numDimensions': 3,
+                    'channels': self.calculated([0.0, 0.0, 0.0], 90.0)
+                }
+            else:
+                layer['orientation'] = self.static_prop([0.0, 0.0, 0.0])
+
+        if layer_type == 'camera':
+            layer['zoom'] = self.prop(index, [2666.7], 500.0)
+            if point_of_interest and not baked:
+                layer['pointOfInterest'] = self.prop(index, [960.0, 540.0, 0.0], 200.0)
+        else:
+            layer['source'] = 0
+            if not baked:
+                layer['anchorPoint'] = self.static_prop([960.0, 540.0, 0.0])
+                layer['scale'] = self.prop(index, [100.0, 100.0, 100.0], 20.0)
+            layer['opacity'] = self.prop(index, [100.0], 50.0)
+            layer['nullLayer'] = layer_type == 'null'
+        return layer
+
+def generate_comp(
+    path: str,
+    layers: int = 10,
+    cameras: int = 1,
+    frames: int = 240,
+    frame_rate: float = 24.0,
+    supersampling: int = 1,
+    channels: str = 'mixed',
+    bezier_keyframes: int = 8,
+    baked: bool = False,
+    orientation: bool = True,
+    point_of_interest: bool = True,
+    parenting: bool = True,
+    binary: bool = False,
+    posterize: int = 1,
+    adaptive_tolerance: Optional[float] = None,
+    significant_digits: Optional[int] = 7,
+    pretty: bool = False,
+    precomps: int = 0,
+    seed: int = 0):
+    '''Writes a synthetic exported composition file.
+
+    Args:
+        path (str): Where to write the file.
+        layers (int): Number of layers, not including cameras.
+        cameras (int): Number of camera layers.
+        frames (int): Length of the composition, in frames.
+        frame_rate (float): The composition's frame rate.
+        supersampling (int): Number of samples per frame for calculated keyframes and baked transforms.
+        channels (str): 'bezier' or 'calculated' to export all animated channels one way, or 'mixed' to alternate
+            between layers.
+        bezier_keyframes (int): Number of keyframes in each Bezier channel.
+        baked (bool): Whether to bake transforms, like the exporter's "Bake transforms" option.
+        orientation (bool): Whether to animate orientation (which is always calculated).
+        point_of_interest (bool): Whether cameras should have a point of interest.
+        parenting (bool): Whether to parent some layers to others.
+        binary (bool): Whether to write calculated keyframes to a binary keyframe data file next to the .json file.
+        posterize (int): Hold each calculated and baked sample for this many samples, like a "posterizeTime"
+            expression, which the exporter stores run-length encoded.
+        adaptive_tolerance (float, optional): If given, adaptively sample calculated keyframes and baked transforms with
+            this tolerance, like the exporter's "Adaptive sampling" option, instead of keeping every sample.
+        significant_digits (int, optional): Round the layers' numbers to this many significant digits, like the
+            exporter's "Number precision" option. If None, numbers are written in full.
+        pretty (bool): Whether to pretty-print the file, like older versions of the exporter did, instead of writing it
+            compactly.
+        precomps (int): Number of precomps to write along with the main composition. Each one has `layers` layers of
+            its own, and is used as the source of one of the main composition's layers.
+        seed (int): Random seed, so the same arguments always produce the same file.
+    '''
+    binary_path = os.path.splitext(path)[0] + '.bin' if binary else None
+    store = KeyframeStore(binary_path)
+    generator = CompGenerator(
+        store, seed, frames, frame_rate, supersampling, channels, bezier_keyframes, posterize, adaptive_tolerance)
+
+    comps = [
+        {
+            'width': 1920,
+            'height': 1080,
+            'name': name,
+            'pixelAspect': 1,
+            'frameRate': frame_rate,
+            'workArea': [0, frames / frame_rate]
+        }
+        for name in [os.path.splitext(os.path.basename(path))[0]] + [f'Precomp {i + 1}' for i in range(precomps)]
+    ]
+    data = {
+        'layers': [],
+        'sources': [{'height': 1080, 'width': 1920, 'name': 'Solid', 'type': 'solid', 'color': [0.5, 0.5, 0.5]}],
+        'transformsBaked': baked,
+        'version': (
+            MULTI_COMP_FILE_VERSION if precomps > 0 else
+            ADAPTIVE_FILE_VERSION if adaptive_tolerance is not None else
+            RUNS_FILE_VERSION if posterize > 1 else
+            BINARY_FILE_VERSION if binary else
+            FILE_VERSION
+        )
+    }
+    if precomps > 0:
+        data['comps'] = comps
+        for i in range(precomps):
+            data['sources'].append({'height': 1080, 'width': 1920, 'name': f'Precomp {i + 1}', 'type': 'comp', 'comp': i + 1})
+    else:
+        data['comp'] = comps[0]
+    if binary:
+        data['keyframeData'] = {'file': os.path.basename(binary_path), 'type': 'float32', 'byteOrder': 'little'}
+
+    try:
+        # Each precomp is the source of one of the main composition's AV layers
+        precomp_layers = 0
+        for comp_index in range(len(comps)):
+            comp_cameras = cameras if comp_index == 0 else 0
+            for i in range(comp_cameras + layers):
+                index = i + 1
+                layer_type = 'camera' if i < comp_cameras else ('null' if i % 5 == 4 else 'av')
+                # Parent every third layer to the one before it, like a simple rig. Baked transforms include their
+                # parents'.
+                parent_index = index - 1 if parenting and not baked and i % 3 == 2 else None
+                layer = generator.layer(index, layer_type, baked, parent_index, orientation, point_of_interest)
+                if precomps > 0:
+                    layer['compIndex'] = comp_index
+                    if comp_index == 0 and layer_type == 'av' and precomp_layers < precomps:
+                        precomp_layers += 1
+                        layer['source'] = precomp_layers
+                data['layers'].append(layer)
+    finally:
+        store.close()
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if significant_digits is not None:
+            data['layers'] = round_numbers(data['layers'], significant_digits)
+        if pretty:
+            json.dump(data, f, indent=2)
+        else:
+            json.dump(data, f, separators=(',', ':'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic exported After Effects composition.')
+    parser.add_argument('path', help='Where to write the .json file')
+    parser.add_argument('--layers', type=int, default=10, help='Number of layers, not including cameras')
+    parser.add_argument('--cameras', type=int, default=1, help='Number of camera layers')
+    parser.add_argument('--frames', type=int, default=240, help='Length of the composition, in frames')
+    parser.add_argument('--frame-rate', type=float, default=24.0)
+    parser.add_argument('--supersampling', type=int, default=1, help='Samples per frame for calculated keyframes')
+    parser.add_argument('--channels', choices=['bezier', 'calculated', 'mixed'], default='mixed', help='How animated channels are exported')
+    parser.add_argument('--bezier-keyframes', type=int, default=8, help='Number of keyframes in each Bezier channel')
+    parser.add_argument('--baked', action='store_true', help='Bake transforms')
+    parser.add_argument('--no-orientation', dest='orientation', action='store_false', help="Don't animate orientation")
+    parser.add_argument('--no-point-of-interest', dest='point_of_interest', action='store_false', help="Don't give cameras a point of interest")
+    parser.add_argument('--no-parenting', dest='parenting', action='store_false', help="Don't parent layers to each other")
+    parser.add_argument('--binary', action='store_true', help='Write calculated keyframes to a binary keyframe data file')
+    parser.add_argument('--posterize', type=int, default=1, help='Hold each calculated sample for this many samples')
+    parser.add_argument('--adaptive-tolerance', type=float, help='Adaptively sample calculated keyframes with this tolerance')
+    parser.add_argument('--significant-digits', type=int, default=7, help='Round numbers to this many significant digits (0 to write them in full)')
+    parser.add_argument('--pretty', action='store_true', help='Pretty-print the file, like older versions of the exporter')
+    parser.add_argument('--precomps', type=int, default=0, help='Number of precomps to write along with the main composition')
+    parser.add_argument('--seed', type=int, default=0)
+    args = vars(parser.parse_args())
+    args['significant_digits'] = args['significant_digits'] or None
+    generate_comp(args.pop('path'), **args)
+
+if __name__ == '__main__':
+    main()